@@ -44,6 +44,9 @@ setup(
         "console_scripts": [
             "topdon = topdon.topdon:main",
             "topdon_stream = topdon.stream:main",
+            "topdon_multi = topdon.multicam:main",
+            "topdon_bench = topdon.bench.suite:main",
+            "topdon_load = topdon.bench.loadtest:main",
         ],
     },
     )
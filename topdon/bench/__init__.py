@@ -0,0 +1,6 @@
+# -*- encoding: utf-8 -*-
+"""
+benchmarks on synthetic TC001 frames
+
+    python -m topdon.bench --output results.json --baseline baseline.json
+"""
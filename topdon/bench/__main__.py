@@ -0,0 +1,3 @@
+from topdon.bench.suite import main
+
+main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+load generator for the MJPEG stream and the Socket.IO viewer
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import subprocess
+import urllib.request
+
+import numpy as np
+
+BOUNDARY = b'--frame'
+
+class ClientStats:
+    def __init__(self, name: str, kind: str):
+        """Receive statistics of one simulated viewer."""
+        self.name = name
+        self.kind = kind
+        self.start = None
+        self.first_frame = None
+        self.frame_times = []
+        self.bytes = 0
+        self.error = None
+
+    def connected(self):
+        self.start = time.monotonic()
+
+    def frame(self, t=None):
+        t = time.monotonic() if t is None else t
+        if self.first_frame is None:
+            self.first_frame = t
+        self.frame_times.append(t)
+
+    def summary(self, end=None):
+        end = end or time.monotonic()
+        duration = max(end - (self.start or end), 1e-9)
+        intervals = np.diff(self.frame_times) * 1000 if len(self.frame_times) > 1 else np.zeros(0)
+        return {
+                'client': self.name,
+                'kind': self.kind,
+                'frames': len(self.frame_times),
+                'fps': round(len(self.frame_times) / duration, 2),
+                'jitter_ms': round(float(intervals.std()), 2) if len(intervals) else None,
+                'max_gap_ms': round(float(intervals.max()), 1) if len(intervals) else None,
+                'kbytes_per_s': round(self.bytes / duration / 1024, 1),
+                'ttff_ms': round((self.first_frame - self.start) * 1000, 1) if self.first_frame is not None else None,
+                'error': self.error,
+               }
+
+class MJPEGClient(threading.Thread):
+    def __init__(self, url, duration, rate=None, chunk_size=16384, name='mjpeg'):
+        """
+        Reads a multipart MJPEG stream for `duration` seconds.
+
+        Args:
+            url (str): stream URL, e.g. http://localhost:5000/mjpeg.
+            duration (float): test length in seconds.
+            rate (float): read speed limit in bytes/s to emulate a slow link, None = unlimited.
+            chunk_size (int): bytes per read.
+        """
+        super().__init__(daemon=True)
+        self.url = url
+        self.duration = duration
+        self.rate = rate
+        self.chunk_size = chunk_size if rate is None else max(min(chunk_size, int(rate / 10)), 512)
+        self.stats = ClientStats(name, 'mjpeg')
+
+    def run(self):
+        try:
+            self.stats.connected()
+            with urllib.request.urlopen(self.url, timeout=10) as response:
+                end = self.stats.start + self.duration
+                tail = b''
+                while time.monotonic() < end:
+                    data = response.read1(self.chunk_size)
+                    if not data:
+                        break
+                    now = time.monotonic()
+                    self.stats.bytes += len(data)
+                    # Boundaries can be split across reads, keep the last bytes for the next search
+                    self.stats.frame_times.extend([now] * (tail + data).count(BOUNDARY))
+                    if self.stats.first_frame is None and self.stats.frame_times:
+                        self.stats.first_frame = now
+                    tail = data[-(len(BOUNDARY) - 1):]
+                    if self.rate:
+                        delay = self.stats.start + self.stats.bytes / self.rate - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+        except Exception as e:
+            self.stats.error = f'{type(e).__name__}: {e}'
+
+class SocketIOClient(threading.Thread):
+    def __init__(self, url, duration, delay=0.0, name='socketio'):
+        """
+        Subscribes to the `update_frame` events of the viewer for `duration` seconds.
+
+        Args:
+            url (str): server URL, e.g. http://localhost:5001.
+            duration (float): test length in seconds.
+            delay (float): processing time per frame in seconds to emulate a slow client.
+        """
+        super().__init__(daemon=True)
+        self.url = url
+        self.duration = duration
+        self.delay = delay
+        self.stats = ClientStats(name, 'socketio')
+
+    def run(self):
+        try:
+            import socketio
+        except ImportError:
+            self.stats.error = 'python-socketio[client] is not installed'
+            return
+        client = socketio.Client(reconnection=False)
+
+        @client.on('update_frame')
+        def on_frame(data):
+            self.stats.frame()
+            self.stats.bytes += len(data.get('current_frame', ''))
+            if self.delay:
+                time.sleep(self.delay)
+
+        try:
+            self.stats.connected()
+            client.connect(self.url, transports=['websocket'])
+            time.sleep(max(self.stats.start + self.duration - time.monotonic(), 0))
+        except Exception as e:
+            self.stats.error = f'{type(e).__name__}: {e}'
+        finally:
+            client.disconnect()
+
+def run_load(url, clients=10, mode='mjpeg', duration=20.0, slow=0, rate=None, delay=0.0, ramp=0.0):
+    """
+    Starts `clients` simulated viewers, the first `slow` of them throttled (`rate` for MJPEG,
+    `delay` for Socket.IO), and waits until they finish.
+
+    Returns:
+        list: summary dict per client.
+    """
+    threads = []
+    for i in range(clients):
+        throttled = i < slow
+        if mode == 'mjpeg':
+            thread = MJPEGClient(url, duration, rate=rate if throttled else None, name=f"{'slow' if throttled else 'client'}-{i}")
+        else:
+            thread = SocketIOClient(url, duration, delay=delay if throttled else 0.0, name=f"{'slow' if throttled else 'client'}-{i}")
+        thread.start()
+        threads.append(thread)
+        if ramp:
+            time.sleep(ramp)
+    for thread in threads:
+        thread.join(duration + 15)
+    end = time.monotonic()
+    return [thread.stats.summary(min(end, (thread.stats.start or end) + duration)) for thread in threads]
+
+def print_summary(rows):
+    columns = ['client', 'frames', 'fps', 'jitter_ms', 'max_gap_ms', 'kbytes_per_s', 'ttff_ms']
+    print(' '.join(f'{k:>12}' for k in columns))
+    for row in rows:
+        print(' '.join(f"{str(row[k]) if row[k] is not None else '-':>12}" for k in columns) + (f"  {row['error']}" if row['error'] else ''))
+
+    ok = [k for k in rows if k['frames'] > 0]
+    if ok:
+        fps = np.array([k['fps'] for k in ok])
+        print(f"\n{len(ok)}/{len(rows)} clients received frames, fps min/median/max: {fps.min():.1f}/{np.median(fps):.1f}/{fps.max():.1f}, "
+              f"total {sum(k['kbytes_per_s'] for k in ok):.0f} kB/s")
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_fake_server(mode):
+    """
+    Starts a local server on synthetic frames in a subprocess: topdon_stream (MJPEG, port 5000)
+    or topdon (Socket.IO) on a free port.
+
+    Returns:
+        tuple: (process, url)
+    """
+    # the servers run in a temporary working directory, keep this package importable
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_root] + [k for k in [os.environ.get('PYTHONPATH')] if k]))
+    if mode == 'mjpeg':
+        workdir = tempfile.mkdtemp(prefix='topdon-load-')
+        with open(os.path.join(workdir, 'config.yml'), 'w') as file:
+            file.write('cam_id: synthetic\n')
+        process = subprocess.Popen([sys.executable, '-m', 'topdon.stream', '--config', os.path.join(workdir, 'config.yml')], cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base, url = 'http://127.0.0.1:5000', 'http://127.0.0.1:5000/mjpeg'
+    else:
+        port = _free_port()
+        workdir = tempfile.mkdtemp(prefix='topdon-load-')
+        process = subprocess.Popen([sys.executable, '-c', 'from topdon.topdon import main; main()', '--synthetic', '--port', str(port), '--media', workdir, '--pretrigger', '0'],
+                                   cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base = url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Fake server exited with code {process.returncode}')
+        try:
+            urllib.request.urlopen(base + '/metrics', timeout=1).close()
+            return process, url
+        except Exception:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Fake server did not start')
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test for the MJPEG stream and the Socket.IO viewer')
+    parser.add_argument('url', nargs='?', help='Stream URL (mjpeg: http://host:5000/mjpeg, socketio: http://host:5001)')
+    parser.add_argument('--mode', choices=['mjpeg', 'socketio'], default='mjpeg', help='Client type (default: mjpeg)')
+    parser.add_argument('--clients', type=int, default=10, help='Number of simulated viewers (default: 10)')
+    parser.add_argument('--duration', type=float, default=20, help='Test length in seconds (default: 20)')
+    parser.add_argument('--slow', type=int, default=0, help='Number of throttled clients (default: 0)')
+    parser.add_argument('--rate', type=float, default=64, help='Read speed of throttled MJPEG clients in kB/s (default: 64)')
+    parser.add_argument('--delay', type=float, default=0.5, help='Processing time per frame of throttled Socket.IO clients in s (default: 0.5)')
+    parser.add_argument('--ramp', type=float, default=0.0, help='Seconds between client starts (default: 0)')
+    parser.add_argument('--fake', action='store_true', help='Start a local server on synthetic frames (no camera needed)')
+    args = parser.parse_args()
+
+    process = None
+    if args.fake:
+        process, args.url = start_fake_server(args.mode)
+        print(f'Fake server running at {args.url}')
+    elif not args.url:
+        parser.error('url is required without --fake')
+
+    try:
+        rows = run_load(args.url, clients=args.clients, mode=args.mode, duration=args.duration,
+                        slow=args.slow, rate=args.rate * 1024, delay=args.delay, ramp=args.ramp)
+        print_summary(rows)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
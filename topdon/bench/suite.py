@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+micro-benchmarks of the frame pipeline, file catalog and recorder
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+try:
+    from topdon.core import ThermalFrame, ColorMapper
+    from topdon.bench.synthetic import SyntheticFrames, SYNTHETIC_CAMERA
+except:
+    from core import ThermalFrame, ColorMapper
+    from bench.synthetic import SyntheticFrames, SYNTHETIC_CAMERA
+
+# reference run, regenerate with: python -m topdon.bench --output topdon/bench/baseline.json
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+def measure(fn, repeat=50, warmup=3):
+    """
+    Calls fn() `warmup` + `repeat` times and returns timing statistics of the measured calls.
+
+    Returns:
+        dict: median/mean/min/p95 in ms and calls per second (from the median).
+    """
+    for _ in range(warmup):
+        fn()
+    times = np.empty(repeat)
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - t
+    median = float(np.median(times))
+    return {
+            'median_ms': round(median * 1000, 4),
+            'mean_ms': round(float(times.mean()) * 1000, 4),
+            'min_ms': round(float(times.min()) * 1000, 4),
+            'p95_ms': round(float(np.percentile(times, 95)) * 1000, 4),
+            'ops': round(1 / median, 1) if median > 0 else None,
+            'repeat': repeat,
+           }
+
+class Suite:
+    def __init__(self, quick=False, seed=0):
+        """
+        Repeatable benchmarks on synthetic TC001 frames; no camera or display is needed.
+
+        Args:
+            quick (bool): fewer repetitions and smaller file catalogs (smoke run).
+            seed (int): seed of the synthetic frames.
+        """
+        self.quick = quick
+        self.repeat = 10 if quick else 100
+        self.frames = SyntheticFrames(seed=seed).frames(8)
+        self.benchmarks = {}
+        self._register()
+
+    def _frame(self, i):
+        return self.frames[i % len(self.frames)]
+
+    def _register(self):
+        self.benchmarks['thermalframe.convert'] = self.bench_convert
+        self.benchmarks['thermalframe.statistics'] = self.bench_statistics
+        for scale in range(1, 6):
+            self.benchmarks[f'heatmap.get_frame.scale{scale}'] = lambda scale=scale: self.bench_heatmap(scale)
+        self.benchmarks['colormap.apply.scale3'] = self.bench_colormap
+        self.benchmarks['hud.draw.scale3'] = self.bench_hud
+        for quality in [50, 80, 95]:
+            self.benchmarks[f'jpeg.encode.q{quality}'] = lambda quality=quality: self.bench_jpeg(quality)
+        for n in ([100, 1000] if self.quick else [100, 1000, 10000]):
+            self.benchmarks[f'filemanager.scan.{n}'] = lambda n=n: self.bench_filemanager_scan(n)
+            self.benchmarks[f'filemanager.query.{n}'] = lambda n=n: self.bench_filemanager_query(n)
+        self.benchmarks['videorecorder.add_frame'] = self.bench_videorecorder
+
+    def _counter(self):
+        i = [0]
+        def next_frame():
+            i[0] += 1
+            return self._frame(i[0])
+        return next_frame
+
+    def bench_convert(self):
+        next_frame = self._counter()
+        def run():
+            TFrame = ThermalFrame(SYNTHETIC_CAMERA, next_frame())
+            TFrame._process_frame()
+        return measure(run, self.repeat)
+
+    def bench_statistics(self):
+        TFrame = ThermalFrame(SYNTHETIC_CAMERA, self._frame(0))
+        TFrame._process_frame()
+        def run():
+            TFrame._set_target(TFrame.height / 2, TFrame.width / 2)
+            TFrame._detect_hotspots()
+            TFrame._compute_histogram()
+            TFrame._get_data(TFrame.width)
+        return measure(run, self.repeat)
+
+    def bench_heatmap(self, scale):
+        try:
+            from topdon.stream import Heatmap
+        except:
+            from stream import Heatmap
+        next_frame = self._counter()
+        def run():
+            Heatmap(ThermalFrame(SYNTHETIC_CAMERA, next_frame()), scale=scale, hud='all').get_frame()
+        return measure(run, max(self.repeat // scale, 5))
+
+    def _gray(self, scale=3):
+        TFrame = ThermalFrame(SYNTHETIC_CAMERA, self._frame(0))
+        return cv2.resize(TFrame.imdata[..., 0], (TFrame.width * scale, TFrame.height * scale), interpolation=cv2.INTER_CUBIC)
+
+    def bench_colormap(self):
+        gray = self._gray()
+        mapper = ColorMapper()
+        return measure(lambda: mapper.apply(gray, 0, alpha=1.0), self.repeat)
+
+    def bench_hud(self):
+        try:
+            from topdon.stream import Heatmap
+        except:
+            from stream import Heatmap
+        hm = Heatmap(ThermalFrame(SYNTHETIC_CAMERA, self._frame(0)), scale=3, hud='none')
+        heatmap = hm.get_frame()
+        img_data = hm.img_data
+        def run():
+            canvas = heatmap.copy()
+            hm._draw_crosshairs(canvas, img_data)
+            hm._draw_hud(canvas, img_data, 'Jet')
+        return measure(run, self.repeat)
+
+    def bench_jpeg(self, quality):
+        heatmap = ColorMapper().apply(self._gray(), 0)
+        return measure(lambda: cv2.imencode('.jpg', heatmap, [cv2.IMWRITE_JPEG_QUALITY, quality]), self.repeat)
+
+    @staticmethod
+    def _populate(path, n, slug='TC001'):
+        """Creates `n` empty bundles (record + xlsx) with consecutive timestamps."""
+        t = datetime(2024, 1, 1)
+        for i in range(n):
+            name = f"{slug}_{(t + timedelta(seconds=i)).strftime('%Y%m%d-%H%M%S')}"
+            for ending in ['mp4' if i % 2 else 'png', 'xlsx']:
+                open(os.path.join(path, f'{name}.{ending}'), 'wb').close()
+
+    def bench_filemanager_scan(self, n):
+        """Cold catalog build of a directory with `n` bundles."""
+        try:
+            from topdon.files import FileManager
+        except:
+            from files import FileManager
+        path = tempfile.mkdtemp(prefix='topdon-bench-')
+        try:
+            self._populate(path, n)
+            return measure(lambda: FileManager(base_path=path, slug='TC001', background_metadata=False), max(self.repeat // 10, 3), warmup=1)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def bench_filemanager_query(self, n):
+        """One page (50 bundles) from the warm catalog, as served by /get_file_list."""
+        try:
+            from topdon.files import FileManager
+        except:
+            from files import FileManager
+        path = tempfile.mkdtemp(prefix='topdon-bench-')
+        try:
+            self._populate(path, n)
+            files = FileManager(base_path=path, slug='TC001', background_metadata=False)
+            return measure(lambda: files.query(offset=n // 2, limit=50), self.repeat)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def bench_videorecorder(self):
+        try:
+            from topdon.topdon import VideoRecorder
+        except:
+            from topdon import VideoRecorder
+        heatmap = ColorMapper().apply(self._gray(), 0)
+        height, width = heatmap.shape[:2]
+        path = tempfile.mkdtemp(prefix='topdon-bench-')
+        try:
+            recorder = VideoRecorder(SYNTHETIC_CAMERA, width, height, savedir=path)
+            img_data = {'avg_temp': 22.0, 'max_temp': 60.0, 'min_temp': 20.0, 'hotspots': []}
+            result = measure(lambda: recorder.add_frame(heatmap, data=img_data), self.repeat)
+            recorder.release()
+            recorder.data = []  # no xlsx export on cleanup
+            del recorder
+            return result
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def run(self, pattern=None, verbose=True):
+        """
+        Runs all benchmarks (or those matching the regex `pattern`).
+
+        Returns:
+            dict: {'meta': {...}, 'results': {name: stats or {'error': ...}}}
+        """
+        results = {}
+        for name, benchmark in self.benchmarks.items():
+            if pattern and not re.search(pattern, name):
+                continue
+            try:
+                results[name] = benchmark()
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+            if verbose:
+                value = results[name].get('median_ms', results[name].get('error'))
+                print(f'{name:<32} {value}')
+        return {'meta': environment(quick=self.quick), 'results': results}
+
+def environment(**extra):
+    return dict({
+                    'time': datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'machine': platform.machine(),
+                    'cpus': os.cpu_count(),
+                    'numpy': np.__version__,
+                    'opencv': cv2.__version__,
+                }, **extra)
+
+def environment_mismatch(meta, reference):
+    """
+    Lists the environment fields in which two runs differ enough to make timings incomparable.
+
+    Returns:
+        list: (field, reference_value, current_value); empty if the runs are comparable.
+    """
+    def key(meta):
+        return {
+                'cpus': meta.get('cpus'),
+                'system': (meta.get('platform') or '').split('-')[0],
+                'machine': meta.get('machine'),
+                'python': '.'.join((meta.get('python') or '').split('.')[:2]),
+                'quick': meta.get('quick', False),
+                }
+    current, reference = key(meta), key(reference)
+    return [(k, reference[k], current[k]) for k in current if current[k] != reference[k]]
+
+def compare(results, baseline, tolerance=0.15):
+    """
+    Compares the medians with a baseline run.
+
+    Returns:
+        list: (name, baseline_ms, current_ms, ratio, regressed) for every benchmark in both runs.
+    """
+    rows = []
+    for name, current in results['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None or 'median_ms' not in reference or 'median_ms' not in current:
+            continue
+        ratio = current['median_ms'] / reference['median_ms'] if reference['median_ms'] > 0 else float('inf')
+        rows.append((name, reference['median_ms'], current['median_ms'], ratio, ratio > 1 + tolerance))
+    return rows
+
+def print_comparison(rows, baseline=None):
+    if baseline is not None and 'meta' in baseline:
+        meta = baseline['meta']
+        print(f"\nBaseline: {meta.get('time')}, Python {meta.get('python')}, {meta.get('machine')}, {meta.get('cpus')} CPUs")
+    print(f"\n{'benchmark':<32} {'baseline [ms]':>14} {'current [ms]':>13} {'ratio':>7}")
+    for name, reference, current, ratio, regressed in rows:
+        print(f"{name:<32} {reference:>14.3f} {current:>13.3f} {ratio:>7.2f}{'  REGRESSION' if regressed else ''}")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Thermal Camera Viewer benchmarks (synthetic frames, no camera needed)')
+    parser.add_argument('--filter', type=str, help='Only run benchmarks matching this regex')
+    parser.add_argument('--quick', action='store_true', help='Fewer repetitions (smoke run)')
+    parser.add_argument('--output', type=str, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', type=str, default=BASELINE_FILE, help='Compare against a previous JSON result (default: the committed baseline.json; regressions only fail in a matching environment)')
+    parser.add_argument('--no-baseline', action='store_true', help='Do not compare against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown against the baseline (default: 0.15 = 15%%)')
+    args = parser.parse_args()
+
+    results = Suite(quick=args.quick).run(args.filter)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline and not args.no_baseline:
+        try:
+            with open(args.baseline, 'r') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            print(f'No baseline at {args.baseline}, skipping the comparison')
+            return
+        rows = compare(results, baseline, args.tolerance)
+        print_comparison(rows, baseline)
+        if not any(k[4] for k in rows):
+            return
+        # timings from another machine are only a hint, not a failure
+        mismatch = environment_mismatch(results['meta'], baseline.get('meta', {}))
+        if mismatch:
+            fields = ', '.join(f'{k}: {a} vs {b}' for k, a, b in mismatch)
+            print(f'\nWarning: the baseline was recorded in a different environment ({fields}); '
+                  f'not failing on regressions. Record a local baseline with --output and pass it via --baseline.')
+            return
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+synthetic TC001 frames for benchmarks and camera-less runs
+"""
+import time
+
+import numpy as np
+
+# camera dict as returned by topdon.video.Video for a TC001
+SYNTHETIC_CAMERA = {
+                    'name': 'TC001',
+                    'resolution': (256, 384),
+                    'fps': 25.0,
+                   }
+
+def encode_frame(temperatures, luma=None):
+    """
+    Packs a temperature plane (°C, 192x256) into a raw TC001 frame (384x256x2 uint8):
+    the top half is YUYV (luma from the temperatures, neutral chroma), the bottom half holds
+    the raw value (K * 64) as little-endian bytes, as decoded by ThermalFrame.
+
+    Args:
+        temperatures (np.ndarray): temperatures in °C.
+        luma (np.ndarray): optional luma plane, default: temperatures stretched to 16..235.
+    """
+    height, width = temperatures.shape
+    raw = np.clip(np.rint((temperatures + 273.15) * 64), 0, 65535).astype(np.uint16)
+    if luma is None:
+        low, high = temperatures.min(), temperatures.max()
+        luma = 16 + (temperatures - low) * (219 / max(high - low, 1e-6))
+    frame = np.empty((2 * height, width, 2), dtype=np.uint8)
+    frame[:height, :, 0] = np.clip(luma, 0, 255)
+    frame[:height, :, 1] = 128
+    frame[height:, :, 0] = raw & 0xff
+    frame[height:, :, 1] = raw >> 8
+    return frame
+
+class SyntheticFrames:
+    def __init__(self, seed=0, shape=(192, 256), ambient=22.0, gradient=4.0, noise=0.15, hotspots=3, moving=True):
+        """
+        Generates realistic TC001 frames: an ambient temperature with a smooth gradient,
+        Gaussian hot spots (optionally drifting) and per-pixel sensor noise. The same seed
+        always yields the same sequence.
+
+        Args:
+            seed (int): random seed.
+            shape (tuple): sensor (height, width).
+            ambient (float): background temperature in °C.
+            gradient (float): temperature difference across the frame in K.
+            noise (float): standard deviation of the pixel noise in K.
+            hotspots (int): number of hot spots.
+            moving (bool): hot spots drift from frame to frame.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.shape = tuple(shape)
+        self.noise = noise
+        self.moving = moving
+        height, width = self.shape
+        self.y, self.x = np.mgrid[0:height, 0:width].astype(np.float32)
+        self.background = (ambient + gradient * (self.x / width - 0.5) + 0.5 * gradient * (self.y / height - 0.5)).astype(np.float32)
+        self.spots = [{
+                        'x': self.rng.uniform(0.1, 0.9) * width,
+                        'y': self.rng.uniform(0.1, 0.9) * height,
+                        'sigma': self.rng.uniform(3, 12),
+                        'amplitude': self.rng.uniform(10, 60),
+                        'vx': self.rng.uniform(-1, 1),
+                        'vy': self.rng.uniform(-1, 1),
+                      } for _ in range(hotspots)]
+        self.seq = 0
+
+    def temperatures(self):
+        """Temperature plane of the next frame in °C."""
+        height, width = self.shape
+        temperatures = self.background + self.rng.normal(0, self.noise, self.shape).astype(np.float32)
+        for spot in self.spots:
+            if self.moving:
+                spot['x'] = (spot['x'] + spot['vx']) % width
+                spot['y'] = (spot['y'] + spot['vy']) % height
+            d2 = (self.x - spot['x']) ** 2 + (self.y - spot['y']) ** 2
+            temperatures += spot['amplitude'] * np.exp(-d2 / (2 * spot['sigma'] ** 2))
+        return temperatures
+
+    def frame(self):
+        """Next raw frame (384x256x2 uint8)."""
+        self.seq += 1
+        return encode_frame(self.temperatures())
+
+    def frames(self, n):
+        """A list of `n` consecutive frames."""
+        return [self.frame() for _ in range(n)]
+
+class SyntheticCapture:
+    def __init__(self, fps=25.0, n_frames=50, **kwargs):
+        """
+        Drop-in replacement for cv2.VideoCapture without a camera: cycles through `n_frames`
+        pre-generated synthetic frames at `fps` (frames are generated up front so that the
+        source itself costs nothing).
+        """
+        self.fps = fps
+        self.buffer = SyntheticFrames(**kwargs).frames(n_frames)
+        self.index = 0
+        self.next_time = None
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 0
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        now = time.monotonic()
+        if self.next_time is not None and now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time = max(now, self.next_time or now) + 1 / self.fps
+        frame = self.buffer[self.index % len(self.buffer)]
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+per-pixel calibration maps
+"""
+import os
+import itertools
+import threading
+
+import cv2
+import numpy as np
+
+def default_calibration_file():
+    cache_dir = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'topdon', 'calibration.npz')
+
+class CalibrationMap:
+    _versions = itertools.count(1)
+
+    def __init__(self, gain, offset, regions=None):
+        """
+        Pro-Pixel-Kalibrierung der Rohdaten: T [K] = raw * gain + offset.
+
+        Emissionsgrade pro Region werden als Faktor eps^(-1/4) in gain und offset eingerechnet,
+        zusammen mit der Umrechnung in °C und dem globalen Offset. Die Anwendung pro Frame ist
+        damit genau eine Multiplikation und eine Addition pro Pixel.
+
+        Args:
+            gain (np.ndarray): Verstärkung pro Pixel in K pro Rohwert (Standard 1/64).
+            offset (np.ndarray): Offset pro Pixel in K.
+            regions (list): [{'region': [x, y, w, h], 'emissivity': 0.95}, ...] in Sensor-Pixeln.
+
+        `version` ist prozessweit eindeutig und ändert sich mit jeder Änderung der Karten
+        (z.B. als Teil eines Cache-Schlüssels).
+        """
+        self.gain = np.asarray(gain, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        if self.gain.shape != self.offset.shape:
+            raise ValueError("gain and offset maps must have the same shape")
+        self.shape = self.gain.shape
+        self.regions = []
+        self._variants = {}
+        self._lock = threading.Lock()
+        self.set_emissivity(regions or [])
+
+    @classmethod
+    def identity(cls, shape=(192, 256)):
+        return cls(np.full(shape, 1 / 64), np.zeros(shape))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            regions = [{'region': [int(v) for v in k[:4]], 'emissivity': float(k[4])} for k in data['regions']] if 'regions' in data else []
+            return cls(data['gain'], data['offset'], regions)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        regions = np.array([list(k['region']) + [k['emissivity']] for k in self.regions], dtype=np.float64).reshape(-1, 5)
+        with open(path, 'wb') as file:
+            np.savez(file, gain=self.gain, offset=self.offset, regions=regions)
+
+    def set_emissivity(self, regions):
+        """Setzt die Emissionsgrade pro Region und verwirft die vorberechneten Karten."""
+        for k in regions:
+            if not 0 < float(k['emissivity']) <= 1:
+                raise ValueError("emissivity must be in (0, 1]")
+        with self._lock:
+            self.regions = [{'region': [int(v) for v in k['region']], 'emissivity': float(k['emissivity'])} for k in regions]
+            self._variants = {}
+            self.version = next(self._versions)
+
+    def _effective(self):
+        factor = np.ones(self.shape)
+        for k in self.regions:
+            x, y, w, h = k['region']
+            factor[y:y + h, x:x + w] = k['emissivity'] ** -0.25
+        return self.gain * factor, self.offset * factor
+
+    @staticmethod
+    def _transform(array, transforms):
+        for transform in transforms:
+            if transform[0] == 'rotate':
+                array = cv2.rotate(array, transform[1])
+            elif transform[0] == 'flip':
+                array = cv2.flip(array, 1)
+        return np.ascontiguousarray(array)
+
+    def maps(self, transforms=(), offset=0):
+        """
+        Gibt (gain, offset) für die Ausrichtung `transforms` zurück, offset bereits in °C und
+        inklusive des globalen Offsets. Die Karten werden einmal pro Variante berechnet.
+        """
+        key = (tuple(transforms), float(offset))
+        with self._lock:
+            if key not in self._variants:
+                if len(self._variants) > 16:
+                    self._variants = {}
+                gain, offset_map = self._effective()
+                self._variants[key] = (self._transform(gain, transforms), self._transform(offset_map - 273.15 + offset, transforms))
+            return self._variants[key]
+
+    def apply(self, raw, transforms=(), offset=0, out=None):
+        """
+        Rohwerte (uint16) -> Temperaturen in °C mit einer fused multiply-add Operation, in `out`
+        (z.B. aus OutputBuffers), falls übergeben.
+        """
+        gain, offset_map = self.maps(transforms, offset)
+        out = np.multiply(raw, gain, out=out)
+        out += offset_map
+        return out
+
+    def data(self):
+        return {
+                'shape': list(self.shape),
+                'regions': self.regions,
+                'gain_mean': float(self.gain.mean()),
+                'offset_mean': float(self.offset.mean()),
+                }
+
+class OutputBuffers:
+    def __init__(self, count=3, dtype=np.float64):
+        """
+        Vorallozierte Ausgabe-Arrays für die Umrechnung, eine Reihe pro Form (gedreht/ungedreht),
+        reihum wiederverwendet. Ein Ergebnis bleibt gültig, bis `count` - 1 weitere Frames derselben
+        Form umgerechnet wurden; der Besitzer (die Verarbeitungsschleife) darf also den aktuellen
+        Frame weiterreichen, ohne dass der nächste ihn überschreibt.
+
+        Args:
+            count (int): Anzahl der Arrays pro Form.
+        """
+        self.count = max(int(count), 2)
+        self.dtype = dtype
+        self._buffers = {}
+        self._next = {}
+
+    def get(self, shape):
+        shape = tuple(shape)
+        if shape not in self._buffers:
+            self._buffers[shape] = [np.empty(shape, dtype=self.dtype) for _ in range(self.count)]
+            self._next[shape] = 0
+        index = self._next[shape]
+        self._next[shape] = (index + 1) % self.count
+        return self._buffers[shape][index]
+
+class CalibrationBuilder:
+    def __init__(self):
+        """
+        Sammelt Referenzaufnahmen einer homogenen Fläche bekannter Temperatur (z.B. Schwarzer
+        Strahler) und berechnet daraus die Kalibrierkarten: eine Referenz ergibt einen Offset pro
+        Pixel, zwei oder mehr Referenzen zusätzlich die Verstärkung (Zwei-Punkt-Korrektur).
+        """
+        self.references = []
+        self.collecting = False
+        self._temperature = None
+        self._frames = 0
+        self._sum = None
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def start(self, temperature, frames=25):
+        """Startet eine Referenzaufnahme bei `temperature` °C über `frames` Frames."""
+        with self._lock:
+            self._temperature = float(temperature) + 273.15
+            self._frames = max(int(frames), 1)
+            self._sum = None
+            self._n = 0
+            self.collecting = True
+
+    def add_frame(self, raw):
+        with self._lock:
+            if not self.collecting:
+                return
+            if self._sum is None:
+                self._sum = np.zeros(raw.shape, dtype=np.float64)
+            self._sum += raw
+            self._n += 1
+            if self._n >= self._frames:
+                self.references.append((self._temperature, self._sum / self._n))
+                self.collecting = False
+
+    def reset(self):
+        with self._lock:
+            self.references = []
+            self.collecting = False
+
+    def build(self, regions=None):
+        with self._lock:
+            references = sorted(self.references, key=lambda k: k[0])
+        if len(references) == 0:
+            raise ValueError("No reference frames captured")
+
+        t_low, raw_low = references[0]
+        if len(references) == 1 or references[-1][0] == t_low:
+            gain = np.full(raw_low.shape, 1 / 64)
+        else:
+            t_high, raw_high = references[-1]
+            delta = raw_high - raw_low
+            # Pixel ohne Kontrast zwischen den Referenzen behalten die nominale Verstärkung
+            gain = np.divide(t_high - t_low, delta, out=np.full(raw_low.shape, 1 / 64), where=np.abs(delta) > 1)
+        offset = t_low - gain * raw_low
+        return CalibrationMap(gain, offset, regions)
+
+    def data(self):
+        with self._lock:
+            return {
+                    'collecting': self.collecting,
+                    'references': [round(k[0] - 273.15, 2) for k in self.references],
+                    }
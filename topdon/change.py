@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cheap change detection on the raw thermal plane
+"""
+import threading
+
+import cv2
+import numpy as np
+
+class ChangeDetector:
+    def __init__(self, delta=0.25, block=8, keyframe_interval=5.0):
+        """
+        Erkennt, ob sich das Wärmebild seit dem letzten verarbeiteten Frame (Keyframe) merklich
+        geändert hat. Verglichen werden Blockmittel der rohen uint16-Werte (block x block Pixel,
+        INTER_AREA), das mittelt das Sensorrauschen weg und kostet nur einen Bruchteil der
+        Umrechnung. Ändert sich kein Block um mehr als `delta` Kelvin, kann die Pipeline
+        Statistik, Bild und JPEG des Keyframes weiterverwenden.
+
+        Args:
+            delta (float): Schwelle in Kelvin pro Block, 0 oder None = jeder Frame ist neu.
+            block (int): Kantenlänge der gemittelten Blöcke in Pixeln.
+            keyframe_interval (float): spätestens nach so vielen Sekunden ein neuer Keyframe.
+        """
+        self.delta = delta
+        self.block = block
+        self.keyframe_interval = keyframe_interval
+        self.reference = None
+        self.key = None
+        self.key_seq = None
+        self.key_time = None
+        self.last_seq = None
+        self.frames = 0
+        self.keyframes = 0
+        self._force = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.delta) and self.delta > 0
+
+    def _sample(self, thdata):
+        raw = thdata[..., 1].astype(np.uint16)
+        raw <<= 8
+        raw |= thdata[..., 0]
+        height, width = raw.shape
+        return cv2.resize(raw, (max(width // self.block, 1), max(height // self.block, 1)), interpolation=cv2.INTER_AREA).astype(np.int32)
+
+    def force(self):
+        """Der nächste Frame wird als Keyframe verarbeitet (z.B. für einen neuen Client)."""
+        self._force = True
+
+    def check(self, seq, thdata, timestamp, key=None):
+        """
+        Prüft Frame `seq` (thermische Hälfte des Rohframes, (H, W, 2) uint8). Mehrere Aufrufer
+        (Analyse, Stream-Clients) bekommen für denselben Frame dieselbe Antwort.
+
+        Args:
+            key: Einstellungen, die das Ergebnis beeinflussen (Drehung, Offset, ...);
+                 jede Änderung erzwingt einen Keyframe.
+
+        Returns:
+            int: Sequenznummer des Keyframes, dessen Inhalt für Frame `seq` gilt (== seq,
+                 wenn der Frame neu verarbeitet werden muss).
+        """
+        with self._lock:
+            if self.last_seq is not None and seq <= self.last_seq:
+                # ein Aufrufer, der zurückliegt: Frames vor dem aktuellen Keyframe neu verarbeiten,
+                # sonst bekäme sein älterer Frame die Sequenznummer des neueren Keyframes
+                return self.key_seq if seq >= self.key_seq else seq
+            self.last_seq = seq
+            self.frames += 1
+
+            if self.enabled and not self._force and self.reference is not None and key == self.key \
+                    and timestamp - self.key_time < self.keyframe_interval:
+                sample = self._sample(thdata)
+                if np.abs(sample - self.reference).max() <= self.delta * 64:
+                    return self.key_seq
+            else:
+                sample = self._sample(thdata) if self.enabled else None
+
+            self.reference = sample
+            self.key = key
+            self.key_seq = seq
+            self.key_time = timestamp
+            self.keyframes += 1
+            self._force = False
+            return seq
+
+    def changed(self, seq, thdata, timestamp, key=None):
+        return self.check(seq, thdata, timestamp, key) == seq
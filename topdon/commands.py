@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+control commands executed by the capture loop at frame boundaries
+"""
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+class CommandQueue:
+    def __init__(self, timeout=2.0):
+        """
+        Steuerbefehle aus anderen Threads (Flask, Socket.IO) werden nicht direkt ausgeführt,
+        sondern in eine queue.SimpleQueue gestellt und von der Verarbeitungsschleife zwischen
+        zwei Frames abgearbeitet. Die Schleife sieht so innerhalb eines Frames immer einen
+        konsistenten Zustand, ohne Locks. Ergebnisse und Fehler gehen über Futures an den
+        Aufrufer zurück.
+
+        Args:
+            timeout (float): Wartezeit von call() auf die Ausführung in Sekunden.
+        """
+        self.queue = queue.SimpleQueue()
+        self.timeout = timeout
+        self.owner = None
+        self.executed = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Stellt fn(*args, **kwargs) in die Queue. Aus der Schleife selbst heraus (z.B. Regel-
+        Callbacks) wird direkt ausgeführt.
+
+        Returns:
+            concurrent.futures.Future: Ergebnis bzw. Exception von fn.
+        """
+        future = Future()
+        if threading.get_ident() == self.owner:
+            self._execute(fn, args, kwargs, future)
+        else:
+            self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        submit() und auf das Ergebnis warten.
+
+        Raises:
+            concurrent.futures.TimeoutError: Falls die Schleife den Befehl nicht innerhalb von `timeout`
+                ausführt; der Befehl wird dann verworfen und nicht mehr nachträglich ausgeführt.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _execute(self, fn, args, kwargs, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        self.executed += 1
+
+    def drain(self):
+        """Führt alle wartenden Befehle aus; einmal pro Frame aus der Schleife aufrufen."""
+        self.owner = threading.get_ident()
+        n = 0
+        while True:
+            try:
+                fn, args, kwargs, future = self.queue.get_nowait()
+            except queue.Empty:
+                return n
+            self._execute(fn, args, kwargs, future)
+            n += 1
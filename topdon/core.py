@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lightweight core: thermal frame conversion and statistics
+
+Only depends on numpy and OpenCV so that it can be imported without the web,
+export and tunnel dependencies.
+"""
+import time
+
+import cv2
+import numpy as np
+
+# reference point for time-to-first-frame reporting
+STARTUP_TIME = time.monotonic()
+
+class ThermalFrame:
+    def __init__(self, camera, frame, rnd=2, offset=0, calibration=None):
+        self.imdata, self.thdata = np.array_split(frame, 2)
+        self.rnd = rnd
+        self.camera = camera
+        self.height, self.width, _ = self.imdata.shape
+        self.offset = offset
+        self.calibration = calibration
+        self.transforms = []
+        self.hotspots = []
+
+    def rotate(self, rotation):
+        self.imdata = cv2.rotate(self.imdata, rotation)
+        self.thdata = cv2.rotate(self.thdata, rotation)
+        self.height, self.width, _ = self.imdata.shape
+        self.transforms.append(('rotate', rotation))
+        self.raw = None
+
+    def flip(self):
+        self.imdata = cv2.flip(self.imdata, 1)
+        self.thdata = cv2.flip(self.thdata, 1)
+        self.transforms.append(('flip',))
+        self.raw = None
+
+    def _set_target(self,h,w):
+        self.target_h = int(h)
+        self.target_w = int(w)
+        self.target_temp = np.round(self.temperatures[self.target_h][self.target_w],self.rnd)
+
+    def _convert_raw_temp_data_to_kelvin_topdon(self, thdata):
+        """
+        thdata[..., 1] contains just some offset/calibration in the range about 300 K
+        thdata[..., 0] contains a little temp offset
+        ... /64 is equivalent to the bitshift operation >> 6. This way, the temperature is only encoded via integer numbers.
+        """
+        return (thdata[..., 0] + thdata[..., 1] * 256) / 64 + self.offset
+
+    def _raw_thermal(self):
+        """Raw uint16 sensor values (th0 + th1 * 256), computed once per frame."""
+        if getattr(self, 'raw', None) is None:
+            raw = self.thdata[..., 1].astype(np.uint16)
+            raw <<= 8
+            raw |= self.thdata[..., 0]
+            self.raw = raw
+        return self.raw
+
+    def _get_celsius_temperatures(self, out=None):
+        """
+        One multiply-add per pixel on the raw values: the per-pixel calibration maps if loaded,
+        otherwise the nominal 1/64 K gain with the Kelvin->Celsius shift folded into the offset.
+        `out` is an optional preallocated float64 array of the (rotated) frame shape.
+        """
+        raw = self._raw_thermal()
+        if self.calibration is not None:
+            return self.calibration.apply(raw, self.transforms, self.offset, out=out)
+        temperatures = np.multiply(raw, 1 / 64, out=out)
+        temperatures += self.offset - 273.15
+        return temperatures
+
+    def _process_frame(self, out=None):
+        # converting kelvon to celsius
+        if self.camera['name'] == 'TC001':
+            self.temperatures = self._get_celsius_temperatures(out)
+        else:
+            raise Exception('Unknown camera')
+        
+    
+        self.maxtemp, self.mintemp, self.avgtemp = [np.round(k,self.rnd) for k in [self.temperatures.max(), self.temperatures.min(), self.temperatures.mean()]]
+
+    def _detect_hotspots(self, threshold=2, min_area=4, max_blobs=8):
+        """
+        Finds connected regions warmer than avg + threshold.
+
+        The temperature plane is thresholded, labelled with connectedComponentsWithStats and the
+        per-blob peak and mean temperature are reduced over the sorted labels, so no per-blob loop
+        touches the full frame.
+
+        Returns:
+            list: dicts with area, centroid, bounding box (sensor pixels), peak and mean temperature,
+                  hottest first, at most `max_blobs`.
+        """
+        mask = (self.temperatures > self.avgtemp + threshold).astype(np.uint8)
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if n <= 1:
+            self.hotspots = []
+            return self.hotspots
+
+        flat_labels = labels.ravel()
+        selected = flat_labels > 0
+        blob_labels = flat_labels[selected]
+        blob_temps = self.temperatures.ravel()[selected]
+        order = np.argsort(blob_labels, kind='stable')
+        blob_labels = blob_labels[order]
+        blob_temps = blob_temps[order]
+        starts = np.flatnonzero(np.r_[True, blob_labels[1:] != blob_labels[:-1]])
+        peaks = np.maximum.reduceat(blob_temps, starts)
+        means = np.add.reduceat(blob_temps, starts) / np.diff(np.r_[starts, len(blob_temps)])
+
+        hotspots = []
+        for label, peak, mean in zip(blob_labels[starts], peaks, means):
+            x, y, w, h, area = stats[label]
+            if area < min_area:
+                continue
+            hotspots.append({
+                                'area': int(area),
+                                'x': float(centroids[label][0]),
+                                'y': float(centroids[label][1]),
+                                'bbox': [int(x), int(y), int(w), int(h)],
+                                'peak_temp': float(np.round(peak, self.rnd)),
+                                'mean_temp': float(np.round(mean, self.rnd)),
+                            })
+        hotspots.sort(key=lambda k: k['peak_temp'], reverse=True)
+        self.hotspots = hotspots[:max_blobs]
+        return self.hotspots
+
+    def _compute_histogram(self, low=0.01, high=0.99):
+        """
+        Temperature histogram from a single bincount over the raw uint16 values (1/64 K resolution).
+
+        Sets the robust percentiles (p1/p99 by default) as temperatures, a 1 K histogram for
+        telemetry and the matching percentiles of the luma plane that drive the auto contrast.
+        """
+        if self.calibration is not None:
+            # calibrated temperatures quantized back to the 1/64 K grid of the raw values
+            raw = np.clip(np.rint((self.temperatures + 273.15 - self.offset) * 64), 0, 65535).astype(np.uint16)
+        else:
+            raw = self._raw_thermal()
+
+        counts = np.bincount(raw.ravel())
+        cdf = np.cumsum(counts)
+        lo, hi = np.searchsorted(cdf, [low * cdf[-1], high * cdf[-1]])
+        to_celsius = lambda k: np.round(k / 64 + self.offset - 273.15, self.rnd)
+        self.p_low, self.p_high = to_celsius(lo), to_celsius(hi)
+
+        # 1 K bins: 64 raw values per bin
+        first = int(np.flatnonzero(counts)[0]) // 64
+        padded = np.zeros((len(counts) + 63) // 64 * 64, dtype=counts.dtype)
+        padded[:len(counts)] = counts
+        self.histogram = {
+                            'start': float(to_celsius(first * 64)),
+                            'bin_width': 1.0,
+                            'counts': padded[first * 64:].reshape(-1, 64).sum(axis=1).tolist(),
+                         }
+
+        luma_cdf = np.cumsum(np.bincount(self.imdata[..., 0].ravel(), minlength=256))
+        self.luma_range = tuple(int(k) for k in np.searchsorted(luma_cdf, [low * luma_cdf[-1], high * luma_cdf[-1]]))
+        return self.histogram
+
+    def _get_data(self, newWidth):
+        self.maxtemp_index = divmod(self.temperatures.argmax(), self.width)
+        self.mintemp_index = divmod(self.temperatures.argmin(), self.width)
+        
+        img_data = {
+                'avg_temp': self.avgtemp,
+                'max_temp': self.maxtemp,
+                'min_temp': self.mintemp,
+                'target_temp'    : self.target_temp,
+                'max_temp_x': int(self.maxtemp_index[0]*newWidth/self.width),
+                'max_temp_y': int(self.maxtemp_index[1]*newWidth/self.width),
+                'min_temp_x': int(self.mintemp_index[0]*newWidth/self.width),
+                'min_temp_y': int(self.mintemp_index[1]*newWidth/self.width),
+                'target_x': int(self.target_h*newWidth/self.width),
+                'target_y': int(self.target_w*newWidth/self.width),
+                'hotspots': [scale_hotspot(k, newWidth/self.width) for k in self.hotspots],
+            }
+        if hasattr(self, 'p_low'):
+            img_data['p1_temp'] = self.p_low
+            img_data['p99_temp'] = self.p_high
+        return img_data
+
+class ColorMapper:
+    colormaps = {
+                    0: (cv2.COLORMAP_JET, 'Jet'),
+                    1: (cv2.COLORMAP_HOT, 'Hot'),
+                    2: (cv2.COLORMAP_MAGMA, 'Magma'),
+                    3: (cv2.COLORMAP_INFERNO, 'Inferno'),
+                    4: (cv2.COLORMAP_PLASMA, 'Plasma'),
+                    5: (cv2.COLORMAP_BONE, 'Bone'),
+                    6: (cv2.COLORMAP_SPRING, 'Spring'),
+                    7: (cv2.COLORMAP_AUTUMN, 'Autumn'),
+                    8: (cv2.COLORMAP_VIRIDIS, 'Viridis'),
+                    9: (cv2.COLORMAP_PARULA, 'Parula'),
+                    10: (cv2.COLORMAP_RAINBOW, 'Inv Rainbow'),
+                }
+
+    def __init__(self):
+        """
+        Maps the luma plane to a colormap in one pass. Contrast (alpha) or the automatic
+        percentile stretch are folded into the 256-entry lookup table, replacing the separate
+        YUYV->BGR conversion and convertScaleAbs passes.
+        """
+        self._base = {}
+        self._luts = {}
+
+    def name(self, colormap):
+        return self.colormaps.get(colormap, self.colormaps[0])[1]
+
+    def _base_lut(self, colormap):
+        if colormap not in self._base:
+            lut = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), self.colormaps.get(colormap, self.colormaps[0])[0])
+            if colormap == 10:  # Sonderfall für "Inv Rainbow"
+                lut = np.ascontiguousarray(lut[..., ::-1])
+            self._base[colormap] = lut
+        return self._base[colormap]
+
+    @staticmethod
+    def mapping(alpha=1.0, auto_range=None):
+        """
+        Luma -> intensity mapping. Without auto_range it reproduces YUYV->BGR (video range,
+        1.164 * (Y - 16)) followed by convertScaleAbs(alpha); with auto_range (low, high) the
+        range is stretched to 0..255.
+        """
+        y = np.arange(256, dtype=np.float64)
+        if auto_range is not None:
+            low, high = auto_range
+            values = (y - low) * 255.0 / max(high - low, 1)
+        else:
+            values = np.clip(np.round(1.164 * (y - 16)), 0, 255) * alpha
+        return np.clip(np.round(values), 0, 255).astype(np.uint8)
+
+    def lut(self, colormap, alpha=1.0, auto_range=None):
+        key = (colormap, alpha, auto_range)
+        if key not in self._luts:
+            if len(self._luts) > 64:
+                self._luts.clear()
+            self._luts[key] = np.ascontiguousarray(self._base_lut(colormap)[self.mapping(alpha, auto_range)])
+        return self._luts[key]
+
+    def apply(self, gray, colormap, alpha=1.0, auto_range=None):
+        return cv2.applyColorMap(gray, self.lut(colormap, alpha, auto_range))
+
+def scale_hotspot(hotspot, factor):
+    """Scales the pixel coordinates of a hotspot from sensor to display size."""
+    x, y, w, h = hotspot['bbox']
+    return dict(hotspot,
+                x=int(hotspot['x'] * factor),
+                y=int(hotspot['y'] * factor),
+                bbox=[int(x * factor), int(y * factor), int(w * factor), int(h * factor)])
+
+def flatten_img_data(img_data, max_hotspots=3):
+    """
+    Flattens img_data for tabular export (xlsx): the hotspot list becomes the count plus
+    hotspot<i>_* columns for the hottest `max_hotspots` blobs.
+    """
+    data = {k: v for k, v in img_data.items() if k != 'hotspots'}
+    hotspots = img_data.get('hotspots', [])
+    data['hotspots'] = len(hotspots)
+    for i, hotspot in enumerate(hotspots[:max_hotspots], start=1):
+        for key in ['peak_temp', 'mean_temp', 'area', 'x', 'y']:
+            data[f'hotspot{i}_{key}'] = hotspot[key]
+    return data
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+active consumers of the frame pipeline and the rate they need
+"""
+import time
+import threading
+
+class Consumer:
+    def __init__(self, name, output, fps=None, ttl=None):
+        """
+        Args:
+            name: eindeutiger Name (z.B. Socket.IO-sid, 'qt', 'recorder').
+            output (str): benötigte Ausgabe der Pipeline (z.B. 'heatmap', 'web').
+            fps (float): gewünschte Bildrate, None = jeder Frame.
+            ttl (float): Sekunden bis zum automatischen Entfernen, None = bis remove().
+        """
+        self.name = name
+        self.output = output
+        self.fps = fps
+        self.expires = time.monotonic() + ttl if ttl else None
+
+    def data(self):
+        return {
+                'name': str(self.name),
+                'output': self.output,
+                'fps': self.fps,
+                'expires_in': round(self.expires - time.monotonic(), 1) if self.expires else None,
+               }
+
+class Demand:
+    def __init__(self):
+        """
+        Verwaltet, wer welche Ausgabe der Pipeline gerade braucht. Die Schleife fragt pro Frame
+        mit due() nach und rechnet eine Stufe nur, wenn sie jemand braucht, mit der höchsten
+        Bildrate aller ihrer Abnehmer. Umrechnung und Statistik laufen unabhängig davon immer.
+        """
+        self.consumers = {}
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, output, fps=None, ttl=None):
+        """Meldet einen Abnehmer an bzw. erneuert ihn (z.B. eine Abfrage mit `ttl`)."""
+        with self._lock:
+            self.consumers[name] = Consumer(name, output, fps, ttl)
+
+    def remove(self, name):
+        with self._lock:
+            self.consumers.pop(name, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        for name in [k for k, v in self.consumers.items() if v.expires is not None and v.expires < now]:
+            del self.consumers[name]
+
+    def _active(self, output):
+        self._expire()
+        return [k for k in self.consumers.values() if k.output == output]
+
+    def active(self, output):
+        with self._lock:
+            return len(self._active(output)) > 0
+
+    def rate(self, output):
+        """
+        Returns:
+            float: höchste gewünschte Bildrate, None = jeder Frame, 0 = kein Abnehmer.
+        """
+        with self._lock:
+            consumers = self._active(output)
+        if not consumers:
+            return 0
+        if any(k.fps is None for k in consumers):
+            return None
+        return max(k.fps for k in consumers)
+
+    def due(self, output, now=None):
+        """True, wenn `output` für den aktuellen Frame gebraucht wird (hält die Bildrate im Mittel ein)."""
+        fps = self.rate(output)
+        if fps is None:
+            return True
+        if fps <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        interval = 1 / fps
+        scheduled = self._next.get(output, 0)
+        if now < scheduled:
+            return False
+        # im Takt bleiben, nach einer Pause aber nicht nachholen
+        self._next[output] = scheduled + interval if now - scheduled < interval else now + interval
+        return True
+
+    def summary(self):
+        with self._lock:
+            self._expire()
+            return [k.data() for k in self.consumers.values()]
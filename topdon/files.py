@@ -4,6 +4,15 @@
 file manager
 """
 import os
+import bisect
+import json
+import queue
+import logging
+import threading
+import zipfile
+from datetime import datetime
+
+log = logging.getLogger(__name__)
 
 class FileTypeGeneric:
     def __init__(self, name: str, ending: str, filename: str, path: str):
@@ -11,15 +20,78 @@ class FileTypeGeneric:
         self.ending = ending
         self.filename = filename
         self.path = path
+        self._metadata = None
+
+    @property
+    def meta_path(self):
+        """
+        Pfad der Metadaten-Datei. Sie liegt in einem eigenen Unterverzeichnis, damit das Schreiben
+        die mtime des Media-Verzeichnisses nicht ändert (sonst liest refresh() es neu ein).
+        """
+        return os.path.join(os.path.dirname(self.path), '.metadata', f'{self.filename}.json')
 
     def delete(self):
         """Löscht die Datei, die mit diesem FileTypeGeneric-Objekt verknüpft ist."""
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
         if os.path.exists(self.path):
             os.remove(self.path)
             return True
         else:
             return False
 
+    def _compute_metadata(self):
+        """Dateityp-spezifische Metadaten, wird von den Unterklassen erweitert."""
+        return {}
+
+    def metadata(self, compute=True):
+        """
+        Gibt die Metadaten der Datei zurück. Sie werden nur einmal pro Datei berechnet und
+        im Speicher sowie als Metadaten-Datei neben der Datei gecacht (gültig solange sich
+        Größe und mtime nicht ändern).
+
+        Args:
+            compute (bool): False = nichts berechnen; sind die Metadaten noch nicht gecacht,
+                            nur Größe und Datum mit 'pending': True.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stamp = [stat.st_size, stat.st_mtime_ns]
+
+        if self._metadata is not None and self._metadata.get('stamp') == stamp:
+            return self._metadata['meta']
+
+        try:
+            with open(self.meta_path, 'r') as file:
+                cached = json.load(file)
+            if cached.get('stamp') == stamp:
+                self._metadata = cached
+                return cached['meta']
+        except (OSError, ValueError):
+            pass
+
+        meta = {
+                'size': stat.st_size,
+                'created': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+                }
+        if not compute:
+            return dict(meta, pending=True)
+        try:
+            meta.update(self._compute_metadata())
+        except Exception:
+            pass
+
+        self._metadata = {'stamp': stamp, 'meta': meta}
+        try:
+            os.makedirs(os.path.dirname(self.meta_path), exist_ok=True)
+            with open(self.meta_path, 'w') as file:
+                json.dump(self._metadata, file)
+        except OSError:
+            pass
+        return meta
+
     def data(self):
         """Gibt die Dateiinformationen als Dictionary zurück."""
         return {
@@ -44,6 +116,20 @@ class VideoFile(FileTypeGeneric):
     def __init__(self, name: str, filename: str, path: str):
         super().__init__(name, 'mp4', filename, path)
 
+    def _compute_metadata(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.path)
+        try:
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+        finally:
+            cap.release()
+        return {
+                'frames': frames,
+                'duration': round(frames / fps, 2) if fps > 0 else None,
+                }
+
 class ImageFile(FileTypeGeneric):
     def __init__(self, name: str, filename: str, path: str):
         super().__init__(name, 'png', filename, path)
@@ -51,18 +137,58 @@ class ImageFile(FileTypeGeneric):
 class DataFile(FileTypeGeneric):
     def __init__(self, name: str, filename: str, path: str):
         super().__init__(name, 'xlsx', filename, path)
+
+    def _compute_metadata(self):
+        import pandas as pd
+
+        # Snapshots und Aufnahmen speichern die Werte jeweils im ersten Sheet
+        DF_data = pd.read_excel(self.path, sheet_name=0)
+        summary = {}
+        for key, func in [('max_temp', 'max'), ('min_temp', 'min'), ('avg_temp', 'mean')]:
+            if key in DF_data.columns and len(DF_data) > 0:
+                summary[key] = round(float(getattr(DF_data[key], func)()), 2)
+        return {'rows': len(DF_data), 'temperatures': summary}
         
+class RawFile(FileTypeGeneric):
+    def __init__(self, name: str, filename: str, path: str):
+        super().__init__(name, 'npz', filename, path)
+
+class _ZipStream:
+    """Nicht-seekbarer Schreibpuffer, aus dem die geschriebenen ZIP-Daten stückweise entnommen werden."""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
 class FileBundle:
-    def __init__(self, record: FileTypeGeneric, data: DataFile):
+    def __init__(self, record: FileTypeGeneric, data: DataFile, raw: RawFile = None):
         if not self.is_valid_bundle(record, data):
             raise ValueError("Invalid file bundle: names must match and record must be either VideoFile or ImageFile.")
         
         self.record = record
         self.data = data
+        self.raw = raw if raw is not None and raw.name == record.name else None
         self.name = record.name
 
     def delete(self):
-        """Löscht die Dateien im Bundle (record und data)."""
+        """Löscht die Dateien im Bundle (record, data und ggf. raw)."""
+        if self.raw is not None:
+            self.raw.delete()
         return self.record.delete() and self.data.delete()
 
     def get_data(self):
@@ -70,12 +196,35 @@ class FileBundle:
         return {
             'record': self.record.data(),
             'data': self.data.data(),
+            'raw': self.raw.data() if self.raw is not None else None,
             'name': self.name,
         }
 
     def get_file_list(self):
         """Gibt die Dateiobjekte als Liste zurück."""
-        return [self.record, self.data]
+        return [k for k in [self.record, self.data, self.raw] if k is not None]
+
+    def iter_zip(self, chunk_size=1024 * 1024):
+        """
+        Erzeugt ein ZIP-Archiv mit record- und data-Datei stückweise, ohne es im Speicher
+        oder in einer temporären Datei aufzubauen. Die Dateien werden unkomprimiert
+        gespeichert (MP4, PNG und XLSX sind bereits komprimiert).
+
+        Yields:
+            bytes: Die nächsten Bytes des Archivs.
+        """
+        stream = _ZipStream()
+        with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+            for file_info in self.get_file_list():
+                with open(file_info.path, 'rb') as source, archive.open(zipfile.ZipInfo.from_file(file_info.path, file_info.filename), mode='w', force_zip64=True) as target:
+                    while True:
+                        data = source.read(chunk_size)
+                        if not data:
+                            break
+                        target.write(data)
+                        yield stream.pop()
+                yield stream.pop()
+        yield stream.pop()
 
     def __repr__(self):
         return f"FileBundleGeneric({self.get_data()})"
@@ -89,86 +238,292 @@ class FileBundle:
         )
 
 class FileManager:
-    def __init__(self, base_path: str, slug: str, file_types=None):
+    file_classes = {
+                    'mp4': VideoFile,
+                    'png': ImageFile,
+                    'xlsx': DataFile,
+                    'npz': RawFile,
+                    }
+    # obere Grenze für wartende Metadaten-Berechnungen; weitere werden beim nächsten Abruf erneut angefragt
+    max_pending_metadata = 256
+
+    def __init__(self, base_path: str, slug: str, file_types=None, background_metadata=True):
+        """
+        Args:
+            background_metadata (bool): Metadaten neu registrierter und abgerufener Dateien in einem
+                                        Hintergrund-Thread berechnen (False = erst beim Abruf, im Aufrufer).
+                                        Beim Einlesen des Verzeichnisses wird nichts vorberechnet.
+        """
         self.base_path = base_path
         self.slug = slug
-        self.file_types = file_types if file_types is not None else ['xlsx', 'mp4', 'png']
+        self.file_types = file_types if file_types is not None else ['xlsx', 'mp4', 'png', 'npz']
         
         # Sicherstellen, dass der Basis-Pfad existiert
         if not os.path.exists(self.base_path):
             os.makedirs(self.base_path)
 
+        # In-Memory Katalog: filename -> FileTypeGeneric, name -> {ending: FileTypeGeneric}
+        self._lock = threading.RLock()
+        self._files = {}
+        self._names = {}
+        self._bundles = {}
+        # Index der Bundles, aufsteigend sortiert nach (Zeitstempel, Name); Namen ohne Zeitstempel
+        # (datetime.max) stehen am Ende. Dazu die Dateien jedes Bundles, sortiert nach Dateiname.
+        self._index = []
+        self._index_keys = {}
+        self._untimed = 0
+        self._bundle_files = {}
+        self._file_count = 0
+        self._dir_mtime = None
+        self.version = 0
+
+        # Metadaten werden bei Bedarf im Hintergrund berechnet, nicht im Request
+        self._meta_queue = queue.Queue() if background_metadata else None
+        self._meta_pending = set()
+        self.refresh(force=True)
+        if self._meta_queue is not None:
+            threading.Thread(target=self._work_metadata, daemon=True).start()
+
+    def _create_file_info(self, file: str):
+        """Erstellt das passende FileTypeGeneric-Objekt für einen Dateinamen oder None."""
+        if not file.startswith(self.slug):
+            return None
+        name, ext = os.path.splitext(file)
+        ext = ext[1:]  # Entferne den Punkt von der Endung
+        if ext not in self.file_types or ext not in self.file_classes:
+            return None  # Unbekannter Dateityp, überspringen
+        return self.file_classes[ext](name=name, filename=file, path=os.path.join(self.base_path, file))
+
+    def _dir_stamp(self):
+        try:
+            return os.stat(self.base_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _update_bundle(self, name: str):
+        """Aktualisiert das Bundle zu `name` nach einer Änderung im Katalog."""
+        entries = self._names.get(name, {})
+        record = entries.get('mp4') or entries.get('png')
+        data = entries.get('xlsx')
+        is_listed = name in self._bundles
+
+        if is_listed:
+            self._file_count -= len(self._bundle_files[name])
+        if record is not None and data is not None:
+            bundle = self._bundles[name] = FileBundle(record=record, data=data, raw=entries.get('npz'))
+            self._bundle_files[name] = sorted(bundle.get_file_list(), key=lambda x: x.filename)
+            self._file_count += len(self._bundle_files[name])
+            if not is_listed:
+                t = self._parse_time(name)
+                key = self._index_keys[name] = (t or datetime.max, name)
+                bisect.insort(self._index, key)
+                self._untimed += t is None
+        elif is_listed:
+            del self._bundles[name]
+            del self._bundle_files[name]
+            key = self._index_keys.pop(name)
+            index = bisect.bisect_left(self._index, key)
+            if index < len(self._index) and self._index[index] == key:
+                del self._index[index]
+            self._untimed -= key[0] == datetime.max
+
+    def _parse_time(self, name: str):
+        """Liest den Zeitstempel aus dem Namen (<slug>_%Y%m%d-%H%M%S)."""
+        stamp = name[len(self.slug) + 1:]
+        # wie strptime(stamp, "%Y%m%d-%H%M%S"), aber ein Vielfaches schneller (einmal pro Bundle im Index)
+        if len(stamp) != 15 or stamp[8] != '-' or not (stamp[:8] + stamp[9:]).isdigit():
+            return None
+        try:
+            return datetime(int(stamp[:4]), int(stamp[4:6]), int(stamp[6:8]), int(stamp[9:11]), int(stamp[11:13]), int(stamp[13:]))
+        except ValueError:
+            return None
+
+    def _add(self, file: str, update=True):
+        if file in self._files:
+            return self._files[file]
+        file_info = self._create_file_info(file)
+        if file_info is None:
+            return None
+        self._files[file] = file_info
+        self._names.setdefault(file_info.name, {})[file_info.ending] = file_info
+        if update:
+            self._update_bundle(file_info.name)
+        self.version += 1
+        return file_info
+
+    def _remove(self, file: str, update=True):
+        file_info = self._files.pop(file, None)
+        if file_info is None:
+            return None
+        entries = self._names.get(file_info.name, {})
+        entries.pop(file_info.ending, None)
+        if not entries:
+            self._names.pop(file_info.name, None)
+        if update:
+            self._update_bundle(file_info.name)
+        self.version += 1
+        return file_info
+
+    def _queue_metadata(self, file_info: FileTypeGeneric):
+        if self._meta_queue is None:
+            return
+        with self._lock:
+            if file_info.filename not in self._meta_pending and len(self._meta_pending) < self.max_pending_metadata:
+                self._meta_pending.add(file_info.filename)
+                self._meta_queue.put(file_info)
+
+    def _work_metadata(self):
+        while True:
+            file_info = self._meta_queue.get()
+            try:
+                meta = file_info.metadata(compute=False)
+                if meta is not None and meta.get('pending'):
+                    file_info.metadata()
+                    with self._lock:
+                        self.version += 1  # geänderte Dateiliste (ETag)
+            except Exception as e:
+                log.warning(f"Metadata for {file_info.filename} failed: {e}")
+            finally:
+                with self._lock:
+                    self._meta_pending.discard(file_info.filename)
+
+    def metadata(self, file_info: FileTypeGeneric):
+        """
+        Metadaten ohne Berechnung im Aufrufer: noch nicht (oder nach einer Änderung nicht mehr)
+        gecachte Metadaten werden im Hintergrund berechnet, bis dahin 'pending': True.
+        """
+        if self._meta_queue is None:
+            return file_info.metadata()
+        meta = file_info.metadata(compute=False)
+        if meta is not None and meta.get('pending'):
+            self._queue_metadata(file_info)
+        return meta
+
+    def refresh(self, force=False):
+        """
+        Gleicht den Katalog mit dem Verzeichnis ab. Ohne `force` wird nur neu eingelesen,
+        wenn sich die mtime des Verzeichnisses geändert hat (externe Änderungen).
+        """
+        stamp = self._dir_stamp()
+        with self._lock:
+            if not force and stamp == self._dir_mtime:
+                return False
+            current = set(os.listdir(self.base_path)) if stamp is not None else set()
+            # jedes betroffene Bündel nur einmal im Index nachführen
+            touched = set()
+            for file in set(self._files) - current:
+                file_info = self._remove(file, update=False)
+                if file_info is not None:
+                    touched.add(file_info.name)
+            for file in current - set(self._files):
+                file_info = self._add(file, update=False)
+                if file_info is not None:
+                    touched.add(file_info.name)
+            for name in touched:
+                self._update_bundle(name)
+            self._dir_mtime = stamp
+            return True
+
+    def add_file(self, path: str):
+        """Registriert eine neu geschriebene Datei im Katalog, ohne das Verzeichnis neu einzulesen."""
+        if not os.path.exists(path):
+            return None
+        with self._lock:
+            file_info = self._add(os.path.basename(path))
+        if file_info is not None:
+            self._queue_metadata(file_info)
+        return file_info
+
+    def remove_file(self, path: str):
+        """Entfernt eine Datei aus dem Katalog."""
+        with self._lock:
+            self._remove(os.path.basename(path))
+
+    def delete_bundle(self, bundle: FileBundle):
+        """Löscht die Dateien eines Bundles und entfernt sie aus dem Katalog."""
+        try:
+            return bundle.delete()
+        finally:
+            with self._lock:
+                for file in bundle.get_file_list():
+                    self._remove(file.filename)
+
     def _get_files_list(self):
         """Gibt eine Liste von FileTypeGeneric-Objekten zurück, die Informationen zu den Dateien enthalten."""
-        files_info = []
-        for file in os.listdir(self.base_path):
-            if file.startswith(self.slug) and any(file.endswith(ext) for ext in self.file_types):
-                name, ext = os.path.splitext(file)
-                ext = ext[1:]  # Entferne den Punkt von der Endung
-                path = os.path.join(self.base_path, file)
-
-                # Erstelle das entsprechende FileTypeGeneric-Objekt basierend auf der Endung
-                if ext == 'mp4':
-                    file_info = VideoFile(name=name, filename=file, path=path)
-                elif ext == 'png':
-                    file_info = ImageFile(name=name, filename=file, path=path)
-                elif ext == 'xlsx':
-                    file_info = DataFile(name=name, filename=file, path=path)
-                else:
-                    continue  # Unbekannter Dateityp, überspringen
-
-                files_info.append(file_info)
-        files_info.sort(key=lambda x: x.filename)
-        return files_info
+        self.refresh()
+        with self._lock:
+            return [self._files[k] for k in sorted(self._files)]
 
     def get_files(self):
         """Erstellt Bundles aus Dateien mit demselben Namen."""
-        files_info = self._get_files_list()
-        bundles = []
-        
-        # Erstelle ein Dictionary für DataFiles, um den Zugriff zu erleichtern
-        data_files = {file.name: file for file in files_info if isinstance(file, DataFile)}
-
-        # Iteriere über die Dateien und erstelle Bundles
-        for file in files_info:
-            if isinstance(file, VideoFile) or isinstance(file, ImageFile):
-                # Überprüfe, ob ein passendes DataFile existiert
-                if file.name in data_files:
-                    data_file = data_files[file.name]
-                    bundle = FileBundle(record=file, data=data_file)
-                    bundles.append(bundle)
-
-        return bundles
+        self.refresh()
+        with self._lock:
+            return [self._bundles[name] for _, name in self._index]
 
     def get_files_list(self):
         """Gibt eine Liste aller DataFile-Objekte aus allen Bundles zurück."""
-        bundles = self.get_files()
-        data_files_list = []
-        
-        for bundle in bundles:
-            data_files_list.extend(bundle.get_file_list())
-            
-        data_files_list.sort(key=lambda x: x.filename, reverse=True)
-        return data_files_list
+        return self.query()[0]
+
+    def query(self, offset=0, limit=None, types=None, start=None, end=None, order='desc'):
+        """
+        Gibt eine gefilterte und sortierte Seite der Dateiliste zurück.
+
+        Args:
+            offset (int): Anzahl der übersprungenen Einträge.
+            limit (int): Maximale Anzahl an Einträgen (None = alle).
+            types (list): Erlaubte Dateiendungen, z.B. ['mp4', 'png'] (None = alle).
+            start (datetime): Nur Dateien ab diesem Zeitpunkt.
+            end (datetime): Nur Dateien bis zu diesem Zeitpunkt.
+            order (str): 'desc' (neueste zuerst) oder 'asc'.
+
+        Returns:
+            tuple: (Liste der FileTypeGeneric-Objekte, Gesamtanzahl nach Filterung)
+        """
+        self.refresh()
+        with self._lock:
+            lo, hi = 0, len(self._index)
+            if start is not None or end is not None:
+                # Namen ohne Zeitstempel fallen bei einem Zeitfilter heraus
+                hi = len(self._index) - self._untimed
+                if start is not None:
+                    lo = bisect.bisect_left(self._index, (start,))
+                if end is not None:
+                    hi = min(hi, bisect.bisect_right(self._index, (end, '\U0010ffff')))
+            positions = range(lo, hi) if order == 'asc' else range(hi - 1, lo - 1, -1)
+            # ohne Filter ist die Gesamtanzahl bekannt und die Suche endet mit der Seite
+            total = self._file_count if not types and (lo, hi) == (0, len(self._index)) else None
+            stop = None if limit is None else offset + limit
+
+            page = []
+            count = 0
+            for i in positions:
+                files = self._bundle_files[self._index[i][1]]
+                if types:
+                    files = [k for k in files if k.ending in types]
+                n = len(files)
+                if n and count + n > offset and (stop is None or count < stop):
+                    ordered = files if order == 'asc' else files[::-1]
+                    page.extend(ordered[max(offset - count, 0):None if stop is None else stop - count])
+                count += n
+                if total is not None and stop is not None and count >= stop:
+                    break
+            return page, count if total is None else total
 
     def get_file(self, filename: str):
         """Gibt das FileInfo-Objekt der entsprechenden Datei zurück, oder None, falls es nicht existiert."""
-        files_info = self.get_files_list()
-        for file_info in files_info:
-            if file_info.filename == filename:
-                return file_info
-        return None
+        self.refresh()
+        with self._lock:
+            file_info = self._files.get(filename)
+            if file_info is None or file_info.name not in self._bundles:
+                return None
+            return file_info
 
     def get_bundle(self, filename: str):
         """Gibt das passende Bundle für die angegebene Datei zurück, oder None, falls es nicht existiert."""
         name, ext = os.path.splitext(filename)
-        bundles = self.get_files()
-        
-        for bundle in bundles:
-            if bundle.name == name:
-                return bundle
-        
-        return None
+        self.refresh()
+        with self._lock:
+            return self._bundles.get(name)
     
 
 if __name__ == "__main__":
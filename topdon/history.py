@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rolling history of frame statistics at several resolutions
+"""
+import time
+import threading
+
+import numpy as np
+
+class HistoryLevel:
+    def __init__(self, name: str, resolution, capacity: int, n_metrics: int):
+        """
+        Ringpuffer einer Auflösungsstufe. Pro Eintrag werden Zeit sowie min/max/mean jeder
+        Metrik gespeichert; alle Arrays werden beim Start angelegt.
+
+        Args:
+            name (str): Name der Stufe (z.B. 'frame', 'second', 'minute').
+            resolution (float): Bucket-Größe in Sekunden, None = jeder Frame ein Eintrag.
+            capacity (int): Anzahl der Einträge.
+            n_metrics (int): Anzahl der Metriken.
+        """
+        self.name = name
+        self.resolution = resolution
+        self.capacity = capacity
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.min = np.zeros((capacity, n_metrics), dtype=np.float64)
+        self.max = np.zeros((capacity, n_metrics), dtype=np.float64)
+        self.mean = np.zeros((capacity, n_metrics), dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+        # laufender Bucket
+        self.bucket = None
+        self.acc_min = np.zeros(n_metrics)
+        self.acc_max = np.zeros(n_metrics)
+        self.acc_sum = np.zeros(n_metrics)
+        self.acc_n = 0
+
+    @property
+    def nbytes(self):
+        return self.t.nbytes + self.min.nbytes + self.max.nbytes + self.mean.nbytes
+
+    def _commit(self, t, mn, mx, mean):
+        i = self.head
+        self.t[i] = t
+        self.min[i] = mn
+        self.max[i] = mx
+        self.mean[i] = mean
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def add(self, t, values):
+        if self.resolution is None:
+            self._commit(t, values, values, values)
+            return
+
+        bucket = int(t // self.resolution)
+        if self.bucket is not None and bucket != self.bucket:
+            self._commit(self.bucket * self.resolution, self.acc_min, self.acc_max, self.acc_sum / self.acc_n)
+            self.bucket = None
+
+        if self.bucket is None:
+            self.bucket = bucket
+            self.acc_min[:] = values
+            self.acc_max[:] = values
+            self.acc_sum[:] = values
+            self.acc_n = 1
+        else:
+            np.minimum(self.acc_min, values, out=self.acc_min)
+            np.maximum(self.acc_max, values, out=self.acc_max)
+            self.acc_sum += values
+            self.acc_n += 1
+
+    def _segments(self):
+        """Zusammenhängende Bereiche des Rings in chronologischer Reihenfolge."""
+        if self.count < self.capacity:
+            return [(0, self.head)]
+        return [(self.head, self.capacity), (0, self.head)]
+
+    def query(self, since=None, until=None):
+        """
+        Gibt die Einträge im Zeitraum [since, until] zurück. Die Grenzen werden per
+        Binärsuche in den (sortierten) Ringsegmenten bestimmt, es wird nur geschnitten.
+
+        Returns:
+            tuple: (t, min, max, mean) als Arrays.
+        """
+        parts = []
+        for a, b in self._segments():
+            t = self.t[a:b]
+            lo = a + (np.searchsorted(t, since, side='left') if since is not None else 0)
+            hi = a + (np.searchsorted(t, until, side='right') if until is not None else b - a)
+            if hi > lo:
+                parts.append(slice(lo, hi))
+        if len(parts) == 0:
+            empty = np.zeros((0, self.min.shape[1]))
+            return np.zeros(0), empty, empty, empty
+        return tuple(np.concatenate([k[s] for s in parts]) for k in [self.t, self.min, self.max, self.mean])
+
+class StatsHistory:
+    def __init__(self, metrics=('min_temp', 'avg_temp', 'max_temp'), fps=25.0, levels=None):
+        """
+        Zeitreihen der Frame-Statistiken mit festem Speicherbedarf: standardmäßig jeder Frame
+        der letzten Minute, Sekundenwerte der letzten Stunde und Minutenwerte der letzten Woche.
+
+        Args:
+            metrics (tuple): Schlüssel aus img_data, die aufgezeichnet werden.
+            fps (float): Framerate, bestimmt die Größe der Frame-Stufe.
+            levels (list): Optional eigene Stufen als (name, resolution, capacity).
+        """
+        self.metrics = list(metrics)
+        levels = levels or [
+                            ('frame', None, int(60 * fps)),
+                            ('second', 1.0, 3600),
+                            ('minute', 60.0, 7 * 24 * 60),
+                           ]
+        self.levels = {name: HistoryLevel(name, resolution, capacity, len(self.metrics)) for name, resolution, capacity in levels}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(k.nbytes for k in self.levels.values())
+
+    def add(self, img_data, timestamp=None):
+        """
+        Fügt die Statistik eines Frames hinzu.
+
+        Args:
+            img_data (dict): Bilddaten des Frames.
+            timestamp (float): time.monotonic() der Aufnahme, wird in Unix-Zeit umgerechnet.
+        """
+        t = time.time() if timestamp is None else time.time() - (time.monotonic() - timestamp)
+        values = np.array([float(img_data[k]) for k in self.metrics])
+        with self._lock:
+            for level in self.levels.values():
+                level.add(t, values)
+
+    def query(self, level='second', since=None, until=None):
+        """
+        Gibt die Zeitreihe einer Stufe als dict zurück:
+        {'level', 't': [...], '<metric>': {'min': [...], 'max': [...], 'mean': [...]}}
+        """
+        if level not in self.levels:
+            raise ValueError(f"Unknown history level {level}, use one of {list(self.levels)}")
+        with self._lock:
+            t, mn, mx, mean = self.levels[level].query(since, until)
+        data = {'level': level, 't': np.round(t, 3).tolist()}
+        for i, metric in enumerate(self.metrics):
+            data[metric] = {
+                            'min': np.round(mn[:, i], 2).tolist(),
+                            'max': np.round(mx[:, i], 2).tolist(),
+                            'mean': np.round(mean[:, i], 2).tolist(),
+                           }
+        return data
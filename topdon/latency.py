@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+end-to-end frame latency per client
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+class ClientLatency:
+    metrics = ['capture_to_emit', 'capture_to_receive', 'capture_to_display']
+
+    def __init__(self, max_samples=500):
+        """Die letzten `max_samples` Latenzen (Sekunden) eines Clients pro Messgröße."""
+        self.samples = {k: deque(maxlen=max_samples) for k in self.metrics}
+        self.frames = 0
+        self.last_seen = time.monotonic()
+
+    def add(self, **values):
+        for key, value in values.items():
+            self.samples[key].append(value)
+        self.frames += 1
+        self.last_seen = time.monotonic()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        data = {'frames': self.frames, 'idle_s': round(time.monotonic() - self.last_seen, 1)}
+        for key, samples in self.samples.items():
+            if len(samples) == 0:
+                continue
+            values = np.percentile(np.fromiter(samples, dtype=np.float64), percentiles) * 1000
+            data[key] = {f'p{p}_ms': round(float(v), 1) for p, v in zip(percentiles, values)}
+        return data
+
+class LatencyTracker:
+    def __init__(self, max_frames=256, max_samples=500, client_timeout=300):
+        """
+        Verfolgt die Latenz jedes Frames von der Aufnahme (time.monotonic() im FrameGrabber)
+        bis zum Versand und, über die Rückmeldung des Browsers, bis zur Anzeige.
+
+        Der Browser meldet Empfangs- und Anzeigezeit in seiner eigenen Uhr; verwendet wird nur
+        die Differenz (Dekodieren + Anzeigen). Die Übertragungszeit wird als halbe Umlaufzeit
+        Versand -> Rückmeldung abzüglich dieser Differenz geschätzt, eine Uhrensynchronisation
+        ist damit nicht nötig.
+
+        Args:
+            max_frames (int): Anzahl der gemerkten versendeten Frames (seq -> Zeiten).
+            max_samples (int): Messwerte pro Client für die Perzentile.
+            client_timeout (float): Clients ohne Rückmeldung werden danach vergessen.
+        """
+        self.max_frames = max_frames
+        self.max_samples = max_samples
+        self.client_timeout = client_timeout
+        self.emitted = OrderedDict()
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, client):
+        if client not in self.clients:
+            self.clients[client] = ClientLatency(self.max_samples)
+        return self.clients[client]
+
+    def emit(self, seq, captured, emitted=None):
+        """
+        Merkt sich Aufnahme- und Versandzeit eines (an alle Clients) versendeten Frames. Wird
+        derselbe Frame mehrfach versendet (z.B. an mehrere Darstellungen), gilt der erste Versand.
+        """
+        emitted = time.monotonic() if emitted is None else emitted
+        with self._lock:
+            self.emitted.setdefault(seq, (captured, emitted))
+            while len(self.emitted) > self.max_frames:
+                self.emitted.popitem(last=False)
+
+    def sent(self, client, captured, sent=None):
+        """Direkter Versand an einen Client (MJPEG): nur Aufnahme -> Versand."""
+        sent = time.monotonic() if sent is None else sent
+        with self._lock:
+            self._client(client).add(capture_to_emit=sent - captured)
+
+    def ack(self, client, seq, receive_ms, display_ms, now=None):
+        """
+        Verarbeitet die Rückmeldung eines Browsers zu Frame `seq`.
+
+        Returns:
+            bool: False, wenn der Frame unbekannt (zu alt) ist.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            times = self.emitted.get(seq)
+            if times is None:
+                return False
+            captured, emitted = times
+            display_delay = max((float(display_ms) - float(receive_ms)) / 1000, 0.0)
+            transit = max((now - emitted - display_delay) / 2, 0.0)
+            self._client(client).add(capture_to_emit=emitted - captured,
+                                     capture_to_receive=emitted - captured + transit,
+                                     capture_to_display=emitted - captured + transit + display_delay)
+            return True
+
+    def remove(self, client):
+        with self._lock:
+            self.clients.pop(client, None)
+
+    def summary(self):
+        with self._lock:
+            now = time.monotonic()
+            for client in [k for k, v in self.clients.items() if now - v.last_seen > self.client_timeout]:
+                del self.clients[client]
+            return {str(client): stats.summary() for client, stats in self.clients.items()}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+multi camera server: one capture/analysis process per sensor, one web front end
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+
+import cv2
+
+try:
+    from topdon.core import ThermalFrame
+    from topdon.video import Video, FrameGrabber
+except:
+    from core import ThermalFrame
+    from video import Video, FrameGrabber
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+template_folder = os.path.join(current_dir, 'templates')
+
+def camera_worker(index, camera, frames, stop, config):
+    """
+    Läuft in einem eigenen Prozess pro Kamera: Capture, Auswertung, Rendering und JPEG-Encoding.
+    Ergebnisse werden als (index, seq, timestamp, skipped, jpeg, img_data) in `frames` gelegt.
+    Ist die Queue voll, wird der Frame verworfen (der nächste ist ohnehin aktueller).
+    """
+    try:
+        from topdon.stream import Heatmap
+    except:
+        from stream import Heatmap
+
+    videostore = Video()
+    videostore.open(camera=camera)
+    grabber = FrameGrabber(videostore.cap).start()
+    quality = int(config.get('quality', 80))
+    render_config = config.get('render', {})
+    last_seq = 0
+    try:
+        while not stop.is_set() and grabber.is_alive():
+            captured = grabber.read(last_seq)
+            if captured is None:
+                continue
+            skipped = captured.seq - last_seq - 1 if last_seq > 0 else 0
+            last_seq = captured.seq
+
+            TFrame = ThermalFrame(videostore.camera, captured.frame, offset=config.get('temp_offset', 0))
+            hm = Heatmap(TFrame, **render_config)
+            heatmap = hm.get_frame()
+            ret, buffer = cv2.imencode('.jpg', heatmap, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                continue
+            try:
+                frames.put_nowait((index, captured.seq, captured.timestamp, skipped, buffer.tobytes(), hm.img_data))
+            except queue.Full:
+                pass
+    finally:
+        grabber.stop()
+        videostore.cap.release()
+
+class CameraState:
+    def __init__(self, index, camera):
+        self.index = index
+        self.camera = camera
+        self.seq = 0
+        self.timestamp = None
+        self.jpeg = None
+        self.img_data = None
+        self.frames = 0
+        self.skipped = 0
+        self.fps = 0.0
+
+    def update(self, seq, timestamp, skipped, jpeg, img_data):
+        if self.timestamp is not None and timestamp > self.timestamp:
+            # exponentiell geglättete Framerate
+            self.fps = 0.9 * self.fps + 0.1 / (timestamp - self.timestamp)
+        self.seq = seq
+        self.timestamp = timestamp
+        self.skipped += skipped
+        self.jpeg = jpeg
+        self.img_data = img_data
+        self.frames += 1
+
+    def stats(self):
+        return {
+                'index': self.index,
+                'name': self.camera['name'],
+                'device': str(self.camera['DEVNAME']),
+                'seq': self.seq,
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'fps': round(self.fps, 1),
+                'data': self.img_data,
+                }
+
+class MultiCameraServer:
+    def __init__(self, **kwargs):
+        self.config =   {
+                        'port': 5000,
+                        'cameras': None,
+                        'quality': 80,
+                        'temp_offset': 0,
+                        'render': {},
+                        }
+        self.config.update(kwargs)
+
+        cameras = Video().find_cameras()
+        if self.config['cameras'] is not None:
+            cameras = [k for k in cameras if str(k['DEVNAME']) in [str(d) for d in self.config['cameras']]]
+        if len(cameras) == 0:
+            raise ConnectionError("Could not find camera module")
+
+        self.cameras = [CameraState(index, camera) for index, camera in enumerate(cameras)]
+        self._cond = threading.Condition()
+
+        ctx = mp.get_context('spawn')
+        self.stop_event = ctx.Event()
+        self.frames = ctx.Queue(maxsize=2 * len(cameras))
+        worker_config = {k: self.config[k] for k in ['quality', 'temp_offset', 'render']}
+        self.workers = [ctx.Process(target=camera_worker, args=(state.index, state.camera, self.frames, self.stop_event, worker_config), daemon=True) for state in self.cameras]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+
+    def _collect(self):
+        while not self.stop_event.is_set():
+            try:
+                index, seq, timestamp, skipped, jpeg, img_data = self.frames.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self._cond:
+                self.cameras[index].update(seq, timestamp, skipped, jpeg, img_data)
+                self._cond.notify_all()
+
+    def mjpeg(self, index):
+        state = self.cameras[index]
+        last_seq = 0
+        while not self.stop_event.is_set():
+            with self._cond:
+                self._cond.wait_for(lambda: state.seq > last_seq, timeout=1.0)
+                if state.seq <= last_seq:
+                    continue
+                last_seq, jpeg = state.seq, state.jpeg
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+    def init_webapp(self):
+        from flask import Flask, Response, jsonify, render_template
+
+        app = Flask('Thermal Camera Overview', template_folder=template_folder)
+
+        def get_state(index):
+            if index < 0 or index >= len(self.cameras):
+                return None
+            return self.cameras[index]
+
+        @app.route('/')
+        def index():
+            return render_template('multicam.html', cameras=[k.stats() for k in self.cameras])
+
+        @app.route('/camera/<int:index>')
+        @app.route('/camera/<int:index>/mjpeg')
+        def camera_feed(index):
+            if get_state(index) is None:
+                return jsonify({"error": "Camera not found"}), 404
+            return Response(self.mjpeg(index), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+        @app.route('/camera/<int:index>/stats')
+        def camera_stats(index):
+            state = get_state(index)
+            if state is None:
+                return jsonify({"error": "Camera not found"}), 404
+            return jsonify(state.stats())
+
+        @app.route('/api/cameras')
+        def cameras():
+            return jsonify([k.stats() for k in self.cameras])
+
+        self.app = app
+        return app
+
+    def run(self):
+        self.start()
+        self.init_webapp()
+        try:
+            self.app.run(host='0.0.0.0', port=self.config['port'], threaded=True)
+        finally:
+            self.stop()
+
+def main():
+    try:
+        from topdon.stream import ConfigParser
+    except:
+        from stream import ConfigParser
+
+    parser = argparse.ArgumentParser(description='Thermal Camera Multi Viewer')
+    parser.add_argument('--config', type=str, default='config.yml',
+                        help='Pfad zur Konfigurationsdatei (Standard: config.yml im aktuellen Verzeichnis)')
+    parser.add_argument('--port', type=int, default=None, help='Port des Webservers (Standard: 5000)')
+    args = parser.parse_args()
+
+    config = ConfigParser(args.config).get_config()
+    if args.port is not None:
+        config['port'] = args.port
+
+    MultiCameraServer(**config).run()
+
+if __name__ == "__main__":
+    main()
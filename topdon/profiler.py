@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+on-demand profiling of the running capture/render loops
+"""
+import io
+import os
+import re
+import sys
+import time
+import json
+import pstats
+import signal
+import cProfile
+import threading
+from datetime import datetime
+
+# bis Python 3.11 profiliert cProfile nur den Thread, der es aktiviert; ab 3.12 läuft es über
+# sys.monitoring prozessweit und nur ein Profiler darf gleichzeitig aktiv sein
+PER_THREAD = sys.version_info < (3, 12)
+
+# Wurzelfunktionen der Pipeline-Schritte: (Dateiendung bzw. '~' für Builtins wie cv2, Funktionsname)
+STAGES = {
+            'capture_wait': [('video.py', 'read')],
+            'change': [('change.py', 'check')],
+            'conversion': [('core.py', '_process_frame')],
+            'statistics': [('core.py', '_set_target'), ('core.py', '_detect_hotspots'), ('core.py', '_compute_histogram'),
+                           ('core.py', '_get_data'), ('rules.py', 'evaluate'), ('history.py', 'add')],
+            'resize': [('~', 'resize'), ('~', 'blur')],
+            'colorize': [('core.py', 'apply')],
+            'hud': [('stream.py', '_draw_crosshairs'), ('stream.py', '_draw_hud'), ('topdon.py', '_draw_hotspots'),
+                    ('topdon.py', '_draw_circle_text'), ('~', 'putText'),
+                    ('~', 'line'), ('~', 'rectangle'), ('~', 'circle')],
+            'encode': [('~', 'imencode'), ('~', 'b2a_base64')],
+            'emit': [('flask_socketio/__init__.py', 'emit')],
+            'recorder': [('topdon.py', 'add_frame')],
+         }
+
+class PipelineProfiler:
+    def __init__(self, stages=None, max_seconds=120):
+        """
+        Profiliert die laufenden Verarbeitungsschleifen mit cProfile, ohne sie anzuhalten.
+        Bis Python 3.11 erfasst cProfile nur den Thread, in dem es aktiviert wird; deshalb rufen
+        die Schleifen einmal pro Frame tick() auf, das den Profiler im eigenen Thread ein- und
+        ausschaltet. Ab 3.12 ist cProfile prozessweit: profile() aktiviert dann einen einzigen
+        Profiler, der alle Threads erfasst, und tick() zählt nur noch die Frames.
+        Ohne laufende Messung kostet tick() nur eine Attributabfrage.
+
+        Args:
+            stages (dict): Zuordnung Pipeline-Schritt -> Wurzelfunktionen (Standard: STAGES).
+            max_seconds (float): Obergrenze der Messdauer.
+        """
+        self.stages = stages or STAGES
+        self.max_seconds = max_seconds
+        self.session = None
+        self.last_report = None
+        self.stats = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.session is not None
+
+    def tick(self):
+        """Einmal pro Frame aus jeder zu profilierenden Schleife aufrufen, wirft nie."""
+        session = self.session
+        if session is None:
+            return
+        try:
+            self._tick(session)
+        except Exception as e:
+            # z.B. ein anderes Profiling-Werkzeug ist aktiv: die Schleife läuft ohne Messung weiter
+            session['errors'].add(f'{type(e).__name__}: {e}')
+
+    def _tick(self, session):
+        thread = threading.get_ident()
+        with self._lock:
+            if not PER_THREAD:
+                session['frames'][thread] = session['frames'].get(thread, 0) + 1
+                session['names'].setdefault(thread, threading.current_thread().name)
+                return
+            if session['stopping']:
+                profile = session['profiles'].get(thread)
+                if profile is not None and thread not in session['collected']:
+                    profile.disable()
+                    session['collected'].add(thread)
+                return
+            session['frames'][thread] = session['frames'].get(thread, 0) + 1
+            if thread in session['profiles']:
+                return
+            profile = session['profiles'][thread] = cProfile.Profile()
+            session['names'][thread] = threading.current_thread().name
+        profile.enable()
+
+    def profile(self, seconds=10.0, top=25):
+        """
+        Misst `seconds` Sekunden und gibt den Bericht zurück (blockiert den aufrufenden Thread,
+        nicht die Pipeline).
+
+        Raises:
+            RuntimeError: Falls bereits eine Messung läuft.
+        """
+        seconds = min(max(float(seconds), 0.1), self.max_seconds)
+        with self._lock:
+            if self.session is not None:
+                raise RuntimeError("Profiling already running")
+            session = self.session = {
+                                        'start': time.time(),
+                                        'stopping': False,
+                                        'profiles': {},
+                                        'collected': set(),
+                                        'frames': {},
+                                        'names': {},
+                                        'errors': set(),
+                                     }
+        if not PER_THREAD:
+            return self._profile_process(session, seconds, top)
+        try:
+            time.sleep(seconds)
+            with self._lock:
+                session['stopping'] = True
+            # jede Schleife schaltet ihren Profiler beim nächsten Frame ab
+            deadline = time.monotonic() + 2.0
+            while time.monotonic() < deadline:
+                with self._lock:
+                    pending = [k for k in session['profiles'] if k not in session['collected']]
+                if not pending:
+                    break
+                time.sleep(0.05)
+        finally:
+            with self._lock:
+                self.session = None
+
+        alive = {k.ident for k in threading.enumerate()}
+        profiles = [profile for thread, profile in session['profiles'].items() if thread in session['collected'] or thread not in alive]
+        self.last_report = self._report(profiles, session, time.time() - session['start'], top)
+        return self.last_report
+
+    def _profile_process(self, session, seconds, top):
+        """Ab Python 3.12: ein prozessweiter Profiler, aktiviert in diesem Thread."""
+        profile = cProfile.Profile()
+        try:
+            try:
+                profile.enable()
+            except ValueError as e:
+                raise RuntimeError(f"Profiling not available: {e}")
+            try:
+                time.sleep(seconds)
+            finally:
+                profile.disable()
+        finally:
+            with self._lock:
+                self.session = None
+        self.last_report = self._report([profile], session, time.time() - session['start'], top)
+        return self.last_report
+
+    @staticmethod
+    def _builtin_name(name):
+        """'<built-in method cv2.resize>' bzw. '<resize>' -> 'resize'"""
+        return re.split(r'[ .]', name.strip('<>'))[-1]
+
+    def _matches(self, key, stage):
+        filename, _, name = key
+        for file, func in self.stages[stage]:
+            if file == '~':
+                if filename == '~' and self._builtin_name(name) == func:
+                    return True
+            elif name == func and filename.replace(os.sep, '/').endswith(file):
+                return True
+        return False
+
+    def _report(self, profiles, session, seconds, top):
+        frames = sum(session['frames'].values())
+        report = {
+                    'started': datetime.fromtimestamp(session['start']).isoformat(timespec='seconds'),
+                    'seconds': round(seconds, 3),
+                    'frames': frames,
+                    'threads': [{'name': session['names'][k], 'frames': session['frames'].get(k, 0)} for k in session['names']],
+                    'stages': {},
+                    'top': [],
+                 }
+        if session['errors']:
+            report['errors'] = sorted(session['errors'])
+        self.stats = None
+        if not profiles:
+            return report
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        self.stats = stats
+
+        for stage in self.stages:
+            matched = [k for k in stats.stats if self._matches(k, stage)]
+            total = 0.0
+            for key in matched:
+                cc, nc, tt, ct, callers = stats.stats[key]
+                # nur Aufrufe von außerhalb des Schritts zählen (keine Doppelzählung, z.B. putText in _draw_hud)
+                if callers:
+                    total += sum(v[3] for caller, v in callers.items() if caller not in matched)
+                else:
+                    total += ct
+            if total > 0:
+                report['stages'][stage] = {
+                                            'seconds': round(total, 4),
+                                            'per_frame_ms': round(total / frames * 1000, 3) if frames else None,
+                                            'share': round(total / stats.total_tt, 4) if stats.total_tt else None,
+                                          }
+
+        for key, (cc, nc, tt, ct, callers) in sorted(stats.stats.items(), key=lambda k: k[1][2], reverse=True)[:top]:
+            filename, line, name = key
+            report['top'].append({
+                                    'function': name,
+                                    'file': filename,
+                                    'line': line,
+                                    'stage': next((stage for stage in self.stages if self._matches(key, stage)), None),
+                                    'calls': nc,
+                                    'tottime': round(tt, 4),
+                                    'cumtime': round(ct, 4),
+                                 })
+        return report
+
+    def text(self, sort='cumulative', limit=40):
+        """pstats-Ausgabe der letzten Messung."""
+        if self.stats is None:
+            return ''
+        stream = io.StringIO()
+        self.stats.stream = stream
+        try:
+            self.stats.sort_stats(sort).print_stats(limit)
+        finally:
+            self.stats.stream = sys.stdout
+        return stream.getvalue()
+
+    def save(self, directory):
+        """Speichert die letzte Messung als .prof (pstats/snakeviz) und .json."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"profile_{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        if self.stats is not None:
+            self.stats.dump_stats(base + '.prof')
+        with open(base + '.json', 'w') as file:
+            json.dump(self.last_report, file, indent=2)
+        return base
+
+    def install_signal_handler(self, directory, seconds=10.0, signum=getattr(signal, 'SIGUSR1', None)):
+        """
+        `kill -USR1 <pid>` startet eine Messung über `seconds` Sekunden im Hintergrund und
+        speichert den Bericht nach `directory`. Muss im Haupt-Thread aufgerufen werden.
+        """
+        if signum is None:
+            return False
+
+        def run():
+            try:
+                self.profile(seconds)
+                print(f'Profile saved: {self.save(directory)}.prof/.json')
+            except RuntimeError as e:
+                print(e)
+
+        signal.signal(signum, lambda *args: threading.Thread(target=run, daemon=True).start())
+        return True
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+process pool for rendering and JPEG encoding over shared-memory frame buffers
+"""
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+try:
+    from topdon.core import ThermalFrame
+    from topdon.calibration import CalibrationMap
+except:
+    from core import ThermalFrame
+    from calibration import CalibrationMap
+
+class SharedFrameRing:
+    def __init__(self, slots: int, shape: tuple, dtype=np.uint8, name: str = None):
+        """
+        Ring aus `slots` gleich großen Frame-Puffern in einem SharedMemory-Block.
+
+        Args:
+            slots (int): Anzahl der Slots.
+            shape (tuple): Form eines Frames, z.B. (384, 256, 2) für den TC001.
+            dtype: Datentyp eines Frames.
+            name (str): Name eines bestehenden Blocks (Worker), None erzeugt einen neuen.
+        """
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = int(np.prod(self.shape)) * self.dtype.itemsize * slots
+        self.owner = name is None
+        # Worker teilen sich den resource_tracker des erzeugenden Prozesses,
+        # nur dieser gibt den Block mit unlink() wieder frei
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.array = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def render_worker(shm_name, slots, shape, tasks, results, config):
+    """
+    Worker-Prozess: liest Rohframes aus dem Ring, berechnet Temperaturen, rendert die Heatmap
+    und gibt (slot, seq, timestamp, jpeg, img_data) zurück.
+    """
+    try:
+        from topdon.stream import Heatmap
+    except:
+        from stream import Heatmap
+
+    ring = SharedFrameRing(slots, shape, name=shm_name)
+    quality = int(config.get('quality', 80))
+    render_config = config.get('render', {})
+    calibration = CalibrationMap.load(config['calibration']) if config.get('calibration') else None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq, timestamp, camera, offset = task
+            jpeg, img_data = None, None
+            try:
+                TFrame = ThermalFrame(camera, ring.array[slot], offset=offset, calibration=calibration)
+                hm = Heatmap(TFrame, **render_config)
+                heatmap = hm.get_frame()
+                img_data = hm.img_data
+                ret, buffer = cv2.imencode('.jpg', heatmap, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                jpeg = buffer.tobytes() if ret else None
+            except Exception:
+                pass
+            # der Slot wird in jedem Fall zurückgegeben
+            results.put((slot, seq, timestamp, jpeg, img_data))
+    finally:
+        ring.close()
+
+class RenderPool:
+    def __init__(self, workers=2, shape=(384, 256, 2), slots=None, **config):
+        """
+        Verteilt Rendering und JPEG-Encoding auf mehrere Prozesse. Die Rohframes werden über
+        SharedMemory-Slots übergeben (kein Pickling der Bilddaten), zurück kommen nur die
+        JPEG-Bytes und die Bilddaten.
+
+        Args:
+            workers (int): Anzahl der Worker-Prozesse.
+            shape (tuple): Form eines Rohframes.
+            slots (int): Anzahl der Slots (Standard: 2 pro Worker).
+            **config: 'quality' (JPEG), 'render' (Heatmap-Optionen) und 'calibration' (Pfad der Kalibrierkarten).
+        """
+        self.n_workers = workers
+        self.slots = slots or 2 * workers
+        self.ring = SharedFrameRing(self.slots, shape)
+        self.config = config
+
+        ctx = mp.get_context('spawn')
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.workers = [ctx.Process(target=render_worker, args=(self.ring.name, self.slots, self.ring.shape, self.tasks, self.results, config), daemon=True) for _ in range(workers)]
+
+        self._free = list(range(self.slots))
+        self._cond = threading.Condition()
+        self.seq = 0
+        self.timestamp = None
+        self.jpeg = None
+        self.img_data = None
+        self.frames_dropped = 0
+        self.running = False
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        self.running = True
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        with self._cond:
+            self._cond.notify_all()
+        self.ring.close()
+
+    def submit(self, captured, camera, offset=0):
+        """
+        Kopiert einen CapturedFrame in einen freien Slot und übergibt ihn an die Worker.
+
+        Returns:
+            bool: False, wenn kein Slot frei war und der Frame verworfen wurde.
+        """
+        with self._cond:
+            if len(self._free) == 0:
+                self.frames_dropped += 1
+                return False
+            slot = self._free.pop()
+        self.ring.array[slot][...] = captured.frame
+        self.tasks.put((slot, captured.seq, captured.timestamp, camera, offset))
+        return True
+
+    def _collect(self):
+        while self.running:
+            try:
+                slot, seq, timestamp, jpeg, img_data = self.results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self._cond:
+                self._free.append(slot)
+                # Ergebnisse können in anderer Reihenfolge ankommen, ältere werden verworfen
+                if jpeg is not None and seq > self.seq:
+                    self.seq, self.timestamp, self.jpeg, self.img_data = seq, timestamp, jpeg, img_data
+                    self._cond.notify_all()
+
+    def wait(self, last_seq=0, timeout=1.0):
+        """
+        Wartet auf ein gerendertes Bild, das neuer als `last_seq` ist.
+
+        Returns:
+            tuple: (seq, jpeg, img_data, timestamp) oder None bei Timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self.running or self.seq > last_seq, timeout=timeout)
+            if self.seq <= last_seq:
+                return None
+            return self.seq, self.jpeg, self.img_data, self.timestamp
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+per-client render parameters and a shared cache of encoded renditions
+"""
+import time
+import threading
+from collections import namedtuple
+
+import cv2
+
+# Drehung in Grad -> cv2-Konstante
+ROTATIONS = {
+                0: None,
+                90: cv2.ROTATE_90_CLOCKWISE,
+                180: cv2.ROTATE_180,
+                270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+            }
+DEGREES = {v: k for k, v in ROTATIONS.items()}
+
+HUD_OPTIONS = ['cross', 'spots', 'none', 'all']
+
+class RenditionParams(namedtuple('RenditionParams', ['colormap', 'scale', 'hud', 'rotation', 'flip', 'quality'])):
+    """Eine Darstellung des Frames; gleiche Parameter ergeben dieselben JPEG-Bytes."""
+
+    @classmethod
+    def from_args(cls, args, defaults):
+        """
+        Liest die Parameter aus einem Query-String-dict (z.B. request.args), fehlende Werte
+        kommen aus `defaults`.
+
+        Raises:
+            ValueError: Bei ungültigen Werten.
+        """
+        colormap = int(args.get('colormap', defaults.colormap))
+        scale = int(args.get('scale', defaults.scale))
+        hud = str(args.get('hud', defaults.hud))
+        rotation = int(args.get('rotation', defaults.rotation))
+        flip = args.get('flip', defaults.flip)
+        flip = flip if isinstance(flip, bool) else str(flip).lower() in ['1', 'true', 'yes']
+        quality = int(args.get('quality', defaults.quality))
+
+        if not 0 <= colormap <= 10:
+            raise ValueError("colormap must be between 0 and 10")
+        if not 1 <= scale <= 5:
+            raise ValueError("scale must be between 1 and 5")
+        if hud not in HUD_OPTIONS:
+            raise ValueError(f"hud must be one of {HUD_OPTIONS}")
+        if rotation not in ROTATIONS:
+            raise ValueError(f"rotation must be one of {list(ROTATIONS)}")
+        if not 10 <= quality <= 100:
+            raise ValueError("quality must be between 10 and 100")
+        return cls(colormap, scale, hud, rotation, flip, quality)
+
+    @property
+    def orientation(self):
+        """(cv2-Drehkonstante oder None, Spiegeln)"""
+        return (ROTATIONS[self.rotation], self.flip)
+
+    @property
+    def room(self):
+        """Name des Socket.IO-Raums dieser Darstellung."""
+        return 'view:' + '-'.join(str(k) for k in self)
+
+class Rendition:
+    def __init__(self, params):
+        self.params = params
+        self.seq = None
+        self.data = None
+        self.last_used = time.monotonic()
+        self.renders = 0
+        self.lock = threading.Lock()
+
+class RenditionCache:
+    def __init__(self, render, timeout=30.0):
+        """
+        Rendert jede Parameterkombination höchstens einmal pro Frame; alle Clients mit denselben
+        Parametern teilen sich das Ergebnis. Darstellungen, die länger als `timeout` Sekunden
+        nicht abgefragt wurden, werden verworfen. Der Aufwand wächst so mit der Zahl der
+        verschiedenen Ansichten, nicht mit der Zahl der Clients.
+
+        Args:
+            render: render(frame, params) -> Ergebnis (z.B. JPEG-Bytes) für einen Frame.
+            timeout (float): Sekunden ohne Abfrage bis zum Verwerfen.
+        """
+        self.render = render
+        self.timeout = timeout
+        self.renditions = {}
+        self._last_evict = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _entry(self, params):
+        if time.monotonic() - self._last_evict > self.timeout:
+            self.active()
+        with self._lock:
+            entry = self.renditions.get(params)
+            if entry is None:
+                entry = self.renditions[params] = Rendition(params)
+            entry.last_used = time.monotonic()
+            return entry
+
+    def touch(self, params):
+        """Markiert eine Darstellung als benutzt (z.B. beim Verbinden eines Clients)."""
+        self._entry(params)
+
+    def get(self, params, seq, frame):
+        """
+        Gibt die Darstellung von Frame `seq` zurück und rendert sie nur, falls noch niemand
+        anderes das für diesen Frame getan hat.
+        """
+        return self.get_latest(params, seq, frame)[1]
+
+    def get_latest(self, params, seq, frame):
+        """
+        Wie get(), aber mit der Sequenznummer des gelieferten Ergebnisses, die neuer als `seq`
+        sein kann, falls ein Stream-Client bereits einen späteren Frame gerendert hat.
+
+        Returns:
+            tuple: (seq, Ergebnis)
+        """
+        entry = self._entry(params)
+        with entry.lock:
+            if entry.seq is None or seq > entry.seq:
+                entry.data = self.render(frame, params)
+                entry.seq = seq
+                entry.renders += 1
+            return entry.seq, entry.data
+
+    def active(self):
+        """Alle nicht abgelaufenen Darstellungen; abgelaufene werden dabei verworfen."""
+        now = self._last_evict = time.monotonic()
+        with self._lock:
+            for params in [k for k, v in self.renditions.items() if now - v.last_used > self.timeout]:
+                del self.renditions[params]
+            return list(self.renditions)
+
+    def stats(self):
+        self.active()
+        with self._lock:
+            return [dict(k._asdict(), seq=v.seq, renders=v.renders, idle_s=round(time.monotonic() - v.last_used, 1))
+                    for k, v in self.renditions.items()]
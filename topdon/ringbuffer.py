@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pre-trigger ring buffer of compact raw frames
+"""
+import threading
+
+import numpy as np
+
+class PreTriggerBuffer:
+    def __init__(self, seconds=10, fps=25.0, shape=(192, 256)):
+        """
+        Hält die letzten `seconds` Sekunden als kompakte Rohdaten im Speicher: die Thermaldaten
+        als uint16 und die Luma-Ebene des YUYV-Bildes als uint8, keine gerenderten BGR-Frames.
+        Alle Puffer werden beim Start angelegt, der Speicherbedarf ist damit fest
+        (256x192 Pixel: 147 kB pro Frame).
+
+        Args:
+            seconds (float): Länge der Historie.
+            fps (float): Framerate der Kamera.
+            shape (tuple): (Höhe, Breite) einer Bildhälfte des Rohframes.
+        """
+        self.fps = fps
+        self.shape = tuple(shape)
+        self.slots = max(int(seconds * fps), 1)
+        self.thermal = np.zeros((self.slots,) + self.shape, dtype=np.uint16)
+        self.luma = np.zeros((self.slots,) + self.shape, dtype=np.uint8)
+        self.timestamps = np.zeros(self.slots, dtype=np.float64)
+        self.seq = np.zeros(self.slots, dtype=np.int64)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.thermal.nbytes + self.luma.nbytes + self.timestamps.nbytes + self.seq.nbytes
+
+    def push(self, frame, seq, timestamp):
+        """Legt einen Rohframe (YUYV oben, Thermaldaten unten) im nächsten Slot ab."""
+        height = self.shape[0]
+        imdata, thdata = frame[:height], frame[height:]
+        with self._lock:
+            i = self.count % self.slots
+            np.copyto(self.luma[i], imdata[..., 0])
+            thermal = self.thermal[i]
+            np.copyto(thermal, thdata[..., 1])
+            thermal <<= 8
+            thermal |= thdata[..., 0]
+            self.timestamps[i] = timestamp
+            self.seq[i] = seq
+            self.count += 1
+
+    def snapshot(self):
+        """
+        Gibt eine chronologisch sortierte Kopie des gefüllten Teils zurück.
+
+        Returns:
+            dict: thermal, luma, timestamps, seq
+        """
+        with self._lock:
+            n = min(self.count, self.slots)
+            order = (np.arange(n) + self.count - n) % self.slots
+            return {
+                    'thermal': self.thermal[order],
+                    'luma': self.luma[order],
+                    'timestamps': self.timestamps[order],
+                    'seq': self.seq[order],
+                    }
+
+    def flush(self, path, callback=None, **meta):
+        """
+        Schreibt die Historie als .npz nach `path`. Die Kopie wird sofort erstellt, das Schreiben
+        läuft in einem Hintergrund-Thread, damit die Capture-Schleife nicht blockiert.
+
+        Args:
+            path (str): Zieldatei (.npz).
+            callback: wird nach dem Schreiben mit `path` aufgerufen.
+            **meta: zusätzliche skalare Werte (z.B. camera, offset), die mitgespeichert werden.
+
+        Returns:
+            threading.Thread: der schreibende Thread.
+        """
+        data = self.snapshot()
+        data['fps'] = np.float64(self.fps)
+        for key, value in meta.items():
+            data[key] = np.asarray(value)
+
+        def write():
+            with open(path, 'wb') as file:
+                np.savez(file, **data)
+            if callback is not None:
+                callback(path)
+
+        thread = threading.Thread(target=write, daemon=True)
+        thread.start()
+        return thread
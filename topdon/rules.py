@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+alarm rules evaluated incrementally per frame
+"""
+import json
+import time
+import logging
+import threading
+import urllib.request
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+class Rule:
+    operators = {
+                    '>': lambda a, b: a > b,
+                    '<': lambda a, b: a < b,
+                }
+
+    def __init__(self, name: str, value: float, metric='max_temp', op='>', type='threshold', frames=1,
+                 hysteresis=0.5, region=None, window=10.0, action='log', url=None, trigger=False):
+        """
+        Eine Alarmregel mit konstantem Zustand (keine Historie).
+
+        Args:
+            name (str): Eindeutiger Name der Regel.
+            value (float): Schwellenwert in °C ('threshold') bzw. °C/min ('rate').
+            metric (str): 'max_temp', 'min_temp' oder 'avg_temp' (ohne Region auch die übrigen RuleEngine.frame_metrics).
+            op (str): '>' oder '<'.
+            type (str): 'threshold' (Wert) oder 'rate' (Änderungsrate in °C/min).
+            frames (int): Anzahl aufeinanderfolgender Frames, bevor die Regel auslöst.
+            hysteresis (float): Abstand zum Schwellenwert, ab dem die Regel wieder zurückgesetzt wird.
+            region (list): [x, y, w, h] in Sensor-Pixeln, None = ganzes Bild.
+            window (float): Zeitkonstante in Sekunden für die geglättete Änderungsrate.
+            action (str): 'log' oder 'webhook'.
+            url (str): Ziel-URL für 'webhook'.
+            trigger (bool): Startet beim Auslösen eine Aufnahme (inkl. Pre-Trigger-Historie).
+        """
+        if op not in self.operators:
+            raise ValueError(f"Unknown operator {op}")
+        if type not in ['threshold', 'rate']:
+            raise ValueError(f"Unknown rule type {type}")
+        if action == 'webhook' and not url:
+            raise ValueError("Webhook rules need an url")
+        if region is not None:
+            region = tuple(int(k) for k in region)
+            if len(region) != 4 or min(region[:2]) < 0 or min(region[2:]) <= 0:
+                raise ValueError("region must be [x, y, w, h] with x, y >= 0 and w, h > 0")
+
+        self.name = name
+        self.value = float(value)
+        self.metric = metric
+        self.op = op
+        self.type = type
+        self.frames = max(int(frames), 1)
+        self.hysteresis = abs(float(hysteresis))
+        self.region = region
+        self.window = float(window)
+        self.action = action
+        self.url = url
+        self.trigger = bool(trigger)
+
+        # O(1) Zustand
+        self.active = False
+        self.count = 0
+        self._last_value = None
+        self._last_time = None
+        self._rate = None
+
+    def _update_rate(self, value, timestamp):
+        """Exponentiell geglättete Änderungsrate in °C/min."""
+        if self._last_time is None or timestamp <= self._last_time:
+            self._last_value, self._last_time = value, timestamp
+            return self._rate
+        dt = timestamp - self._last_time
+        rate = (value - self._last_value) / dt * 60
+        alpha = min(dt / self.window, 1.0)
+        self._rate = rate if self._rate is None else self._rate + alpha * (rate - self._rate)
+        self._last_value, self._last_time = value, timestamp
+        return self._rate
+
+    def _exceeds(self, x):
+        return self.operators[self.op](x, self.value)
+
+    def _cleared(self, x):
+        if self.op == '>':
+            return x < self.value - self.hysteresis
+        return x > self.value + self.hysteresis
+
+    def update(self, x, timestamp):
+        """
+        Aktualisiert den Zustand mit dem Messwert eines Frames.
+
+        Returns:
+            str: 'fired', 'cleared' oder None.
+        """
+        if self.type == 'rate':
+            x = self._update_rate(x, timestamp)
+            if x is None:
+                return None
+
+        if not self.active:
+            self.count = self.count + 1 if self._exceeds(x) else 0
+            if self.count >= self.frames:
+                self.active = True
+                return 'fired'
+        elif self._cleared(x):
+            self.active = False
+            self.count = 0
+            return 'cleared'
+        return None
+
+    def data(self):
+        return {
+                'name': self.name,
+                'type': self.type,
+                'metric': self.metric,
+                'op': self.op,
+                'value': self.value,
+                'frames': self.frames,
+                'hysteresis': self.hysteresis,
+                'region': list(self.region) if self.region is not None else None,
+                'window': self.window,
+                'action': self.action,
+                'url': self.url,
+                'trigger': self.trigger,
+                'active': self.active,
+                }
+
+    def __repr__(self):
+        return f"Rule({self.data()})"
+
+class RuleEngine:
+    region_stats = {
+                    'max_temp': np.max,
+                    'min_temp': np.min,
+                    'avg_temp': np.mean,
+                    }
+
+    # numerische Werte aus img_data (ThermalFrame._get_data), auf die sich Regeln ohne Region beziehen können
+    frame_metrics = (
+                    'max_temp', 'min_temp', 'avg_temp', 'target_temp', 'p1_temp', 'p99_temp',
+                    'max_temp_x', 'max_temp_y', 'min_temp_x', 'min_temp_y', 'target_x', 'target_y',
+                    )
+
+    def __init__(self, rules=None, max_events=100):
+        """
+        Wertet Alarmregeln pro Frame aus. Jede Regel hält nur konstanten Zustand, Statistiken
+        für Regionen werden pro Frame einmal pro Region berechnet.
+
+        Args:
+            rules (list): Regeln als dicts (z.B. aus der YAML-Konfiguration).
+            max_events (int): Anzahl der gespeicherten letzten Ereignisse.
+        """
+        self.rules = {}
+        self.callbacks = []
+        self.events = deque(maxlen=max_events)
+        self.last_seq = None
+        self._lock = threading.Lock()
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    def add_rule(self, rule: dict):
+        """
+        Raises:
+            ValueError: Bei ungültiger Regel, z.B. einer Metrik, die kein Zahlenwert ist.
+        """
+        rule = Rule(**rule)
+        metrics = self.region_stats if rule.region is not None else self.frame_metrics
+        if rule.metric not in metrics:
+            raise ValueError(f"Unknown metric {rule.metric}, expected one of {', '.join(metrics)}")
+        with self._lock:
+            self.rules[rule.name] = rule
+        return rule
+
+    def remove_rule(self, name: str):
+        with self._lock:
+            return self.rules.pop(name, None) is not None
+
+    def add_callback(self, callback):
+        """Registriert callback(event), der bei jedem Auslösen/Zurücksetzen aufgerufen wird."""
+        self.callbacks.append(callback)
+
+    def rules_data(self):
+        with self._lock:
+            return [k.data() for k in self.rules.values()]
+
+    def _region_value(self, cache, temperatures, region, metric):
+        """Statistik der Region, None, falls sie (z.B. nach einer Drehung) außerhalb des Bildes liegt."""
+        key = (region, metric)
+        if key not in cache:
+            x, y, w, h = region
+            values = temperatures[y:y + h, x:x + w]  # Slicing begrenzt auf den Bildrand
+            cache[key] = float(self.region_stats[metric](values)) if values.size > 0 else None
+        return cache[key]
+
+    def evaluate(self, img_data, temperatures=None, timestamp=None, seq=None):
+        """
+        Wertet alle Regeln für einen Frame aus. Wird derselbe Frame (seq) mehrfach übergeben,
+        z.B. von mehreren Clients, wird er nur einmal ausgewertet.
+
+        Returns:
+            list: Die Ereignisse dieses Frames.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            if seq is not None:
+                if self.last_seq is not None and seq <= self.last_seq:
+                    return []
+                self.last_seq = seq
+            rules = list(self.rules.values())
+
+        events = []
+        cache = {}
+        for rule in rules:
+            if rule.region is not None:
+                if temperatures is None or rule.metric not in self.region_stats:
+                    continue
+                x = self._region_value(cache, temperatures, rule.region, rule.metric)
+                if x is None:
+                    continue
+            elif rule.metric in img_data:
+                x = float(img_data[rule.metric])
+            else:
+                continue
+
+            state = rule.update(x, timestamp)
+            if state is not None:
+                events.append({
+                                'rule': rule.name,
+                                'state': state,
+                                'value': round(x, 2) if rule.type == 'threshold' else round(rule._rate, 2),
+                                'time': time.time(),
+                                'seq': seq,
+                              })
+
+        for event in events:
+            self._dispatch(event)
+        return events
+
+    def _dispatch(self, event):
+        self.events.append(event)
+        rule = self.rules.get(event['rule'])
+        if rule is not None and rule.action == 'webhook':
+            threading.Thread(target=self._post_webhook, args=(rule.url, event), daemon=True).start()
+        else:
+            log.warning(f"Rule {event['rule']} {event['state']} (value: {event['value']})")
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                log.warning(f"Rule callback failed: {e}")
+
+    @staticmethod
+    def _post_webhook(url, event):
+        try:
+            request = urllib.request.Request(url, data=json.dumps(event).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'}, method='POST')
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            log.warning(f"Webhook {url} failed: {e}")
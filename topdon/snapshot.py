@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+latest frame for polling clients (snapshot, raw temperatures, statistics)
+"""
+import io
+import time
+import threading
+
+import numpy as np
+
+def etag(seq):
+    return f'"{seq}"'
+
+def not_modified(if_none_match, seq):
+    """True, wenn der If-None-Match-Header den Frame `seq` bereits nennt."""
+    if not if_none_match:
+        return False
+    tags = [k.strip() for k in if_none_match.split(',')]
+    return '*' in tags or etag(seq) in [k[2:] if k.startswith('W/') else k for k in tags]
+
+class FrameSnapshot:
+    def __init__(self, seq, timestamp, temperatures, img_data, tframe=None, content_seq=None):
+        """
+        Der zuletzt ausgewertete Frame. Die Serialisierungen werden beim ersten Abruf einmal
+        erzeugt und für alle weiteren Abrufe desselben Frames wiederverwendet.
+
+        Args:
+            seq (int): Sequenznummer des Frames (ETag).
+            timestamp (float): Aufnahmezeit (time.monotonic()).
+            temperatures (np.ndarray): Temperaturen in °C.
+            img_data (dict): Statistik des Frames.
+            tframe (ThermalFrame): optional, das ausgewertete Frame (zum nachträglichen Rendern).
+            content_seq (int): Keyframe, dessen Inhalt gilt (unveränderte Szene), Standard: seq.
+        """
+        self.seq = seq
+        self.timestamp = timestamp
+        self.temperatures = temperatures
+        self.img_data = img_data
+        self.tframe = tframe
+        self.content_seq = seq if content_seq is None else content_seq
+        self._npy = None
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self):
+        return etag(self.content_seq)
+
+    def restamp(self, seq, timestamp):
+        """Derselbe Inhalt unter neuer Sequenznummer und Aufnahmezeit (unveränderte Szene)."""
+        snapshot = FrameSnapshot(seq, timestamp, self.temperatures, self.img_data, self.tframe, self.content_seq)
+        snapshot._npy = self._npy
+        return snapshot
+
+    def npy(self):
+        """Temperaturen im .npy-Format (np.load)."""
+        with self._lock:
+            if self._npy is None:
+                buffer = io.BytesIO()
+                np.save(buffer, self.temperatures)
+                self._npy = buffer.getvalue()
+            return self._npy
+
+    def stats(self):
+        data = {k: float(v) if isinstance(v, np.floating) else v for k, v in self.img_data.items()}
+        data.update(seq=self.seq, content_seq=self.content_seq, captured=self.timestamp, age_ms=round((time.monotonic() - self.timestamp) * 1000, 1))
+        return data
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+startup time report
+"""
+import subprocess
+import sys
+
+# subsystems and the modules they pull in, in the order they are loaded at runtime
+SUBSYSTEMS = {
+                'core': ['numpy', 'cv2', 'topdon.core', 'topdon.video'],
+                'files': ['topdon.files', 'topdon.thumbnails'],
+                'web': ['flask', 'flask_socketio'],
+                'stream': ['yaml', 'flask_cors', 'flask_restful'],
+                'export': ['pandas', 'openpyxl'],
+                'qr': ['pyqrcode'],
+                'tunnel': ['quickflare.quickflare'],
+                'updater': ['requests', 'packaging'],
+             }
+
+_MEASURE = """
+import time, sys
+t0 = time.perf_counter()
+import {module}
+print(time.perf_counter() - t0)
+"""
+
+def measure_import(module):
+    """
+    Measures the cold import time of a module in a fresh interpreter.
+
+    Returns:
+        float: seconds, or None if the module can't be imported.
+    """
+    result = subprocess.run([sys.executable, '-c', _MEASURE.format(module=module)], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+def import_report(subsystems=None):
+    """
+    Returns a dict {subsystem: {module: seconds}} with the cold import cost of each module.
+    Shared dependencies are counted for every module that pulls them in.
+    """
+    subsystems = subsystems or SUBSYSTEMS
+    return {name: {module: measure_import(module) for module in modules} for name, modules in subsystems.items()}
+
+def print_import_report(subsystems=None):
+    report = import_report(subsystems)
+    print(f"{'subsystem':<10} {'module':<24} {'import [s]':>10}")
+    for name, modules in report.items():
+        for module, seconds in modules.items():
+            value = f"{seconds:.3f}" if seconds is not None else 'missing'
+            print(f"{name:<10} {module:<24} {value:>10}")
+    return report
+
+if __name__ == "__main__":
+    print_import_report()
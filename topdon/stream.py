@@ -6,21 +6,51 @@ http stream
 import cv2
 import numpy as np
 import os
+import json
+import time
 from itertools import cycle
 
-from flask import Flask, Response
+from flask import Flask, Response, request
 from flask_cors import CORS
 from flask_restful import Api, Resource, reqparse
 from functools import wraps
+from threading import Thread
+from concurrent.futures import TimeoutError as CommandTimeout
 import yaml
 import argparse
 
 try:
+    from topdon.core import ThermalFrame, ColorMapper, STARTUP_TIME
     from topdon.video import *
-    from topdon.topdon import ThermalFrame
+    from topdon.startup import print_import_report
+    from topdon.render import RenderPool
+    from topdon.rules import RuleEngine
+    from topdon.history import StatsHistory
+    from topdon.calibration import CalibrationMap, OutputBuffers
+    from topdon.metrics import Metrics, NullMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+    from topdon.profiler import PipelineProfiler
+    from topdon.latency import LatencyTracker
+    from topdon.renditions import RenditionParams, RenditionCache
+    from topdon.snapshot import FrameSnapshot, etag, not_modified
+    from topdon.demand import Demand
+    from topdon.change import ChangeDetector
+    from topdon.commands import CommandQueue
 except:
+    from core import ThermalFrame, ColorMapper, STARTUP_TIME
     from video import *
-    from topdon import ThermalFrame
+    from startup import print_import_report
+    from render import RenderPool
+    from rules import RuleEngine
+    from history import StatsHistory
+    from calibration import CalibrationMap, OutputBuffers
+    from metrics import Metrics, NullMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+    from profiler import PipelineProfiler
+    from latency import LatencyTracker
+    from renditions import RenditionParams, RenditionCache
+    from snapshot import FrameSnapshot, etag, not_modified
+    from demand import Demand
+    from change import ChangeDetector
+    from commands import CommandQueue
     
 class ConfigParser:
     def __init__(self, config_file):
@@ -72,6 +102,8 @@ class Heatmap:
 
 
         self.alpha = kwargs.get("alpha", 1.0)  # Kontraststeuerung (1.0-3.0)
+        self.auto_contrast = kwargs.get("auto_contrast", False)  # Kontrast aus dem Histogramm (p1/p99)
+        self.color_mapper = kwargs.get("color_mapper") or ColorMapper()
 
         # Konfigurationsoptionen für Farbkarten
         self.colormap_options = cycle(kwargs.get("colormap_options", list(range(11))))
@@ -110,6 +142,7 @@ class Heatmap:
         self.heatmap = None
         self.thdata = None
         self.temp_unit = kwargs.get("temp_unit", " C")
+        self.metrics = kwargs.get("metrics") or NullMetrics()  # Laufzeit pro Verarbeitungsschritt
 
         self.img_data = None
     
@@ -132,33 +165,28 @@ class Heatmap:
             raise ValueError("TFrame wurde nicht gesetzt. Die Instanz ist ungültig.")
         
         # Verarbeite das TFrame
+        t = self.metrics.now()
         self.tframe._process_frame()
+        t = self.metrics.lap('conversion', t)
         self.tframe._set_target(self.target_h, self.target_w)
+        self.tframe._detect_hotspots(self.threshold)
 
+        if self.auto_contrast:
+            self.tframe._compute_histogram()
         img_data = self.tframe._get_data(self.new_width)
         self.img_data = img_data
-        bgr = cv2.cvtColor(self.tframe.imdata, cv2.COLOR_YUV2BGR_YUYV)
+        t = self.metrics.lap('statistics', t)
 
-        # Kontrast anwenden
-        bgr = cv2.convertScaleAbs(bgr, alpha=self.alpha)
-
-        # Resize und Blur anwenden
-        bgr = cv2.resize(bgr, (self.new_width, self.new_height), interpolation=cv2.INTER_CUBIC)
+        # Luma-Ebene skalieren; Kontrast und Farbkarte werden in einem LUT-Durchgang angewendet
+        gray = cv2.resize(self.tframe.imdata[..., 0], (self.new_width, self.new_height), interpolation=cv2.INTER_CUBIC)
         if self.rad > 0:
-            bgr = cv2.blur(bgr, (self.rad, self.rad))
-
-        # Farbkarten anwenden
-        colormap_dict = {
-            0: cv2.COLORMAP_JET, 1: cv2.COLORMAP_HOT, 2: cv2.COLORMAP_MAGMA,
-            3: cv2.COLORMAP_INFERNO, 4: cv2.COLORMAP_PLASMA, 5: cv2.COLORMAP_BONE,
-            6: cv2.COLORMAP_SPRING, 7: cv2.COLORMAP_AUTUMN, 8: cv2.COLORMAP_VIRIDIS,
-            9: cv2.COLORMAP_PARULA, 10: cv2.COLORMAP_RAINBOW
-        }
-        heatmap = cv2.applyColorMap(bgr, colormap_dict.get(self.colormap, cv2.COLORMAP_JET))
-        cmap_text = list(colormap_dict.keys())[self.colormap] if self.colormap in colormap_dict else "Jet"
+            gray = cv2.blur(gray, (self.rad, self.rad))
+        t = self.metrics.lap('resize', t)
 
-        if self.colormap == 10:  # Sonderfall für "Inv Rainbow"
-            heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
+        auto_range = self.tframe.luma_range if self.auto_contrast else None
+        heatmap = self.color_mapper.apply(gray, self.colormap, alpha=self.alpha, auto_range=auto_range)
+        cmap_text = self.color_mapper.name(self.colormap)
+        t = self.metrics.lap('colorize', t)
 
         # Optional HUD hinzufügen
         if self.hud in ['all', 'cross']:
@@ -166,6 +194,7 @@ class Heatmap:
 
         if self.hud in ['all' , 'spots']:
             self._draw_hud(heatmap, img_data, cmap_text)
+        self.metrics.lap('hud', t)
 
         return heatmap
     
@@ -224,12 +253,28 @@ class Heatmap:
                     self.font, font_scale, (0, 255, 255), 1, cv2.LINE_AA)
 
         if (self.hud != 'none'):
+            self._draw_hotspots(heatmap, img_data['hotspots'])
             if img_data['max_temp'] > img_data['avg_temp'] + self.threshold:
                 self._draw_circle_text(heatmap, img_data['max_temp_y'], img_data['max_temp_x'], img_data['max_temp'], (0, 0, 255))
 
             if img_data['min_temp'] < img_data['avg_temp'] - self.threshold:
                 self._draw_circle_text(heatmap, img_data['min_temp_y'], img_data['min_temp_x'], img_data['min_temp'], (255, 0, 0))
 
+    def _draw_hotspots(self, heatmap, hotspots):
+        """
+        Zeichnet die Bounding-Boxen und Spitzentemperaturen der Hotspots.
+
+        Args:
+            heatmap (np.ndarray): Das Heatmap-Bild.
+            hotspots (list): Die Hotspots aus den Bilddaten.
+        """
+        for hotspot in hotspots:
+            x, y, w, h = hotspot['bbox']
+            cv2.rectangle(heatmap, (x, y), (x + w, y + h), (0, 0, 0), 2)
+            cv2.rectangle(heatmap, (x, y), (x + w, y + h), (0, 0, 255), 1)
+            cv2.putText(heatmap, str(hotspot['peak_temp']) + self.temp_unit, (x, max(y - 4, 10)),
+                        self.font, 0.4 * self.scale, (0, 255, 255), 1, cv2.LINE_AA)
+
     def _draw_circle_text(self, heatmap, row, col, temp, color):
         circle_radius = 5 * self.scale  # Radius des Kreises anpassen
         cv2.circle(heatmap, (row, col), int(circle_radius), (0, 0, 0), 2)
@@ -242,29 +287,222 @@ class VideoStreamer:
         self.videostore = Video()
         self.videostore.open(camera_id=kwargs.get('cam_id', -1))
         self.cap = self.videostore.cap
+        self.grabber = FrameGrabber(self.cap).start()
+        self.frames_skipped = 0
         
         self.n_rotate = int(kwargs.get('n_rotate', 0))
         self.temp_offset = kwargs.get('temp_offset', 0)
+        # Pro-Pixel-Kalibrierung, der globale Offset (/api/set_temperature) wird zusätzlich eingerechnet
+        self.calibration = CalibrationMap.load(kwargs['calibration']) if kwargs.get('calibration') else None
+        # Temperatur-Arrays des Analyse-Threads, statt pro Frame neu zu allozieren
+        self.temperature_buffers = OutputBuffers()
 
         self.img_data = None
-        
+        self.histogram = None
+        self.latest = None  # FrameSnapshot des zuletzt ausgewerteten Frames
+        self.last_captured = None
+        self.first_frame = True
+        self.metrics = Metrics()
+        self.profiler = PipelineProfiler()
+        self.latency = LatencyTracker()
+        self.clients = 0
+        self.client_count = 0
+        # MJPEG-Clients; ohne sie rendert auch der Prozess-Pool nicht
+        self.demand = Demand()
+        # unveränderte Szene: Statistik und JPEG des letzten Keyframes weiterverwenden
+        self.changes = ChangeDetector(delta=kwargs.get('change_delta', 0.25), keyframe_interval=kwargs.get('keyframe_interval', 5.0))
+
+        # Steuerbefehle aus Flask (Offset, Regeln), ausgeführt vom Analyse-Thread zwischen zwei Frames
+        self.commands = CommandQueue()
+
+        # Auswertung (Statistik, Alarmregeln) läuft für jeden Frame, auch ohne Clients
+        self.rules = RuleEngine(kwargs.get('rules', []))
+        self.history = StatsHistory(fps=self.videostore.camera['fps'])
+        self.analyzer = Thread(target=self._analyze, daemon=True)
+        self.analyzer.start()
+
+        # optional: Rendering und Encoding in einem Prozess-Pool
+        self.render_config = dict(kwargs.get('render', {}), metrics=self.metrics)
+        self.quality = int(kwargs.get('quality', 95))
+
+        # Darstellungen je Parametersatz (/mjpeg?colormap=&scale=&hud=&rotation=&flip=&quality=),
+        # einmal pro Frame gerendert und von allen Clients mit denselben Parametern geteilt
+        render = kwargs.get('render', {})
+        self.default_params = RenditionParams(colormap=int(render.get('colormap', 0)), scale=int(render.get('scale', 1)),
+                                              hud=render.get('hud', 'spots'), rotation=0, flip=False, quality=self.quality)
+        self.renditions = RenditionCache(self._render, timeout=float(kwargs.get('rendition_timeout', 30)))
+        self.pool = None
+        if int(kwargs.get('render_workers', 0)) > 0:
+            width, height = self.videostore.camera['resolution']
+            self.pool = RenderPool(workers=int(kwargs['render_workers']), shape=(height, width, 2),
+                                   quality=self.quality, render=kwargs.get('render', {}),
+                                   calibration=kwargs.get('calibration')).start()
+            self.feeder = Thread(target=self._feed_pool, daemon=True)
+            self.feeder.start()
+
+    def _calibration_version(self):
+        return self.calibration.version if self.calibration is not None else None
+
+    def _content_seq(self, captured):
+        """Keyframe, dessen Inhalt für `captured` gilt (== captured.seq bei merklicher Änderung)."""
+        thermal = captured.frame[captured.frame.shape[0] // 2:]
+        return self.changes.check(captured.seq, thermal, captured.timestamp, key=(self.temp_offset, self._calibration_version()))
+
+    def _analyze(self):
+        last_seq = 0
+        while self.grabber.is_alive():
+            self.profiler.tick()
+            self.commands.drain()
+            captured = self.grabber.read(last_seq)
+            if captured is None:
+                continue
+            self.metrics.inc('frames_captured_total', captured.seq - last_seq, 'Frames delivered by the camera.')
+            last_seq = captured.seq
+            try:
+                if self.latest is not None and self._content_seq(captured) != captured.seq:
+                    self.metrics.inc('frames_static_total', 1, 'Frames reusing the statistics and image of the previous keyframe.')
+                    latest = self.latest = self.latest.restamp(captured.seq, captured.timestamp)
+                    self.last_captured = captured
+                    # Statistik des Keyframes, zu dem auch die Temperaturen gehören
+                    self.rules.evaluate(latest.img_data, latest.temperatures, timestamp=captured.timestamp, seq=captured.seq)
+                    self.history.add(latest.img_data, timestamp=captured.timestamp)
+                    continue
+                TFrame = ThermalFrame(self.videostore.camera, captured.frame, offset = self.temp_offset, calibration = self.calibration)
+                TFrame._process_frame(self.temperature_buffers.get((TFrame.height, TFrame.width)))
+                TFrame._set_target(TFrame.height / 2, TFrame.width / 2)
+                TFrame._detect_hotspots()
+                TFrame._compute_histogram()
+                self.histogram = dict(TFrame.histogram, p1_temp=TFrame.p_low, p99_temp=TFrame.p_high)
+                self.img_data = TFrame._get_data(TFrame.width)
+                self.latest = FrameSnapshot(captured.seq, captured.timestamp, TFrame.temperatures, self.img_data)
+                self.last_captured = captured
+                self.rules.evaluate(self.img_data, TFrame.temperatures, timestamp=captured.timestamp, seq=captured.seq)
+                self.history.add(self.img_data, timestamp=captured.timestamp)
+            except Exception as e:
+                self.metrics.inc('frames_failed_total', 1, 'Frames that failed in a processing stage.')
+                continue
 
-    def _run(self):
-        while True:
+    def _set_temperature(self, destination, temperature):
+        """Globalen Offset so verschieben, dass min/max/avg des letzten Frames `temperature` ergibt."""
+        if self.latest is None:
+            raise ValueError('No frame yet')
+        key = {'min': 'min_temp', 'max': 'max_temp', 'average': 'avg_temp'}[destination]
+        self.temp_offset += temperature - self.latest.img_data[key]
+        return self.temp_offset
+
+    def _feed_pool(self):
+        last_seq = 0
+        while self.grabber.is_alive():
+            captured = self.grabber.read(last_seq)
+            if captured is None:
+                continue
+            if not self.demand.active('pool') or self._content_seq(captured) != captured.seq:
+                # niemand schaut zu bzw. unveränderte Szene: nicht rendern
+                last_seq = captured.seq
+                continue
+            if last_seq > 0:
+                self.frames_skipped += captured.seq - last_seq - 1
+                self.metrics.inc('frames_dropped_total', captured.seq - last_seq - 1, 'Frames replaced by a newer one before rendering.')
+            last_seq = captured.seq
+            if not self.pool.submit(captured, self.videostore.camera, offset=self.temp_offset):
+                self.metrics.inc('frames_dropped_total', 1, 'Frames replaced by a newer one before rendering.')
+
+    @staticmethod
+    def _part(jpeg, seq, timestamp):
+        """Ein Teil des MJPEG-Streams; Sequenznummer und Aufnahmezeit (monotonic) als Header."""
+        headers = (f'Content-Type: image/jpeg\r\n'
+                   f'Content-Length: {len(jpeg)}\r\n'
+                   f'X-Frame-Seq: {seq}\r\n'
+                   f'X-Capture-Timestamp: {timestamp:.6f}\r\n'
+                   f'X-Frame-Age: {(time.monotonic() - timestamp) * 1000:.1f}\r\n\r\n')
+        return b'--frame\r\n' + headers.encode('ascii') + jpeg + b'\r\n'
+
+    def _run_pool(self, client):
+        last_seq = 0
+        while self.grabber.is_alive():
+            t = self.metrics.now()
+            result = self.pool.wait(last_seq)
+            t = self.metrics.lap('capture_wait', t)
+            if result is None:
+                continue
+            last_seq, jpeg, _, timestamp = result
+            yield self._part(jpeg, last_seq, timestamp)
+            self.metrics.lap('emit', t)
+            self.metrics.inc('bytes_sent_total', len(jpeg), 'Bytes of encoded frames sent to clients.')
+            self.latency.sent(client, timestamp)
+
+    def _set_clients(self, delta):
+        self.clients += delta
+        self.metrics.set('clients', self.clients, 'Connected MJPEG clients.')
+
+    def _run(self, client='client', params=None):
+        params = params or self.default_params
+        self._set_clients(1)
+        self.client_count += 1
+        client = f'{client}-{self.client_count}'
+        try:
+            # der Prozess-Pool rendert nur die Standarddarstellung
+            if self.pool is not None and params == self.default_params:
+                self.demand.add(client, 'pool')
+                yield from self._run_pool(client)
+            else:
+                self.demand.add(client, 'mjpeg')
+                yield from self._run_local(client, params)
+        finally:
+            self._set_clients(-1)
+            self.latency.remove(client)
+            self.demand.remove(client)
+
+    def _render(self, captured, params):
+        """Rendert und kodiert Frame `captured` in der Darstellung `params`."""
+        TFrame = ThermalFrame(self.videostore.camera, captured.frame, offset = self.temp_offset, calibration = self.calibration)
+        rotation, flip = params.orientation
+        if rotation is not None:
+            TFrame.rotate(rotation)
+        if flip:
+            TFrame.flip()
+        hm = Heatmap(TFrame, **dict(self.render_config, width=TFrame.width, height=TFrame.height,
+                                    colormap=params.colormap, scale=params.scale, hud=params.hud))
+        hm_frame = hm.get_frame()
+
+        t = self.metrics.now()
+        jpeg = cv2.imencode('.jpg', hm_frame, [cv2.IMWRITE_JPEG_QUALITY, params.quality])[1].tobytes()
+        self.metrics.lap('encode', t)
+        return jpeg, hm.img_data
+
+    def _run_local(self, client, params):
+        # jeder Client liest den jeweils neuesten Frame des Grabbers; gerendert wird einmal pro Darstellung
+        # und Keyframe, bei unveränderter Szene wird nichts gesendet
+        last_seq = 0
+        last_content = None
+        while self.grabber.is_alive():
+            self.profiler.tick()
             try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                TFrame = ThermalFrame(self.videostore.camera, frame, offset = self.temp_offset)
-                hm = Heatmap(TFrame)
-                hm_frame = hm.get_frame()
-                self.img_data = hm.img_data
-
-                # Erzeuge den MJPEG-Stream
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + cv2.imencode('.jpg', hm_frame)[1].tobytes() + b'\r\n')
+                t = self.metrics.now()
+                captured = self.grabber.read(last_seq)
+                self.metrics.lap('capture_wait', t)
+                if captured is None:
+                    continue
+                if last_seq > 0:
+                    self.frames_skipped += captured.seq - last_seq - 1
+                    self.metrics.inc('frames_dropped_total', captured.seq - last_seq - 1, 'Frames replaced by a newer one before rendering.')
+                last_seq = captured.seq
+                if self.first_frame:
+                    print(f"First frame after {time.monotonic() - STARTUP_TIME:.2f} s")
+                    self.first_frame = False
+                content_seq = self._content_seq(captured)
+                if content_seq == last_content:
+                    continue
+                last_content = content_seq
+                jpeg, _ = self.renditions.get(params, content_seq, captured)
+                t = self.metrics.now()
             except Exception as e:
+                self.metrics.inc('frames_failed_total', 1, 'Frames that failed in a processing stage.')
                 continue
+            yield self._part(jpeg, captured.seq, captured.timestamp)
+            self.metrics.lap('emit', t)
+            self.metrics.inc('bytes_sent_total', len(jpeg), 'Bytes of encoded frames sent to clients.')
+            self.latency.sent(client, captured.timestamp)
 
 ### FLASK APP
 
@@ -272,8 +510,14 @@ def main():
     parser = argparse.ArgumentParser(description='Flask Video Streamer')
     parser.add_argument('--config', type=str, default='config.yml',
                         help='Pfad zur Konfigurationsdatei (Standard: config.yml im aktuellen Verzeichnis)')
+    parser.add_argument('--import-report', action='store_true',
+                        help='Importzeiten pro Subsystem ausgeben und beenden')
     args = parser.parse_args()
 
+    if args.import_report:
+        print_import_report()
+        return
+
     app = Flask(__name__)
     CORS(app)
     api = Api(app)
@@ -290,6 +534,9 @@ def main():
     
     video_streamer=VideoStreamer(**config_parser.get_config())
 
+    def not_responding():
+        return {'message': 'Analysis loop not responding'}, 503
+
     class SetTemperature(Resource):
         def post(self):
             parser = reqparse.RequestParser()
@@ -302,27 +549,135 @@ def main():
             destination = args['destination']
             temperature = args['temperature']
             
-            if video_streamer.img_data==None:
-                return {'message': video_streamer.img_data}, 400
-
-            if destination == 'min':
-                video_streamer.temp_offset += temperature - video_streamer.img_data['min_temp']
-                
-            elif destination == 'max':
-                video_streamer.temp_offset += temperature - video_streamer.img_data['max_temp']
-                
-            elif destination == 'average':
-                video_streamer.temp_offset += temperature - video_streamer.img_data['avg_temp']
-                
+            try:
+                video_streamer.commands.call(video_streamer._set_temperature, destination, temperature)
+            except CommandTimeout:
+                return not_responding()
+            except ValueError as e:
+                return {'message': str(e)}, 400
+
             return {'message': f'Temperature for {destination} set to {temperature}'}, 200
 
+    class Rules(Resource):
+        def get(self):
+            return {'rules': video_streamer.rules.rules_data(), 'events': list(video_streamer.rules.events)}, 200
+
+        def post(self):
+            try:
+                rule = video_streamer.commands.call(video_streamer.rules.add_rule, request.get_json(force=True))
+            except CommandTimeout:
+                return not_responding()
+            except (TypeError, ValueError) as e:
+                return {'message': str(e)}, 400
+            return {'message': f'Rule {rule.name} added', 'rule': rule.data()}, 200
+
+    class RuleItem(Resource):
+        def delete(self, name):
+            try:
+                removed = video_streamer.commands.call(video_streamer.rules.remove_rule, name)
+            except CommandTimeout:
+                return not_responding()
+            if not removed:
+                return {'message': f'Rule {name} not found'}, 404
+            return {'message': f'Rule {name} removed'}, 200
+
+    class History(Resource):
+        def get(self):
+            parser = reqparse.RequestParser()
+            parser.add_argument('level', type=str, default='second', location='args',
+                                choices=tuple(video_streamer.history.levels), help='Unknown history level')
+            parser.add_argument('since', type=float, location='args')
+            parser.add_argument('until', type=float, location='args')
+            args = parser.parse_args()
+            return video_streamer.history.query(args['level'], since=args['since'], until=args['until']), 200
+
+    class Histogram(Resource):
+        def get(self):
+            if video_streamer.histogram is None:
+                return {'message': 'No frame yet'}, 404
+            return video_streamer.histogram, 200
+
     api.add_resource(SetTemperature, '/api/set_temperature')
+    api.add_resource(Histogram, '/api/histogram')
+    api.add_resource(History, '/api/history')
+    api.add_resource(Rules, '/api/rules')
+    api.add_resource(RuleItem, '/api/rules/<string:name>')
     
+    @app.route('/metrics')
+    def metrics():
+        return Response(video_streamer.metrics.render(), mimetype=METRICS_CONTENT_TYPE)
+
+    @app.route('/api/latency')
+    def latency():
+        return {'clients': video_streamer.latency.summary()}
+
+    # Abfragen des neuesten Frames ohne Stream-Verbindung; ETag = Sequenznummer des Frames
+    def cached_response(seq, body, mimetype, **headers):
+        headers.update({'ETag': etag(seq), 'Cache-Control': 'no-cache', 'X-Frame-Seq': str(seq)})
+        if not_modified(request.headers.get('If-None-Match'), seq):
+            return Response(status=304, headers=headers)
+        return Response(body() if callable(body) else body, mimetype=mimetype, headers=headers)
+
+    @app.route('/snapshot.jpg')
+    def snapshot():
+        latest, captured = video_streamer.latest, video_streamer.last_captured
+        if latest is None or captured is None:
+            return {'message': 'No frame yet'}, 503
+        try:
+            params = RenditionParams.from_args(request.args, video_streamer.default_params)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        if not_modified(request.headers.get('If-None-Match'), latest.content_seq):
+            return cached_response(latest.content_seq, b'', 'image/jpeg')
+        # dieselbe Darstellung wie im Stream, höchstens einmal pro Keyframe kodiert
+        seq, (jpeg, _) = video_streamer.renditions.get_latest(params, latest.content_seq, captured)
+        return cached_response(seq, jpeg, 'image/jpeg')
+
+    @app.route('/api/frame.npy')
+    def frame_npy():
+        latest = video_streamer.latest
+        if latest is None:
+            return {'message': 'No frame yet'}, 503
+        return cached_response(latest.content_seq, latest.npy, 'application/octet-stream',
+                               **{'Content-Disposition': f'attachment; filename=frame_{latest.seq}.npy'})
+
+    @app.route('/api/stats')
+    def stats():
+        latest = video_streamer.latest
+        if latest is None:
+            return {'message': 'No frame yet'}, 503
+        return cached_response(latest.content_seq, lambda: json.dumps(latest.stats()), 'application/json')
+
+    @app.route('/api/consumers')
+    def consumers():
+        return {'consumers': video_streamer.demand.summary()}
+
+    @app.route('/api/renditions')
+    def renditions():
+        return {'default': video_streamer.default_params._asdict(), 'renditions': video_streamer.renditions.stats()}
+
+    @app.route('/api/profile')
+    def profile():
+        try:
+            report = video_streamer.profiler.profile(request.args.get('seconds', 10, type=float))
+        except RuntimeError as e:
+            return {'message': str(e)}, 409
+        if request.args.get('format') == 'text':
+            return Response(video_streamer.profiler.text(request.args.get('sort', 'cumulative')), mimetype='text/plain')
+        return report
+
+    # kill -USR1 <pid>: 10 s Profil von Analyse- und Client-Schleifen nach ./profiles
+    video_streamer.profiler.install_signal_handler(os.path.join(os.getcwd(), 'profiles'))
+
     @app.route('/')
     @app.route('/mjpeg')
     @error_handling
     def video_feed():
-        return Response(video_streamer._run(),
+        try:
+            params = RenditionParams.from_args(request.args, video_streamer.default_params)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        return Response(video_streamer._run(request.remote_addr, params),
                         mimetype='multipart/x-mixed-replace; boundary=frame')
     
     app.run(host='0.0.0.0', port=5000)
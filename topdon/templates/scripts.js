@@ -37,12 +37,41 @@ function showTab(tabId) {
     getFileList();
 }
 
-var socket = io.connect(window.location.protocol + '//'  + document.domain + ':' + location.port);
+// Eigene Darstellung über den Query-String der Seite, z.B. /?colormap=3&scale=2&hud=none&rotation=90&flip=1&quality=70
+var renderParams = Object.fromEntries(new URLSearchParams(window.location.search));
+var socket = io.connect(window.location.protocol + '//'  + document.domain + ':' + location.port, {query: renderParams});
+
+// Render-Parameter zur Laufzeit ändern; {} wechselt zurück zu den globalen Einstellungen
+function setRenderParams(params) {
+    socket.emit('render_params', params, function(result) {
+        if (result.error) {
+            console.warn(result.error);
+        }
+    });
+}
+
+// Latenzmessung: Empfangs- und Anzeigezeit jedes Frames an den Server zurückmelden
+var pendingFrame = null;
 
 socket.on('update_frame', function(data) {
+    if (data.seq !== undefined) {
+        pendingFrame = {seq: data.seq, receive: performance.now()};
+    }
     document.getElementById('videoFrame').src = 'data:image/jpeg;base64,' + data.current_frame;
 });
 
+document.getElementById('videoFrame').addEventListener('load', function() {
+    var frame = pendingFrame;
+    pendingFrame = null;
+    if (frame === null) {
+        return;
+    }
+    // angezeigt ist das Bild mit dem nächsten Repaint
+    requestAnimationFrame(function() {
+        socket.emit('frame_ack', {seq: frame.seq, receive: frame.receive, display: performance.now()});
+    });
+});
+
 // BUTTONS
 var recording = false; 
 
@@ -79,6 +108,10 @@ function flipImage() {
     sendAjaxRequest("/flip_image");
 }
 
+function toggleAutoContrast() {
+    sendAjaxRequest("/toggle_auto_contrast");
+}
+
 function quit() {
     sendAjaxRequest("/quit");
 }
@@ -95,25 +128,81 @@ function rotateImage() {
     sendAjaxRequest("/rotate_image");
 }
 
+// DATEILISTE (seitenweise)
+const fileListPageSize = 50;
+var fileListOffset = 0;
+var fileListTotal = null;
+var fileListLoading = false;
+var fileListEtag = null;
+var fileListEtagTotal = null;
+
 function getFileList() {
-    sendAjaxRequestWithResponse("/get_file_list");
+    fileListOffset = 0;
+    fileListTotal = null;
+    loadFileListPage(true);
 }
 
-function sendAjaxRequestWithResponse(url) {
+function loadFileListPage(reset) {
+    if (fileListLoading || (fileListTotal !== null && fileListOffset >= fileListTotal)) {
+        return;
+    }
+    fileListLoading = true;
+
     const xhr = new XMLHttpRequest();
-    xhr.open("GET", url, true);
+    xhr.open("GET", `/get_file_list?offset=${fileListOffset}&limit=${fileListPageSize}`, true);
+    if (reset && fileListEtag !== null) {
+        xhr.setRequestHeader('If-None-Match', fileListEtag);
+    }
     xhr.onreadystatechange = function () {
-        if (xhr.readyState === 4 && xhr.status === 200) {
+        if (xhr.readyState !== 4) {
+            return;
+        }
+        fileListLoading = false;
+        if (xhr.status === 304) {
+            // Erste Seite unverändert, vorhandene Liste behalten
+            fileListOffset = document.querySelectorAll('#fileListContainer .file-item').length;
+            fileListTotal = fileListEtagTotal;
+        } else if (xhr.status === 200) {
             const response = JSON.parse(xhr.responseText);
-            displayFileList(response);
+            if (reset) {
+                fileListEtag = xhr.getResponseHeader('ETag');
+                fileListEtagTotal = response.total;
+            }
+            fileListTotal = response.total;
+            fileListOffset += response.files.length;
+            displayFileList(response.files, reset);
         }
     };
     xhr.send();
 }
 
-function displayFileList(fileList) {
+document.getElementById('fileListContainer').addEventListener('scroll', function () {
+    const container = this;
+    if (container.scrollTop + container.clientHeight >= container.scrollHeight - 200) {
+        loadFileListPage(false);
+    }
+});
+
+function formatFileMeta(meta) {
+    if (!meta) {
+        return '';
+    }
+    const parts = [meta.created.replace('T', ' '), `${(meta.size / 1024 / 1024).toFixed(2)} MB`];
+    if (meta.duration !== undefined && meta.duration !== null) {
+        parts.push(`${meta.duration} s (${meta.frames} Frames)`);
+    }
+    if (meta.temperatures && meta.temperatures.max_temp !== undefined) {
+        parts.push(`${meta.temperatures.min_temp} / ${meta.temperatures.avg_temp} / ${meta.temperatures.max_temp} C`);
+    }
+    return parts.join(' · ');
+}
+
+function displayFileList(fileList, reset) {
     const fileListContainer = document.getElementById('fileListContainer');
-    fileListContainer.innerHTML = '';
+    if (reset) {
+        fileListContainer.innerHTML = '';
+    }
+    const fragment = document.createDocumentFragment();
 
     fileList.forEach(file => {
         const fileItem = document.createElement('div');
@@ -122,12 +211,25 @@ function displayFileList(fileList) {
         const fileName = document.createElement('span');
         fileName.textContent = `${file.name}.${file.ending}`;
 
+        const fileMeta = document.createElement('small');
+        fileMeta.className = 'file-meta';
+        fileMeta.textContent = formatFileMeta(file.meta);
+        fileName.appendChild(document.createElement('br'));
+        fileName.appendChild(fileMeta);
+
         const downloadButton = document.createElement('button');
         downloadButton.textContent = 'Download';
         downloadButton.onclick = function() {
             downloadFile(file.filename);
         };
 
+        const bundleButton = document.createElement('button');
+        bundleButton.textContent = 'ZIP';
+        bundleButton.title = 'Aufnahme und Daten als ZIP herunterladen';
+        bundleButton.onclick = function() {
+            downloadBundle(file.filename);
+        };
+
         const deleteButton = document.createElement('button');
         deleteButton.textContent = 'Löschen';
         deleteButton.className = 'delete-button';
@@ -137,32 +239,40 @@ function displayFileList(fileList) {
             }
         };
 
+        if (file.thumbnail) {
+            const thumbnail = document.createElement('img');
+            thumbnail.className = 'file-thumbnail';
+            thumbnail.loading = 'lazy';
+            thumbnail.src = file.thumbnail;
+            fileItem.appendChild(thumbnail);
+        }
+
         fileItem.appendChild(fileName);
         fileItem.appendChild(downloadButton);
+        fileItem.appendChild(bundleButton);
         fileItem.appendChild(deleteButton);
-        fileListContainer.appendChild(fileItem);
+        fragment.appendChild(fileItem);
     });
+    fileListContainer.appendChild(fragment);
 }
 
 
 function downloadFile(filename) {
-    const xhr = new XMLHttpRequest();
-    xhr.open("GET", `/download_file/${encodeURIComponent(filename)}`, true);
-    xhr.responseType = 'blob';
-    xhr.onload = function () {
-        if (xhr.status === 200) {
-            const blob = new Blob([xhr.response], { type: xhr.getResponseHeader('Content-Type') });
-            const link = document.createElement('a');
-            link.href = window.URL.createObjectURL(blob);
-            link.download = filename;
-            document.body.appendChild(link);
-            link.click();
-            document.body.removeChild(link);
-        } else {
-            console.error('Download fehlgeschlagen:', xhr.statusText);
-        }
-    };
-    xhr.send();
+    // Download über den Browser, damit abgebrochene Downloads per Range-Request fortgesetzt werden können
+    startDownload(`/download_file/${encodeURIComponent(filename)}`, filename);
+}
+
+function downloadBundle(filename) {
+    startDownload(`/download_bundle/${encodeURIComponent(filename)}`, '');
+}
+
+function startDownload(url, filename) {
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = filename;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
 }
 
 function deleteFile(filename) {
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+thumbnail cache
+"""
+import os
+import queue
+import threading
+import logging
+from collections import OrderedDict
+
+import cv2
+
+try:
+    from topdon.files import *
+except:
+    from files import *
+
+log = logging.getLogger(__name__)
+
+class ThumbnailCache:
+    def __init__(self, base_path: str, max_bytes=50 * 1024 * 1024, size=(192, 144), quality=70):
+        """
+        Erzeugt kleine JPEG-Vorschaubilder für Snapshots und Aufnahmen.
+
+        Die Vorschaubilder werden lazy in einem Hintergrund-Thread erzeugt und unter
+        `<base_path>/.thumbnails` abgelegt. Der Dateiname enthält die mtime der Quelldatei,
+        so dass geänderte Dateien automatisch neu gerendert werden. Überschreitet der Cache
+        `max_bytes`, werden die am längsten nicht genutzten Vorschaubilder gelöscht.
+
+        Args:
+            base_path (str): Media-Verzeichnis.
+            max_bytes (int): Maximale Größe des Caches auf der Festplatte.
+            size (tuple): Maximale Breite und Höhe der Vorschaubilder.
+            quality (int): JPEG-Qualität.
+        """
+        self.cache_dir = os.path.join(base_path, '.thumbnails')
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._entries = OrderedDict()
+        self._total = 0
+        self._load_index()
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def _load_index(self):
+        """Liest vorhandene Vorschaubilder ein, die ältesten zuerst."""
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, file, stat.st_size))
+        for _, file, size in sorted(entries):
+            self._entries[file] = size
+            self._total += size
+
+    def _key(self, file_info: FileTypeGeneric):
+        mtime = os.stat(file_info.path).st_mtime_ns
+        return f'{file_info.filename}.{mtime}.jpg'
+
+    def get(self, file_info: FileTypeGeneric, timeout=2.0):
+        """
+        Gibt den Pfad des Vorschaubildes zurück. Existiert es noch nicht, wird es im
+        Hintergrund erzeugt und bis zu `timeout` Sekunden darauf gewartet.
+
+        Returns:
+            str: Pfad des Vorschaubildes oder None, falls (noch) nicht verfügbar.
+        """
+        try:
+            key = self._key(file_info)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return os.path.join(self.cache_dir, key)
+            event = self._pending.get(key)
+            if event is None:
+                event = threading.Event()
+                self._pending[key] = event
+                self._queue.put((key, file_info))
+
+        if not event.wait(timeout):
+            return None
+        with self._lock:
+            return os.path.join(self.cache_dir, key) if key in self._entries else None
+
+    def _work(self):
+        while True:
+            key, file_info = self._queue.get()
+            try:
+                self._generate(key, file_info)
+            except Exception as e:
+                log.warning(f"Thumbnail for {file_info.filename} failed: {e}")
+            finally:
+                with self._lock:
+                    event = self._pending.pop(key, None)
+                if event is not None:
+                    event.set()
+
+    def _read_frame(self, file_info: FileTypeGeneric):
+        """Liest das Bild (PNG) oder einen repräsentativen Frame (Mitte des Videos)."""
+        if isinstance(file_info, ImageFile):
+            return cv2.imread(file_info.path)
+
+        cap = cv2.VideoCapture(file_info.path)
+        try:
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if frames > 1:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frames // 2)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
+
+    def _generate(self, key: str, file_info: FileTypeGeneric):
+        frame = self._read_frame(file_info)
+        if frame is None:
+            return
+
+        height, width = frame.shape[:2]
+        factor = min(self.size[0] / width, self.size[1] / height, 1.0)
+        thumb = cv2.resize(frame, (max(int(width * factor), 1), max(int(height * factor), 1)), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', thumb, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ret:
+            return
+
+        path = os.path.join(self.cache_dir, key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(buffer.tobytes())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._entries[key] = len(buffer)
+            self._total += len(buffer)
+            self._evict()
+
+    def _evict(self):
+        """Löscht die am längsten nicht genutzten Vorschaubilder, bis der Cache unter `max_bytes` liegt."""
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, key))
+            except FileNotFoundError:
+                pass
@@ -11,105 +11,72 @@ https://github.com/leswright1977/PyThermalCamera
 '''
 import cv2
 import numpy as np
-import pandas as pd
 import argparse
 import time
 from datetime import datetime
 import io
+import json
 import base64
+import hashlib
+import math
 import os
 import subprocess
 import sys
 import socket
 from itertools import cycle
+from concurrent.futures import TimeoutError as CommandTimeout
 
-from flask import Flask, render_template, request, send_from_directory, jsonify, send_file
-from flask_socketio import SocketIO
-from threading import Thread
-
-import pyqrcode
+from threading import Thread, Condition
 
 import logging
 
-from quickflare.quickflare import CloudflaredManager
+# Flask, Socket.IO, pandas, pyqrcode, quickflare und der Updater werden erst
+# importiert, wenn die jeweilige Funktion genutzt wird (schneller Start)
 
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 
 try:
+    from topdon.core import *
     from topdon.video import *
-    from topdon.updater import *
     from topdon.files import *
+    from topdon.thumbnails import ThumbnailCache
+    from topdon.rules import RuleEngine
+    from topdon.ringbuffer import PreTriggerBuffer
+    from topdon.history import StatsHistory
+    from topdon.calibration import CalibrationMap, CalibrationBuilder, OutputBuffers, default_calibration_file
+    from topdon.metrics import Metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+    from topdon.profiler import PipelineProfiler
+    from topdon.latency import LatencyTracker
+    from topdon.renditions import RenditionParams, RenditionCache, DEGREES
+    from topdon.snapshot import FrameSnapshot, etag, not_modified
+    from topdon.demand import Demand
+    from topdon.change import ChangeDetector
+    from topdon.commands import CommandQueue
 except:
+    from core import *
     from video import *
-    from updater import *
     from files import *
+    from thumbnails import ThumbnailCache
+    from rules import RuleEngine
+    from ringbuffer import PreTriggerBuffer
+    from history import StatsHistory
+    from calibration import CalibrationMap, CalibrationBuilder, OutputBuffers, default_calibration_file
+    from metrics import Metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+    from profiler import PipelineProfiler
+    from latency import LatencyTracker
+    from renditions import RenditionParams, RenditionCache, DEGREES
+    from snapshot import FrameSnapshot, etag, not_modified
+    from demand import Demand
+    from change import ChangeDetector
+    from commands import CommandQueue
     
 current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Socket.IO-Raum der Clients ohne eigene Render-Parameter (globale Einstellungen)
+DEFAULT_ROOM = 'view:default'
 template_folder = os.path.join(current_dir, 'templates')
 static_folder = os.path.join(current_dir, 'static')
 
-class ThermalFrame:
-    def __init__(self, camera, frame, rnd=2, offset=0):
-        self.imdata, self.thdata = np.array_split(frame, 2)
-        self.rnd = rnd
-        self.camera = camera
-        self.height, self.width, _ = self.imdata.shape
-        self.offset = offset
-
-    def rotate(self, rotation):
-        self.imdata = cv2.rotate(self.imdata, rotation)
-        self.thdata = cv2.rotate(self.thdata, rotation)
-        self.height, self.width, _ = self.imdata.shape
-
-    def flip(self):
-        self.imdata = cv2.flip(self.imdata, 1)
-        self.thdata = cv2.flip(self.thdata, 1)
-
-    def _set_target(self,h,w):
-        self.target_h = int(h)
-        self.target_w = int(w)
-        self.target_temp = np.round(self.temperatures[self.target_h][self.target_w],self.rnd)
-
-    def _convert_raw_temp_data_to_kelvin_topdon(self, thdata):
-        """
-        thdata[..., 1] contains just some offset/calibration in the range about 300 K
-        thdata[..., 0] contains a little temp offset
-        ... /64 is equivalent to the bitshift operation >> 6. This way, the temperature is only encoded via integer numbers.
-        """
-        return (thdata[..., 0] + thdata[..., 1] * 256) / 64 + self.offset
-
-    def _get_celsius_temperatures(self):
-        return self._convert_raw_temp_data_to_kelvin_topdon(self.thdata) - 273.15
-
-    def _process_frame(self):
-        # converting kelvon to celsius
-        if self.camera['name'] == 'TC001':
-            self.temperatures = self._get_celsius_temperatures()
-        else:
-            raise Exception('Unknown camera')
-        
-    
-        self.maxtemp, self.mintemp, self.avgtemp = [np.round(k,self.rnd) for k in [self.temperatures.max(), self.temperatures.min(), self.temperatures.mean()]]
-
-    def _get_data(self, newWidth):
-        self.maxtemp_index = divmod(self.temperatures.argmax(), self.width)
-        self.mintemp_index = divmod(self.temperatures.argmin(), self.width)
-        
-        img_data = {
-                'avg_temp': self.avgtemp,
-                'max_temp': self.maxtemp,
-                'min_temp': self.mintemp,
-                'target_temp'    : self.target_temp,
-                'max_temp_x': int(self.maxtemp_index[0]*newWidth/self.width),
-                'max_temp_y': int(self.maxtemp_index[1]*newWidth/self.width),
-                'min_temp_x': int(self.mintemp_index[0]*newWidth/self.width),
-                'min_temp_y': int(self.mintemp_index[1]*newWidth/self.width),
-                'target_x': int(self.target_h*newWidth/self.width),
-                'target_y': int(self.target_w*newWidth/self.width),
-            }
-        return img_data
-
-
 class PhotoSnapshot:
     def __init__(self, camera, imdata, temperatures, img_data, savedir = None):
         self.savedir = savedir
@@ -121,6 +88,7 @@ class PhotoSnapshot:
         self.thdata = temperatures
         self.data = img_data
         self.init_t = datetime.now()
+        self.paths = list()
         
         self.save_to_xlsx()
         self.save_image()
@@ -129,20 +97,25 @@ class PhotoSnapshot:
         return self.init_t.strftime("%Y%m%d-%H%M%S")
     
     def save_to_xlsx(self):
+        import pandas as pd
+
         xlsx_file = os.path.join(self.savedir,f'{self.camera["name"]}_{self._time_str()}.xlsx')
         DF_temp = pd.DataFrame(self.thdata)
         DF_temp.index += 1
         DF_temp.columns += 1
         
-        DF_data = pd.DataFrame([self.data])
+        DF_data = pd.DataFrame([flatten_img_data(self.data)])
         
         with pd.ExcelWriter(xlsx_file, engine='xlsxwriter') as writer:
             DF_data.to_excel(writer, sheet_name='Data', index=False)
             DF_temp.to_excel(writer, sheet_name='Temperatures', index=True)
+        self.paths.append(xlsx_file)
 
         
     def save_image(self):
-        cv2.imwrite(os.path.join(self.savedir,f'{self.camera["name"]}_{self._time_str()}.png'), self.imdata)
+        png_file = os.path.join(self.savedir,f'{self.camera["name"]}_{self._time_str()}.png')
+        cv2.imwrite(png_file, self.imdata)
+        self.paths.append(png_file)
     
 class VideoRecorder:
     def __init__(self, camera, width, height, savedir = None):
@@ -155,6 +128,7 @@ class VideoRecorder:
         self.height = height
         self.init_t = datetime.now()
         self.data = list()
+        self.paths = list()
 
         self.video_out = self._initialize_video_out()
 
@@ -164,19 +138,23 @@ class VideoRecorder:
     def _initialize_video_out(self):
         file_name = os.path.join(self.savedir,f'{self.camera["name"]}_{self._time_str()}.mp4')
         video_out = cv2.VideoWriter(file_name, cv2.VideoWriter_fourcc(*'mp4v'), 25, (self.width, self.height))
+        self.paths.append(file_name)
         return video_out
 
     def add_frame(self, frame, data=None):
         self.video_out.write(frame)
         if data!=None:
             update_data = {'t':(datetime.now() - self.init_t).total_seconds()}
-            update_data.update(data)
+            update_data.update(flatten_img_data(data))
             self.data.append(update_data)
         
     def save_to_xlsx(self):
+        import pandas as pd
+
         xlsx_file = os.path.join(self.savedir,f'{self.camera["name"]}_{self._time_str()}.xlsx')
         DF_data = pd.DataFrame(self.data)
         DF_data.to_excel(xlsx_file, index=False)
+        self.paths.append(xlsx_file)
 
     def release(self):
         self.video_out.release()
@@ -196,9 +174,45 @@ class ThermalCamera:
                             'compress' : True,
                             'camera' : -1,
                             'media' : os.getcwd(),
+                            'rules' : None,
+                            'pretrigger' : 10,
+                            'calibration' : None,
+                            'change_delta' : 0.25,
+                            'keyframe' : 5.0,
                             }
         self.config.update(kwargs)
         self.videostore = Video()
+        self.rules = RuleEngine(self._load_rules(self.config['rules']))
+        self.rules.add_callback(self._on_rule_event)
+        self.pretrigger = None
+        self.history = StatsHistory()
+        self.calibration = self._load_calibration(self.config['calibration'])
+        self.calibration_builder = CalibrationBuilder()
+        # Temperatur-Arrays der Schleife, statt pro Frame neu zu allozieren
+        self.temperature_buffers = OutputBuffers()
+        self.metrics = Metrics()
+        self.profiler = PipelineProfiler()
+        self.latency = LatencyTracker()
+        self.clients = 0
+        # Clients mit eigenen Render-Parametern (sid -> RenditionParams), je Parametersatz ein Raum
+        self.views = {}
+        self.renditions = RenditionCache(self._render_view)
+        self.frame_seq = 0
+        self.frame_timestamp = None
+        # neuester Frame für /snapshot.jpg, /api/frame.npy und /api/stats
+        self.latest = None
+        self.latest_jpeg = None
+        self.jpeg_ready = Condition()  # signalisiert ein neues latest_jpeg
+        # Abnehmer der gerenderten Bilder (Browser, Qt-Fenster, Aufnahme); ohne sie nur Umrechnung und Statistik
+        self.demand = Demand()
+        self.heatmap_seq = None
+        # unveränderte Szene: Statistik, Bild und JPEG des letzten Keyframes weiterverwenden
+        self.changes = ChangeDetector(delta=self.config['change_delta'], keyframe_interval=self.config['keyframe'])
+        self.render_key = None
+        self.emitted_key = None
+        self.view_seqs = {}
+        # Steuerbefehle aus Flask/Socket.IO, ausgeführt von der Schleife zwischen zwei Frames
+        self.commands = CommandQueue()
         self.web = self.config['web']
         
         self.width = 256  # Sensor width
@@ -215,6 +229,8 @@ class ThermalCamera:
         self.newHeight = self.height * self.scale
         self.set_target_pos()
         self.alpha = 1.0  # Contrast control (1.0-3.0)
+        self.auto_contrast = False  # Contrast from the histogram (p1/p99)
+        self.color_mapper = ColorMapper()
         
         self.colormap_options = cycle(list(range(11)))
         self.colormap = next(self.colormap_options)
@@ -247,6 +263,7 @@ class ThermalCamera:
         
         self.heatmap = None
         self.thdata = None
+        self.TFrame = None
         self.temp_unit = " C"
 
         if self.web == True:
@@ -256,8 +273,6 @@ class ThermalCamera:
                 
             # set websocket framerate for cloudflared
             self.target_fps = 10
-            self.update_interval_seconds = 1 / self.target_fps
-            self.last_update_time = datetime.now()
                 
             self.init_webapp()
             self.video_thread = Thread(target=lambda: self.app.run(debug=False, port=self.config['port'], threaded=True, host='0.0.0.0', use_reloader=False))
@@ -269,21 +284,63 @@ class ThermalCamera:
             else:
                 url = f'http://{ip_adress}:{self.config["port"]}'
 
+            import pyqrcode
             url_qr = pyqrcode.create(url).terminal(module_color='white', background='black')
             print(f'############################\n\nOpen: {url}\n{url_qr}\n\n############################')
             print('\n\n ---> CTRL+C to quit')
             self.open_port()
             
         self.files = None
+        self.thumbnails = None
         
     def _init_files(self):
         if self.files==None:
             self.files = FileManager(base_path=self.config["media"], slug=self.videostore.camera["name"])
+            self.thumbnails = ThumbnailCache(self.config["media"])
             
     def _init_cloudflared(self):
+        from quickflare.quickflare import CloudflaredManager
         self.cf = CloudflaredManager(port=self.config['port'])
         self.cf.start(info=True)
             
+    @staticmethod
+    def _load_rules(rules):
+        """Regeln als Liste oder als Pfad zu einer YAML-Datei (Liste oder {'rules': [...]})."""
+        if rules is None or isinstance(rules, list):
+            return rules
+        import yaml
+        with open(rules, 'r') as file:
+            data = yaml.safe_load(file) or []
+        return data.get('rules', []) if isinstance(data, dict) else data
+
+    @staticmethod
+    def _load_calibration(path):
+        """Lädt die Kalibrierkarten (.npz), ohne Pfad die zuletzt erstellten, falls vorhanden."""
+        path = path or default_calibration_file()
+        if not os.path.isfile(path):
+            return None
+        calibration = CalibrationMap.load(path)
+        print(f'Calibration maps loaded: {path}')
+        return calibration
+
+    @staticmethod
+    def _thumbnail_url(file_info):
+        if file_info.ending not in ['mp4', 'png']:
+            return None
+        try:
+            return f'/thumbnail/{file_info.filename}?v={os.stat(file_info.path).st_mtime_ns}'
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _parse_date_arg(value, end_of_day=False):
+        if not value:
+            return None
+        t = datetime.fromisoformat(value)
+        if end_of_day and len(value) == 10:
+            t = t.replace(hour=23, minute=59, second=59)
+        return t
+
     def set_target_pos(self):
         self.target = (int(self.newWidth * self.target_w / self.width), int(self.newHeight* self.target_h / self.height))
 
@@ -299,6 +356,9 @@ class ThermalCamera:
             return '127.0.0.1'
             
     def init_webapp(self):
+        from flask import Flask, Response, render_template, request, jsonify, send_file
+        from flask_socketio import SocketIO, join_room, leave_room, rooms
+
         app = Flask('Thermal Camera Viewer', template_folder=template_folder, static_folder=static_folder)
         app.current_frame = None
     
@@ -314,10 +374,21 @@ class ThermalCamera:
         def index():
             return render_template('index.html', current_frame=app.current_frame, camera=self.videostore.camera)
         
+        def not_responding():
+            return jsonify({'message': 'Capture loop not responding'}), 503
+
+        def command(fn, *args):
+            """Führt fn in der Verarbeitungsschleife aus und antwortet mit dem Ergebnis."""
+            try:
+                return jsonify(self.commands.call(fn, *args))
+            except CommandTimeout:
+                return not_responding()
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+
         @app.route('/toggle_recording')
         def toggle_recording():
-            self._toggle_recording()
-            return ''
+            return command(self._toggle_recording)
 
         @app.route('/is_recording')
         def is_recording():
@@ -325,27 +396,110 @@ class ThermalCamera:
         
         @app.route('/cycle_hud')
         def cycle_hud():
-            self._cycle_hud()
-            return ''
+            return command(self._cycle_hud)
         
+        @app.route('/toggle_auto_contrast')
+        def toggle_auto_contrast():
+            return command(self._toggle_auto_contrast)
+
+        @app.route('/api/histogram', methods=['GET'])
+        def get_histogram():
+            if self.TFrame is None or not hasattr(self.TFrame, 'histogram'):
+                return jsonify({"error": "No frame yet"}), 404
+            return jsonify(dict(self.TFrame.histogram, p1_temp=self.TFrame.p_low, p99_temp=self.TFrame.p_high))
+
         @app.route('/take_photo')
         def take_photo():
-            self.snapshot()
-            return ''
+            return command(self.snapshot)
         
+        # Abfragen des neuesten Frames ohne Socket.IO und ohne Schreiben auf die Platte;
+        # ETag = Sequenznummer des Frames, das JPEG ist das zuletzt gesendete
+        def cached_response(seq, body, mimetype, **headers):
+            headers.update({'ETag': etag(seq), 'Cache-Control': 'no-cache', 'X-Frame-Seq': str(seq)})
+            if not_modified(request.headers.get('If-None-Match'), seq):
+                return Response(status=304, headers=headers)
+            return Response(body() if callable(body) else body, mimetype=mimetype, headers=headers)
+
+        @app.route('/snapshot.jpg')
+        def snapshot_jpg():
+            # Abfragen halten das Rendern 30 s lang mit 2 fps am Laufen; läuft es noch nicht,
+            # wird auf das nächste Bild gewartet
+            waiting = not self.demand.active('web')
+            self.demand.add('snapshot', 'web', fps=2, ttl=30)
+            if waiting:
+                requested = self.frame_seq
+                with self.jpeg_ready:
+                    self.jpeg_ready.wait_for(lambda: self.latest_jpeg is not None and self.latest_jpeg[0] > requested, timeout=1.0)
+            if self.latest_jpeg is None:
+                return jsonify({'message': 'No frame yet'}), 503
+            _, seq, jpeg = self.latest_jpeg
+            return cached_response(seq, jpeg, 'image/jpeg')
+
+        @app.route('/api/frame.npy')
+        def frame_npy():
+            latest = self.latest
+            if latest is None:
+                return jsonify({'message': 'No frame yet'}), 503
+            return cached_response(latest.content_seq, latest.npy, 'application/octet-stream',
+                                   **{'Content-Disposition': f'attachment; filename=frame_{latest.seq}.npy'})
+
+        @app.route('/api/stats')
+        def stats():
+            latest = self.latest
+            if latest is None:
+                return jsonify({'message': 'No frame yet'}), 503
+            return cached_response(latest.content_seq, lambda: json.dumps(latest.stats()), 'application/json')
+
         @app.route('/rotate_image')
         def rotate_image():
-            self._rotate_image()
-            return ''
+            return command(self._rotate_image)
         
         @app.route('/flip_image')
         def flip_image():
-            self._flip_image()
-            return ''
+            return command(self._flip_image)
         
         @app.route('/get_file_list', methods=['GET'])
         def get_file_list():
-            return jsonify([k.web_data() for k in self.files.get_files_list()])
+            try:
+                offset = max(int(request.args.get('offset', 0)), 0)
+                limit = request.args.get('limit')
+                limit = min(max(int(limit), 1), 500) if limit else None
+                types = [k for k in request.args.get('type', '').split(',') if k] or None
+                start = self._parse_date_arg(request.args.get('from'))
+                end = self._parse_date_arg(request.args.get('to'), end_of_day=True)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+
+            # externe Änderungen vor dem ETag übernehmen, sonst bliebe ein pollender Client bei 304
+            self.files.refresh()
+            etag = f'{self.files.version}-{hashlib.md5(request.query_string).hexdigest()}'
+            if request.if_none_match.contains(etag):
+                return '', 304
+
+            files, total = self.files.query(offset=offset, limit=limit, types=types, start=start, end=end, order=order)
+            response = jsonify({
+                'files': [dict(k.web_data(), meta=self.files.metadata(k), thumbnail=self._thumbnail_url(k)) for k in files],
+                'offset': offset,
+                'total': total,
+                })
+            response.set_etag(etag)
+            return response
+
+        @app.route('/thumbnail/<filename>', methods=['GET'])
+        def thumbnail(filename):
+            fileBundle = self.files.get_bundle(filename)
+            if fileBundle is None:
+                return jsonify({"error": "File not found"}), 404
+
+            path = self.thumbnails.get(fileBundle.record)
+            if path is None:
+                response = jsonify({"error": "Thumbnail not ready"})
+                response.headers['Retry-After'] = '2'
+                return response, 503
+
+            # Die URL enthält die mtime der Quelldatei, daher darf lange gecacht werden
+            return send_file(path, mimetype='image/jpeg', max_age=31536000, conditional=True)
 
         @app.route('/download_file/<filename>', methods=['GET'])
         def download_file(filename):
@@ -354,7 +508,19 @@ class ThermalCamera:
             if fileInfo==None:
                 return jsonify({"error": "File not found"}), 404
             
-            return send_file(fileInfo.data().get('path'), as_attachment=True)
+            # conditional=True beantwortet Range- und If-Range/If-None-Match-Anfragen,
+            # abgebrochene Downloads können so fortgesetzt werden
+            return send_file(fileInfo.data().get('path'), as_attachment=True, conditional=True, etag=True)
+
+        @app.route('/download_bundle/<filename>', methods=['GET'])
+        def download_bundle(filename):
+            fileBundle = self.files.get_bundle(filename)
+
+            if fileBundle is None:
+                return jsonify({"error": "File not found"}), 404
+
+            return Response(fileBundle.iter_zip(), mimetype='application/zip',
+                            headers={'Content-Disposition': f'attachment; filename="{fileBundle.name}.zip"'})
 
         @app.route('/delete_file/<filename>', methods=['DELETE'])
         def delete_file(filename):
@@ -364,50 +530,332 @@ class ThermalCamera:
                 return jsonify({"error": "File not found"}), 404
 
             try:
-                fileBundle.delete()
+                self.files.delete_bundle(fileBundle)
                 return jsonify({"message": "Files deleted successfully"}), 200
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
         
+        @app.route('/api/rules', methods=['GET'])
+        def get_rules():
+            return jsonify({'rules': self.rules.rules_data(), 'events': list(self.rules.events)})
+
+        @app.route('/api/rules', methods=['POST'])
+        def add_rule():
+            return command(self._add_rule, request.get_json(force=True))
+
+        @app.route('/api/rules/<name>', methods=['DELETE'])
+        def delete_rule(name):
+            try:
+                removed = self.commands.call(self.rules.remove_rule, name)
+            except CommandTimeout:
+                return not_responding()
+            if not removed:
+                return jsonify({"error": "Rule not found"}), 404
+            return jsonify({"message": f"Rule {name} removed"}), 200
+
+        @app.route('/api/history', methods=['GET'])
+        def get_history():
+            try:
+                since = request.args.get('since', type=float)
+                until = request.args.get('until', type=float)
+                return jsonify(self.history.query(request.args.get('level', 'second'), since=since, until=until))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        @app.route('/api/calibration', methods=['GET'])
+        def get_calibration():
+            return jsonify({
+                            'enabled': self.calibration is not None,
+                            'calibration': self.calibration.data() if self.calibration is not None else None,
+                            'builder': self.calibration_builder.data(),
+                           })
+
+        @app.route('/api/calibration', methods=['DELETE'])
+        def disable_calibration():
+            return command(self._set_calibration, None)
+
+        @app.route('/api/calibration/reference', methods=['POST'])
+        def calibration_reference():
+            data = request.get_json(force=True)
+            try:
+                self.calibration_builder.start(float(data['temperature']), int(data.get('frames', 25)))
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify({"message": "Reference capture started", "builder": self.calibration_builder.data()}), 200
+
+        @app.route('/api/calibration/build', methods=['POST'])
+        def calibration_build():
+            data = request.get_json(silent=True) or {}
+            regions = data.get('regions', self.calibration.regions if self.calibration is not None else None)
+            try:
+                calibration = self.calibration_builder.build(regions)
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            path = self.config['calibration'] or default_calibration_file()
+            calibration.save(path)
+            # berechnet wird hier, ausgetauscht zwischen zwei Frames
+            return command(self._set_calibration, calibration, f"Calibration saved to {path}")
+
+        @app.route('/api/calibration/emissivity', methods=['POST'])
+        def calibration_emissivity():
+            data = request.get_json(force=True)
+            return command(self._set_emissivity, data.get('regions', []))
+
+        @app.route('/metrics')
+        def metrics():
+            return Response(self.metrics.render(), mimetype=METRICS_CONTENT_TYPE)
+
+        @app.route('/api/profile', methods=['GET'])
+        def profile():
+            try:
+                report = self.profiler.profile(request.args.get('seconds', 10, type=float))
+            except RuntimeError as e:
+                return jsonify({"error": str(e)}), 409
+            if request.args.get('save', 'false') == 'true':
+                report['saved'] = self.profiler.save(os.path.join(self.config['media'], '.profiles'))
+            if request.args.get('format') == 'text':
+                return Response(self.profiler.text(request.args.get('sort', 'cumulative')), mimetype='text/plain')
+            return jsonify(report)
+
+        @app.route('/api/latency', methods=['GET'])
+        def get_latency():
+            return jsonify({'clients': self.latency.summary()})
+
+        @app.route('/api/consumers', methods=['GET'])
+        def get_consumers():
+            return jsonify({'consumers': self.demand.summary()})
+
         @app.route('/send_coordinates')
         def send_coordinates():
-            y = float(request.args.get('x'))
-            x = float(request.args.get('y'))
-            
-            self.target_h = int(x*self.height)
-            self.target_w = int(y*self.width)
-            self.set_target_pos()
-            return ''
+            try:
+                x = float(request.args.get('x'))
+                y = float(request.args.get('y'))
+            except (TypeError, ValueError):
+                x = y = None
+            if not all(k is not None and math.isfinite(k) and 0 <= k <= 1 for k in (x, y)):
+                return jsonify({'message': 'x and y must be numbers between 0 and 1'}), 400
+            return command(self._set_target, x, y)
         
         
         self.app = app
         self.socket = SocketIO(self.app)
 
+        def set_view(args, connected=True):
+            """Ordnet den Client seiner Darstellung zu; ohne Render-Parameter gelten die globalen Einstellungen."""
+            args = {k: v for k, v in args.items() if k in RenditionParams._fields}
+            params = RenditionParams.from_args(args, self._view_defaults()) if args else None
+            # Räume brauchen den Request-Kontext, der Zustand wird in der Verarbeitungsschleife geändert
+            room = self._view_room(params)
+            if connected:
+                for current in rooms():
+                    if current not in (request.sid, room):
+                        leave_room(current)
+            join_room(room)
+            self.commands.submit(self._set_view, request.sid, params)
+            return params
+
+        @self.socket.on('connect')
+        def on_connect():
+            self.commands.submit(self._set_clients, 1)
+            # Render-Parameter aus dem Query-String des Handshakes
+            try:
+                set_view(request.args.to_dict(), connected=False)
+            except ValueError:
+                set_view({}, connected=False)
+
+        @self.socket.on('disconnect')
+        def on_disconnect():
+            self.latency.remove(request.sid)
+            self.commands.submit(self._set_clients, -1)
+            self.commands.submit(self._remove_view, request.sid)
+
+        @self.socket.on('render_params')
+        def on_render_params(data):
+            # {} wechselt zurück zu den globalen Einstellungen
+            try:
+                params = set_view(dict(data or {}))
+            except (TypeError, ValueError) as e:
+                return {'error': str(e)}
+            return {'params': params._asdict() if params else None, 'room': self._view_room(params)}
+
+        @self.socket.on('frame_ack')
+        def on_frame_ack(data):
+            # Empfangs- und Anzeigezeit des Browsers (ms, Browser-Uhr) zum Frame seq
+            try:
+                self.latency.ack(request.sid, int(data['seq']), data['receive'], data['display'])
+            except (KeyError, TypeError, ValueError):
+                pass
+
+    def _web_fps(self):
+        """Bildrate für Browser: mit compress höchstens target_fps, sonst jeder Frame."""
+        return self.target_fps if self.config['compress'] == True else None
+
+    def _view_defaults(self):
+        """Die aktuellen globalen Einstellungen als Render-Parameter (für fehlende Werte)."""
+        return RenditionParams(self.colormap, self.scale, self.hud, DEGREES[self.rotation], self.flip,
+                               50 if self.config['compress'] == True else 95)
+
+    @staticmethod
+    def _view_room(params):
+        return DEFAULT_ROOM if params is None else params.room
+
+    def _set_view(self, sid, params):
+        """Darstellung eines Socket.IO-Clients setzen (None = globale Einstellungen)."""
+        if params is None:
+            self.views.pop(sid, None)
+        else:
+            self.views[sid] = params
+            self.renditions.touch(params)
+        self.changes.force()  # der neue Client bekommt sofort ein Bild
+        self.demand.add(sid, 'web' if params is None else 'views', self._web_fps())
+
+    def _remove_view(self, sid):
+        self.views.pop(sid, None)
+        self.demand.remove(sid)
+
+    def _set_clients(self, delta):
+        self.clients = max(self.clients + delta, 0)
+        self.metrics.set('clients', self.clients, 'Connected Socket.IO clients.')
+
     def update_web_frame(self, frame, quality=50):
-        current_time = datetime.now()
-        time_difference = current_time - self.last_update_time
-        
+        # der Takt (target_fps mit compress) kommt aus self.demand
         if self.config['compress'] == True:
-            if time_difference.total_seconds() >= self.update_interval_seconds:
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
-                self.app.current_frame = base64.b64encode(buffer).decode('utf-8')
-                self.socket.emit('update_frame', {'current_frame': self.app.current_frame, 'image_width': self.newWidth, 'image_height': self.newHeight})
-                self.last_update_time = current_time
+            self._emit_web_frame(frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        else:
+            self._emit_web_frame(frame, [])
+
+    def _frame_payload(self, payload):
+        if self.frame_timestamp is not None:
+            # Sequenznummer und Aufnahmezeit (Server, monotonic) reisen mit dem Frame
+            payload.update(seq=self.frame_seq, captured=self.frame_timestamp, age_ms=round((time.monotonic() - self.frame_timestamp) * 1000, 1))
+        return payload
+
+    def _set_latest_jpeg(self, latest_jpeg):
+        with self.jpeg_ready:
+            self.latest_jpeg = latest_jpeg
+            self.jpeg_ready.notify_all()
+
+    def _emit_web_frame(self, frame, params):
+        t = self.metrics.now()
+        _, buffer = cv2.imencode('.jpg', frame, params)
+        self.app.current_frame = base64.b64encode(buffer).decode('utf-8')
+        # (aktueller Frame, Frame der Kodierung = ETag, JPEG)
+        self._set_latest_jpeg((self.frame_seq, self.frame_seq, buffer.tobytes()))
+        t = self.metrics.lap('encode', t)
+        payload = self._frame_payload({'current_frame': self.app.current_frame, 'image_width': self.newWidth, 'image_height': self.newHeight})
+        self.socket.emit('update_frame', payload, to=DEFAULT_ROOM)
+        self.metrics.lap('emit', t)
+        if self.frame_timestamp is not None:
+            self.latency.emit(self.frame_seq, self.frame_timestamp)
+        clients = self.clients - len(self.views)
+        if clients > 0:
+            self.metrics.inc('bytes_sent_total', len(self.app.current_frame) * clients, 'Bytes of encoded frames sent to clients.')
+
+    def _emit_views(self):
+        """Jede angefragte Darstellung wird einmal gerendert und an alle Clients ihres Raums gesendet."""
+        views = list(self.views.values())
+        for params in set(self.view_seqs) - set(views):
+            del self.view_seqs[params]  # Darstellung ohne Clients
+        emitted = False
+        for params in set(views):
+            try:
+                seq, payload = self.renditions.get_latest(params, self.latest.content_seq, self.frame)
+            except Exception:
+                self.metrics.inc('frames_failed_total', 1, 'Frames that failed in a processing stage.')
+                continue
+            if self.view_seqs.get(params) == seq:
+                continue  # unveränderte Szene, die Clients zeigen das Bild bereits
+            self.view_seqs[params] = seq
+            t = self.metrics.now()
+            self.socket.emit('update_frame', self._frame_payload(dict(payload)), to=params.room)
+            self.metrics.lap('emit', t)
+            self.metrics.inc('bytes_sent_total', len(payload['current_frame']) * views.count(params), 'Bytes of encoded frames sent to clients.')
+            emitted = True
+        if emitted and self.frame_timestamp is not None:
+            # Rückmeldungen (frame_ack) der Clients in eigenen Darstellungen zuordnen können
+            self.latency.emit(self.frame_seq, self.frame_timestamp)
+
+    def _render_view(self, frame, params):
+        """
+        Rendert den aktuellen Frame mit eigenen Parametern. Bei gleicher Ausrichtung wird das
+        bereits ausgewertete TFrame der Hauptschleife verwendet, sonst wird der Rohframe neu
+        umgerechnet (Fadenkreuz in der Bildmitte).
+        """
+        rotation, flip = params.orientation
+        if (rotation, flip) == (self.rotation, self.flip):
+            TFrame = self.TFrame
         else:
-            _, buffer = cv2.imencode('.jpg', frame)
-            self.app.current_frame = base64.b64encode(buffer).decode('utf-8')
-            self.socket.emit('update_frame', {'current_frame': self.app.current_frame, 'image_width': self.newWidth, 'image_height': self.newHeight})
+            TFrame = ThermalFrame(self.videostore.camera, frame, calibration=self.calibration)
+            if rotation is not None:
+                TFrame.rotate(rotation)
+            if flip:
+                TFrame.flip()
+            TFrame._process_frame()
+            TFrame._set_target(TFrame.height / 2, TFrame.width / 2)
+            TFrame._detect_hotspots(self.threshold)
+            if self.auto_contrast:
+                TFrame._compute_histogram()
+        width, height = TFrame.width * params.scale, TFrame.height * params.scale
+        img_data = TFrame._get_data(width)
+        heatmap = self._render(TFrame, img_data, width, height, params.colormap, params.hud, params.scale, (img_data['target_y'], img_data['target_x']))
 
+        t = self.metrics.now()
+        _, buffer = cv2.imencode('.jpg', heatmap, [cv2.IMWRITE_JPEG_QUALITY, params.quality])
+        payload = {'current_frame': base64.b64encode(buffer).decode('utf-8'), 'image_width': width, 'image_height': height}
+        self.metrics.lap('encode', t)
+        return payload
 
     def init_windows(self):
         if self.isqt:
+            self.demand.add('qt', 'heatmap')
             cv2.namedWindow('Thermal', cv2.WINDOW_GUI_NORMAL)
             cv2.resizeWindow('Thermal', self.newWidth, self.newHeight)
             
     def snapshot(self):       
-        PhotoSnapshot(self.videostore.camera, self.heatmap, self.thdata, self.img_data, savedir = self.config["media"])
+        latest = self.latest
+        if latest is not None and latest.tframe is not None and self.heatmap_seq != latest.seq:
+            # ohne Abnehmer wurde der Frame nicht gerendert: für das Foto nachholen, in der Ausrichtung des
+            # Frames selbst (ein Drehen/Spiegeln aus derselben Befehlsrunde gilt erst ab dem nächsten Frame)
+            tframe = latest.tframe
+            width, height = tframe.width * self.scale, tframe.height * self.scale
+            hud_data = tframe._get_data(width)
+            self.heatmap = self._render(tframe, hud_data, width, height, self.colormap, self.hud, self.scale, (hud_data['target_y'], hud_data['target_x']))
+            self.heatmap_seq = latest.seq
+        # Bild und Daten desselben Frames, self.thdata/self.img_data können schon zum nächsten gehören
+        temperatures, img_data = (latest.temperatures, latest.img_data) if latest is not None else (self.thdata, self.img_data)
+        photo = PhotoSnapshot(self.videostore.camera, self.heatmap, temperatures, img_data, savedir = self.config["media"])
+        self._register_files(photo.paths)
+        self._flush_pretrigger(photo.paths[0])
+        return {'files': [os.path.basename(k) for k in photo.paths]}
+
+    def _init_pretrigger(self):
+        if self.config['pretrigger'] and self.pretrigger==None:
+            width, height = self.videostore.camera['resolution']
+            self.pretrigger = PreTriggerBuffer(seconds=float(self.config['pretrigger']), fps=self.videostore.camera['fps'], shape=(height // 2, width))
+            print(f'Pre-trigger buffer: {self.config["pretrigger"]} s ({self.pretrigger.nbytes / 1024 / 1024:.1f} MB)')
+
+    def _flush_pretrigger(self, path):
+        """Schreibt die Historie vor dem Auslösen neben die Aufnahme bzw. den Snapshot (<name>.npz)."""
+        if self.pretrigger==None:
+            return
+        raw_file = os.path.splitext(path)[0] + '.npz'
+        self.pretrigger.flush(raw_file, callback=lambda k: self._register_files([k]),
+                              camera=self.videostore.camera['name'], offset=0)
+
+    def _on_rule_event(self, event):
+        rule = self.rules.rules.get(event['rule'])
+        if rule is not None and rule.trigger and event['state'] == 'fired' and not self.recording:
+            self._toggle_recording()
+
+    def _register_files(self, paths):
+        if self.files==None:
+            return
+        for path in paths:
+            self.files.add_file(path)
         
     def run(self):
+        # kill -USR1 <pid>: 10 s Profil der Capture-Schleife nach <media>/.profiles
+        self.profiler.install_signal_handler(os.path.join(self.config['media'], '.profiles'))
         try:
             self._run()
         except KeyboardInterrupt:
@@ -421,147 +869,110 @@ class ThermalCamera:
         self.init_windows()
         if self.isqt: self.print_thermal_camera_info()
         self._init_files()
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
+        self._init_pretrigger()
+        self.grabber = FrameGrabber(self.cap).start()
+        self.last_seq = 0
+        self.frames_skipped = 0
+        first_frame = True
+        while self.grabber.is_alive():
+            # Steuerbefehle zwischen zwei Frames ausführen, innerhalb eines Frames ändert sich nichts
+            self.commands.drain()
+            # immer den neuesten Frame verarbeiten, ältere werden übersprungen
+            self.profiler.tick()
+            t = self.metrics.now()
+            captured = self.grabber.read(self.last_seq)
+            t = self.metrics.lap('capture_wait', t)
+            ret = captured is not None
             if ret == True:
-                self.TFrame = ThermalFrame(self.videostore.camera, frame)
+                skipped = captured.seq - self.last_seq - 1 if self.last_seq > 0 else 0
+                self.frames_skipped += skipped
+                self.metrics.inc('frames_captured_total', skipped + 1, 'Frames delivered by the camera.')
+                self.metrics.inc('frames_dropped_total', skipped, 'Frames replaced by a newer one before processing.')
+                self.last_seq = captured.seq
+                self.frame_seq, self.frame_timestamp = captured.seq, captured.timestamp
+                frame = self.frame = captured.frame
+                if self.pretrigger!=None:
+                    self.pretrigger.push(frame, captured.seq, captured.timestamp)
+                if first_frame:
+                    print(f'First frame after {time.monotonic() - STARTUP_TIME:.2f} s')
+                    first_frame = False
+                # Einstellungen, die die Auswertung ändern, erzwingen einen Keyframe
+                key = (self.rotation, self.flip, self.scale, self.target_h, self.target_w, self.threshold,
+                       self.calibration.version if self.calibration is not None else None)
+                static = (self.TFrame is not None and not self.calibration_builder.collecting
+                          and not self.changes.changed(captured.seq, frame[frame.shape[0] // 2:], captured.timestamp, key))
+                t = self.metrics.lap('change', t)
+                if static:
+                    self.metrics.inc('frames_static_total', 1, 'Frames reusing the statistics and image of the previous keyframe.')
+                    self.latest = self.latest.restamp(captured.seq, captured.timestamp)
+                else:
+                    self.TFrame = ThermalFrame(self.videostore.camera, frame, calibration=self.calibration)
+                    if self.calibration_builder.collecting:
+                        # Referenzen in Sensor-Ausrichtung, vor Drehen/Spiegeln
+                        self.calibration_builder.add_frame(self.TFrame._raw_thermal())
                 
-                if self.rotation!=None:
-                    self.TFrame.rotate(self.rotation)
+                    if self.rotation!=None:
+                        self.TFrame.rotate(self.rotation)
                     
-                if self.flip:
-                    self.TFrame.flip()
+                    if self.flip:
+                        self.TFrame.flip()
                     
-                self.TFrame._process_frame()
-                self.TFrame._set_target(self.target_h, self.target_w)
+                    self.TFrame._process_frame(self.temperature_buffers.get((self.TFrame.height, self.TFrame.width)))
+                    t = self.metrics.lap('conversion', t)
+                    self.TFrame._set_target(self.target_h, self.target_w)
+                    self.TFrame._detect_hotspots(self.threshold)
+                    self.TFrame._compute_histogram()
                 
-                self.thdata = self.TFrame.temperatures
+                    self.thdata = self.TFrame.temperatures
                 
-                self.img_data = self.TFrame._get_data(self.newWidth)
+                    self.img_data = self.TFrame._get_data(self.newWidth)
+                    self.latest = FrameSnapshot(captured.seq, captured.timestamp, self.thdata, self.img_data, self.TFrame)
+                try:
+                    self.rules.evaluate(self.img_data, self.thdata, timestamp=captured.timestamp, seq=captured.seq)
+                except Exception:
+                    # eine fehlerhafte Regel darf die Aufnahme nicht beenden
+                    self.metrics.inc('frames_failed_total', 1, 'Frames that failed in a processing stage.')
+                self.history.add(self.img_data, timestamp=captured.timestamp)
+                t = self.metrics.lap('statistics', t)
                           
-                # Convert the real image to RGB
-                bgr = cv2.cvtColor(self.TFrame.imdata,  cv2.COLOR_YUV2BGR_YUYV)
-                #Contrast
-                bgr = cv2.convertScaleAbs(bgr, alpha=self.alpha)#Contrast
-                #bicubic interpolate, upscale and blur
-                bgr = cv2.resize(bgr,(self.newWidth,self.newHeight),interpolation=cv2.INTER_CUBIC)#Scale up!
-                if self.rad>0:
-                    bgr = cv2.blur(bgr,(self.rad,self.rad))
-                                
-                #apply colormap
-                if self.colormap == 0:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_JET)
-                    cmapText = 'Jet'
-                if self.colormap == 1:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_HOT)
-                    cmapText = 'Hot'
-                if self.colormap == 2:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_MAGMA)
-                    cmapText = 'Magma'
-                if self.colormap == 3:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_INFERNO)
-                    cmapText = 'Inferno'
-                if self.colormap == 4:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_PLASMA)
-                    cmapText = 'Plasma'
-                if self.colormap == 5:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_BONE)
-                    cmapText = 'Bone'
-                if self.colormap == 6:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_SPRING)
-                    cmapText = 'Spring'
-                if self.colormap == 7:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_AUTUMN)
-                    cmapText = 'Autumn'
-                if self.colormap == 8:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_VIRIDIS)
-                    cmapText = 'Viridis'
-                if self.colormap == 9:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_PARULA)
-                    cmapText = 'Parula'
-                if self.colormap == 10:
-                    heatmap = cv2.applyColorMap(bgr, cv2.COLORMAP_RAINBOW)
-                    heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
-                    cmapText = 'Inv Rainbow'
+                # Einfärben, Skalieren und HUD nur, wenn jemand das Bild braucht, im Takt des schnellsten Abnehmers
+                now = time.monotonic()
+                emit_web = self.web and self.demand.due('web', now)
+                emit_views = self.web and self.demand.due('views', now)
+                if emit_web or self.demand.due('heatmap', now):
+                    render_key = (self.latest.content_seq, self.colormap, self.hud, self.scale, self.target, self.rad,
+                                  self.alpha, self.auto_contrast, self.recording, self.elapsed, self.snaptime)
+                    if render_key != self.render_key:
+                        heatmap = self._render(self.TFrame, self.img_data, self.newWidth, self.newHeight, self.colormap, self.hud, self.scale, self.target)
+                        self.metrics.inc('frames_rendered_total', 1, 'Frames colorized for at least one consumer.')
+                        #display image
+                        if self.isqt : cv2.imshow('Thermal', heatmap)
+                    else:
+                        heatmap = self.heatmap
+                    self.heatmap, self.heatmap_seq, self.render_key = heatmap, captured.seq, render_key
                 
+                    if emit_web:
+                        if render_key != self.emitted_key:
+                            self.update_web_frame(heatmap)
+                            self.emitted_key = render_key
+                        elif self.latest_jpeg is not None:
+                            # gleiches Bild: nichts kodieren oder senden, der Snapshot gilt für diesen Frame weiter
+                            self._set_latest_jpeg((captured.seq,) + self.latest_jpeg[1:])
                           
-                if (self.hud=='all') or (self.hud=='cross'):
-                    # draw crosshairs
-                    center = self.target
-                    
-                    # Weiß gestrichelte Linien
-                    cv2.line(heatmap, (center[0], center[1] + 20), (center[0], center[1] - 20), (255, 255, 255), 2)  # vline
-                    cv2.line(heatmap, (center[0] + 20, center[1]), (center[0] - 20, center[1]), (255, 255, 255), 2)  # hline
-                    
-                    # Schwarze gestrichelte Linien
-                    cv2.line(heatmap, (center[0], center[1] + 20), (center[0], center[1] - 20), (0, 0, 0), 1)  # vline
-                    cv2.line(heatmap, (center[0] + 20, center[1]), (center[0] - 20, center[1]), (0, 0, 0), 1)  # hline
-                    
-                    # Temperatur anzeigen
-                    cv2.putText(heatmap, str(self.img_data['target_temp']) + self.temp_unit, (center[0] + 10, center[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 2, cv2.LINE_AA)
-                    cv2.putText(heatmap, str(self.img_data['target_temp']) + self.temp_unit, (center[0] + 10, center[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1, cv2.LINE_AA)
-
-                          
-                if self.hud=='all':
-                    # display black box for our data
-                    cv2.rectangle(heatmap, (0, 0),(160, 120), (0,0,0), -1)
-                    # put text in the box
-                    cv2.putText(heatmap,'Avg Temp: '+str(self.img_data['avg_temp'])+self.temp_unit, (10, 14),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    cv2.putText(heatmap,'Label Threshold: '+str(self.threshold)+self.temp_unit, (10, 28),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    cv2.putText(heatmap,'Colormap: '+cmapText, (10, 42),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    cv2.putText(heatmap,'Blur: '+str(self.rad)+' ', (10, 56),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    cv2.putText(heatmap,'Scaling: '+str(self.scale)+' ', (10, 70),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    cv2.putText(heatmap,'Contrast: '+str(self.alpha)+' ', (10, 84),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                          
-                    cv2.putText(heatmap,'Snapshot: '+self.snaptime+' ', (10, 98),\
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
-                          
-                    if self.recording == False:
-                    	cv2.putText(heatmap,'Recording: '+self.elapsed, (10, 112),\
-                    	cv2.FONT_HERSHEY_SIMPLEX, 0.4,(200, 200, 200), 1, cv2.LINE_AA)
                     if self.recording == True:
-                    	cv2.putText(heatmap,'Recording: '+self.elapsed, (10, 112),\
-                    	cv2.FONT_HERSHEY_SIMPLEX, 0.4,(40, 40, 255), 1, cv2.LINE_AA)
-                
-                if (self.hud!='none'):                      
-                    if self.img_data['max_temp'] > self.img_data['avg_temp'] + self.threshold:
-                        self._draw_circle_text(heatmap, self.img_data['max_temp_y'], self.img_data['max_temp_x'], self.img_data['max_temp'], (0, 0, 255))
-                    
-                    if self.img_data['min_temp'] < self.img_data['avg_temp'] - self.threshold:
-                        self._draw_circle_text(heatmap, self.img_data['min_temp_y'], self.img_data['min_temp_x'], self.img_data['min_temp'], (255, 0, 0))
-                
-                #display image
-                self.heatmap = heatmap
-                if self.isqt : cv2.imshow('Thermal', heatmap)
-                
-                if self.web:
-                    self.update_web_frame(heatmap)
-                          
-                if self.recording == True:
-                    try:
-                        self.elapsed = (time.time() - self.start)
-                    except:
-                        self.elapsed = (time.time() - time.time())
-                    self.elapsed = time.strftime("%H:%M:%S", time.gmtime(self.elapsed)) 
-                    try:
-                        self.videoOut.add_frame(heatmap, data = self.img_data)
-                    except:
-                        self.recording = False
-                        self._recording_stop()
-                        
-                        
+                        self.elapsed = time.strftime("%H:%M:%S", time.gmtime(time.time() - self.start))
+                        try:
+                            t = self.metrics.now()
+                            self.videoOut.add_frame(heatmap, data = self.img_data)
+                            self.metrics.lap('recorder', t)
+                        except:
+                            self.metrics.inc('frames_failed_total', 1, 'Frames that failed in a processing stage.')
+                            self.recording = False
+                            self._recording_stop()
+
+                if emit_views:
+                    self._emit_views()
+
                 if self.isqt:
                     keyPress = cv2.waitKey(1)
                     if keyPress == ord('a'): #Increase blur radius
@@ -622,6 +1033,9 @@ class ThermalCamera:
                         	self.alpha = 0.0
                               
                               
+                    if keyPress == ord('e'): # toggle auto contrast
+                        self._toggle_auto_contrast()
+
                     if keyPress == ord('h'): # cycle through hud options
                         self._cycle_hud()
                               
@@ -661,19 +1075,112 @@ class ThermalCamera:
                         self._exit_capture_loop()
                         break
                     
+    def _render(self, TFrame, img_data, width, height, colormap, hud, scale, target):
+        """
+        Skaliert, färbt und beschriftet ein ausgewertetes TFrame.
+
+        Returns:
+            np.ndarray: Die Heatmap (BGR) in width x height.
+        """
+        t = self.metrics.now()
+        # Luma-Ebene skalieren (bicubic), Kontrast und Farbkarte in einem LUT-Durchgang
+        bgr = cv2.resize(TFrame.imdata[..., 0],(width, height),interpolation=cv2.INTER_CUBIC)#Scale up!
+        if self.rad>0:
+            bgr = cv2.blur(bgr,(self.rad,self.rad))
+        t = self.metrics.lap('resize', t)
+                        
+        #apply colormap
+        auto_range = TFrame.luma_range if self.auto_contrast else None
+        heatmap = self.color_mapper.apply(bgr, colormap, alpha=self.alpha, auto_range=auto_range)
+        cmapText = self.color_mapper.name(colormap)
+        t = self.metrics.lap('colorize', t)
+                  
+        if (hud=='all') or (hud=='cross'):
+            # draw crosshairs
+            center = target
+            
+            # Weiß gestrichelte Linien
+            cv2.line(heatmap, (center[0], center[1] + 20), (center[0], center[1] - 20), (255, 255, 255), 2)  # vline
+            cv2.line(heatmap, (center[0] + 20, center[1]), (center[0] - 20, center[1]), (255, 255, 255), 2)  # hline
+            
+            # Schwarze gestrichelte Linien
+            cv2.line(heatmap, (center[0], center[1] + 20), (center[0], center[1] - 20), (0, 0, 0), 1)  # vline
+            cv2.line(heatmap, (center[0] + 20, center[1]), (center[0] - 20, center[1]), (0, 0, 0), 1)  # hline
+            
+            # Temperatur anzeigen
+            cv2.putText(heatmap, str(img_data['target_temp']) + self.temp_unit, (center[0] + 10, center[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 2, cv2.LINE_AA)
+            cv2.putText(heatmap, str(img_data['target_temp']) + self.temp_unit, (center[0] + 10, center[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1, cv2.LINE_AA)
+
+                  
+        if hud=='all':
+            # display black box for our data
+            cv2.rectangle(heatmap, (0, 0),(160, 120), (0,0,0), -1)
+            # put text in the box
+            cv2.putText(heatmap,'Avg Temp: '+str(img_data['avg_temp'])+self.temp_unit, (10, 14),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            cv2.putText(heatmap,'Label Threshold: '+str(self.threshold)+self.temp_unit, (10, 28),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            cv2.putText(heatmap,'Colormap: '+cmapText, (10, 42),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            cv2.putText(heatmap,'Blur: '+str(self.rad)+' ', (10, 56),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            cv2.putText(heatmap,'Scaling: '+str(scale)+' ', (10, 70),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            cv2.putText(heatmap,'Contrast: '+('auto' if self.auto_contrast else str(self.alpha))+' ', (10, 84),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+                  
+            cv2.putText(heatmap,'Snapshot: '+self.snaptime+' ', (10, 98),\
+            cv2.FONT_HERSHEY_SIMPLEX, 0.4,(0, 255, 255), 1, cv2.LINE_AA)
+                  
+            if self.recording == False:
+            	cv2.putText(heatmap,'Recording: '+self.elapsed, (10, 112),\
+            	cv2.FONT_HERSHEY_SIMPLEX, 0.4,(200, 200, 200), 1, cv2.LINE_AA)
+            if self.recording == True:
+            	cv2.putText(heatmap,'Recording: '+self.elapsed, (10, 112),\
+            	cv2.FONT_HERSHEY_SIMPLEX, 0.4,(40, 40, 255), 1, cv2.LINE_AA)
+        
+        if (hud!='none'):                      
+            self._draw_hotspots(heatmap, img_data['hotspots'])
+            if img_data['max_temp'] > img_data['avg_temp'] + self.threshold:
+                self._draw_circle_text(heatmap, img_data['max_temp_y'], img_data['max_temp_x'], img_data['max_temp'], (0, 0, 255))
+            
+            if img_data['min_temp'] < img_data['avg_temp'] - self.threshold:
+                self._draw_circle_text(heatmap, img_data['min_temp_y'], img_data['min_temp_x'], img_data['min_temp'], (255, 0, 0))
+        
+        self.metrics.lap('hud', t)
+        return heatmap
+
     def _exit_capture_loop(self):
+        self.grabber.stop()
         self.cap.release()
         cv2.destroyAllWindows()
         self.__del__()        
         
+    def _draw_hotspots(self, heatmap, hotspots):
+        for hotspot in hotspots:
+            x, y, w, h = hotspot['bbox']
+            cv2.rectangle(heatmap, (x, y), (x + w, y + h), (0, 0, 0), 2)
+            cv2.rectangle(heatmap, (x, y), (x + w, y + h), (0, 0, 255), 1)
+            cv2.putText(heatmap, str(hotspot['peak_temp']) + self.temp_unit, (x, max(y - 4, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1, cv2.LINE_AA)
+
     def _draw_circle_text(self, heatmap, row, col, temp, color):
         cv2.circle(heatmap, (row, col), 5, (0, 0, 0), 2)
         cv2.circle(heatmap, (row, col), 5, color, -1)
         cv2.putText(heatmap, str(temp) + self.temp_unit, (row + 10, col + 5),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1, cv2.LINE_AA)
                 
+    # Steuerbefehle: aus der Schleife direkt, aus Flask/Socket.IO über self.commands aufrufen
+
     def _flip_image(self):
         self.flip = next(self.flip_options)
+        return {'flip': self.flip}
 
 
     def _rotate_image(self):
@@ -684,9 +1191,45 @@ class ThermalCamera:
         self.set_target_pos()
         if self.isqt: cv2.destroyAllWindows()
         self.init_windows()
+        return {'rotation': DEGREES[self.rotation]}
+
+    def _set_target(self, x, y):
+        """Fadenkreuz auf relative Bildkoordinaten (0..1) setzen."""
+        self.target_h = int(y * (self.height - 1))
+        self.target_w = int(x * (self.width - 1))
+        self.set_target_pos()
+        return {'target_x': self.target_w, 'target_y': self.target_h}
     
+    def _add_rule(self, rule):
+        rule = self.rules.add_rule(rule)
+        return {"message": f"Rule {rule.name} added", "rule": rule.data()}
+
+    def _set_calibration(self, calibration, message=None):
+        """Tauscht die Kalibrierkarten aus, None schaltet die Kalibrierung ab."""
+        self.calibration = calibration
+        if calibration is None:
+            self.calibration_builder.reset()
+            return {"message": "Calibration disabled"}
+        return {"message": message or "Calibration updated", "calibration": calibration.data()}
+
+    def _set_emissivity(self, regions):
+        # Karten immer in Sensor-Ausrichtung, Drehen/Spiegeln passiert beim Anwenden
+        if self.calibration is None:
+            width, height = self.videostore.camera['resolution']
+            calibration = CalibrationMap.identity((height // 2, width))
+        else:
+            calibration = self.calibration
+        calibration.set_emissivity(regions)
+        self.calibration = calibration
+        return {"message": "Emissivity updated", "calibration": calibration.data()}
+
+    def _toggle_auto_contrast(self):
+        self.auto_contrast = not self.auto_contrast
+        return {'auto_contrast': self.auto_contrast}
+
     def _cycle_hud(self):
         self.hud = next(self.hud_options)    
+        return {'hud': self.hud}
 
     def _toggle_recording(self):
         self.recording = not self.recording
@@ -695,19 +1238,27 @@ class ThermalCamera:
             self._recording_start()
         else:
             self._recording_stop()
+        return {'recording': self.recording}
 
     def _recording_start(self):
         self.recording = True
         self.videoOut = VideoRecorder(self.videostore.camera, self.newWidth, self.newHeight, savedir = self.config["media"])
+        self.demand.add('recorder', 'heatmap')
         self.start = time.time()
+        self._flush_pretrigger(self.videoOut.paths[0])
 
     def _recording_stop(self):
         self.elapsed = "00:00:00"
+        paths = self.videoOut.paths if self.videoOut!=None else []
         del self.videoOut
         self.videoOut = None
         self.recording = False
+        self.demand.remove('recorder')
+        self._register_files(paths)
                         
     def __del__(self):
+        if hasattr(self, 'grabber'):
+            self.grabber.stop()
         if hasattr(self, 'cap') and self.cap.isOpened():
             self.cap.release()
             
@@ -753,6 +1304,7 @@ a z     : Increase/Decrease Blur
 s x     : Floating High and Low Temp Label Threshold
 d c     : Change Interpolated scale
 f v     : Contrast
+e       : Toggle auto contrast (histogram)
 w       : Toggle Fullscreen / Windowed
 r       : Start and stop recording
 i       : Snapshot photo
@@ -766,6 +1318,13 @@ p/ö/l/ä : Move target position up/down/left/right
         
 def main():
     import argparse
+
+    try:
+        from topdon import __version__
+        from topdon.startup import print_import_report
+    except:
+        from __init__ import __version__
+        from startup import print_import_report
     
     parser = argparse.ArgumentParser(description='Thermal Camera Viewer')
     
@@ -773,13 +1332,29 @@ def main():
     parser.add_argument('--port', type=int, default=5001, help='The port for web support (default: 5001)')
     parser.add_argument('--cf', action='store_true', help='Start cloudflared tunnel')
     parser.add_argument('--update', action='store_true', help='Update to the latest version')
-    parser.add_argument('--version', action='version', version=f'Thermal Camera Viewer {topdon.__version__}', help='Show the version number of Thermal Camera Viewer')
+    parser.add_argument('--version', action='version', version=f'Thermal Camera Viewer {__version__}', help='Show the version number of Thermal Camera Viewer')
     parser.add_argument('--camera', type=int, default=-1, help='Specify the camera (default: -1)')
+    parser.add_argument('--synthetic', action='store_true', help='Use synthetic frames instead of a camera (testing without hardware)')
     parser.add_argument('--media', type=str, help='Specify the path to the media folder')
+    parser.add_argument('--rules', type=str, help='YAML file with alarm rules')
+    parser.add_argument('--pretrigger', type=float, default=10, help='Seconds of raw history kept in memory and saved with each recording/snapshot (0 = off, default: 10)')
+    parser.add_argument('--calibration', type=str, help='Per-pixel calibration maps (.npz, default: ~/.cache/topdon/calibration.npz if present)')
+    parser.add_argument('--change-delta', type=float, default=0.25, help='Reuse the previous frame while no 8x8 block changes by more than this many K (0 = off, default: 0.25)')
+    parser.add_argument('--keyframe', type=float, default=5.0, help='Process a full frame at least every N seconds in static scenes (default: 5)')
+    parser.add_argument('--import-report', action='store_true', help='Print the import time per subsystem and exit')
 
     args = parser.parse_args()
+    import_report = vars(args).pop('import_report')
+    if vars(args).pop('synthetic'):
+        args.camera = 'synthetic'
         
-    if args.update:
+    if import_report:
+        print_import_report()
+    elif args.update:
+        try:
+            from topdon.updater import VersionCheck
+        except:
+            from updater import VersionCheck
         VersionCheck().ensure_latest_version()
     else:
         self = ThermalCamera(**vars(args))
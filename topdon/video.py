@@ -5,10 +5,14 @@ Topdon Viewer
 
 from https://github.com/LeoDJ/P2Pro-Viewer/blob/23887289d3841fdae25c3a11b8d3eed8cd778800/P2Pro/video.py
 """
+import os
+import json
 import platform
 import time
 import queue
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Union
 
 import cv2
@@ -39,36 +43,65 @@ class Video:
     model = None
 
     @staticmethod
-    def list_cap_ids():
+    def _probe_cap_id(dev_port):
         """
-        Test the ports and returns a tuple with the available ports and the ones that are working.
+        Opens a single capture port and returns (dev_port, (w, h), fps, backend, is_reading) or None if it can't be opened.
+        """
+        camera = cv2.VideoCapture(dev_port)
+        try:
+            if not camera.isOpened():
+                return None
+            is_reading, img = camera.read()
+            w = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+            h = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = camera.get(cv2.CAP_PROP_FPS)
+            backend = camera.getBackendName()
+            return (dev_port, (w, h), fps, backend, is_reading)
+        finally:
+            camera.release()
+
+    @staticmethod
+    def _candidate_cap_ids(max_ids=10):
+        """
+        Candidate capture ports. On Linux these are the existing /dev/video* nodes, otherwise the indices 0..max_ids-1.
+        """
+        if platform.system() == 'Linux' and os.path.isdir('/dev'):
+            ids = sorted(int(k[5:]) for k in os.listdir('/dev') if k.startswith('video') and k[5:].isdigit())
+            if len(ids) > 0:
+                return ids
+        return list(range(max_ids))
+
+    @staticmethod
+    def list_cap_ids(max_ids=10, timeout=3.0):
+        """
+        Test the ports concurrently and returns a tuple with the available ports and the ones that are working.
+        Ports that do not answer within `timeout` seconds are counted as not working.
         """
         non_working_ids = []
-        dev_port = 0
         working_ids = []
         available_ids = []
-        log.info("Probing video capture ports...")
-        while len(non_working_ids) < 10:
-            camera = cv2.VideoCapture(dev_port)
-            log.info(f"Testing video capture port {dev_port}... ")
-            if not camera.isOpened():
-                log.info("Not working.")
+        candidates = Video._candidate_cap_ids(max_ids)
+        log.info(f"Probing video capture ports {candidates}...")
+
+        executor = ThreadPoolExecutor(max_workers=max(len(candidates), 1))
+        futures = {executor.submit(Video._probe_cap_id, dev_port): dev_port for dev_port in candidates}
+        done, not_done = wait(futures, timeout=timeout)
+        # do not block on hanging devices, their threads finish in the background
+        executor.shutdown(wait=False)
+
+        for future, dev_port in sorted(futures.items(), key=lambda k: k[1]):
+            result = future.result() if future in done and future.exception() is None else None
+            if result is None:
+                log.info(f"Video capture port {dev_port}: Not working.")
                 non_working_ids.append(dev_port)
+                continue
+            _, (w, h), fps, backend, is_reading = result
+            log.info(f"Video capture port {dev_port}: Is present {'and working    ' if is_reading else 'but not working'} [{w}x{h} @ {fps:.1f} FPS ({backend})]")
+            if is_reading:
+                working_ids.append((dev_port, (w, h), fps, backend))
             else:
-                is_reading, img = camera.read()
-                w = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
-                h = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = camera.get(cv2.CAP_PROP_FPS)
-                backend = camera.getBackendName()
-                log.info(f"Is present {'and working    ' if is_reading else 'but not working'} [{w}x{h} @ {fps:.1f} FPS ({backend})]")
-                if is_reading:
-                    # print("Port %s is working and reads images (%s x %s)" %(dev_port,w,h))
-                    working_ids.append((dev_port, (w, h), fps, backend))
-                else:
-                    # print("Port %s for camera ( %s x %s) is present but does not reads." %(dev_port,w,h))
-                    available_ids.append(dev_port)
-
-            dev_port += 1
+                available_ids.append(dev_port)
+
         return working_ids, available_ids, non_working_ids
     
     def list_devs(self):
@@ -80,38 +113,143 @@ class Video:
                 print(f"  {key}: {value}")
             print("\n")
 
+    @staticmethod
+    def _discovery_cache_file():
+        cache_dir = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+        return os.path.join(cache_dir, 'topdon', 'camera.json')
+
+    def _load_discovery_cache(self):
+        try:
+            with open(self._discovery_cache_file(), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save_discovery_cache(self, camera, udev=None):
+        entry = {
+                    'name': camera['name'],
+                    'DEVNAME': camera['DEVNAME'],
+                    'udev': udev,
+                }
+        try:
+            cache_file = self._discovery_cache_file()
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, 'w') as file:
+                json.dump(entry, file)
+        except OSError as e:
+            log.info(f"Could not write camera discovery cache: {e}")
+
+    @staticmethod
+    def _udev_matches(device, camera):
+        try:
+            return (device.get('ID_VENDOR_ID'), device.get('ID_MODEL_ID')) == camera['device_id'] and \
+                    all([k[0] in device.get(k[1]) for k in camera['in']])
+        except:
+            return False
+
+    @staticmethod
+    def _udev_ids(device):
+        return {k: device.get(k) for k in ['ID_VENDOR_ID', 'ID_MODEL_ID', 'ID_SERIAL', 'ID_PATH']}
+
+    def _set_camera(self, camera, devname):
+        self.camera = dict(camera)
+        self.camera['DEVNAME'] = devname
+        return devname
+
+    def _validate_cached_camera(self):
+        """
+        Checks the last successful match first, so restarts do not need a full scan.
+        """
+        cached = self._load_discovery_cache()
+        if cached is None:
+            return None
+        camera = next((k for k in self.known_cameras if k['name'] == cached.get('name')), None)
+        if camera is None:
+            return None
+
+        if platform.system() == 'Linux' and cached.get('udev') is not None:
+            try:
+                device = pyudev.Devices.from_device_file(pyudev.Context(), cached['DEVNAME'])
+            except Exception:
+                return None
+            if self._udev_matches(device, camera) and self._udev_ids(device) == cached['udev']:
+                return self._set_camera(camera, cached['DEVNAME'])
+            return None
+
+        result = self._probe_cap_id(cached['DEVNAME'])
+        if result is not None and result[4] and result[1] == camera['resolution'] and result[2] == camera['fps']:
+            return self._set_camera(camera, cached['DEVNAME'])
+        return None
+
     # Sadly, Windows APIs / OpenCV is very limited, and the only way to detect the camera is by its characteristic resolution and framerate
     # On Linux, just use the VID/PID via udev
     def get_camera_cap_id(self):
+        devname = self._validate_cached_camera()
+        if devname is not None:
+            log.info(f"Using cached camera {self.camera['name']} at {devname}")
+            return devname
+
         if platform.system() == 'Linux':
             for device in pyudev.Context().list_devices(subsystem='video4linux'):
                 for camera in self.known_cameras:
-                    try:
-                        if (device.get('ID_VENDOR_ID'), device.get('ID_MODEL_ID')) == camera['device_id'] and \
-                                all([k[0] in device.get(k[1]) for k in camera['in']]):
-                            self.camera = camera
-                            self.camera['DEVNAME'] = device.get('DEVNAME')
-                            return device.get('DEVNAME')
-                    except:
-                        pass
+                    if self._udev_matches(device, camera):
+                        self._set_camera(camera, device.get('DEVNAME'))
+                        self._save_discovery_cache(self.camera, udev=self._udev_ids(device))
+                        return device.get('DEVNAME')
 
         # Fallback that uses the resolution and framerate to identify the device
         working_ids, _, _ = self.list_cap_ids()
         for camera in self.known_cameras: 
             for id in working_ids:
                 if id[1] == camera['resolution'] and id[2] == camera['fps']:
-                    self.camera = camera
-                    self.camera['DEVNAME'] = id[0]
+                    self._set_camera(camera, id[0])
+                    self._save_discovery_cache(self.camera)
                     return id[0]
 
         return None
 
-    def open(self, camera_id: Union[int, str] = -1):
-        if camera_id == -1:
+    def find_cameras(self):
+        """
+        Returns all connected devices that match one of the known cameras (udev on Linux,
+        resolution and framerate elsewhere) as a list of camera dicts including DEVNAME.
+        """
+        cameras = []
+        if platform.system() == 'Linux':
+            for device in pyudev.Context().list_devices(subsystem='video4linux'):
+                for camera in self.known_cameras:
+                    if self._udev_matches(device, camera):
+                        cameras.append(dict(camera, DEVNAME=device.get('DEVNAME')))
+            if len(cameras) > 0:
+                return sorted(cameras, key=lambda k: k['DEVNAME'])
+
+        working_ids, _, _ = self.list_cap_ids()
+        for camera in self.known_cameras:
+            for id in working_ids:
+                if id[1] == camera['resolution'] and id[2] == camera['fps']:
+                    cameras.append(dict(camera, DEVNAME=id[0]))
+        return cameras
+
+    def open(self, camera_id: Union[int, str] = -1, camera: dict = None):
+        if camera_id == 'synthetic':
+            # synthetic TC001 frames, no hardware needed (load tests, benchmarks)
+            try:
+                from topdon.bench.synthetic import SyntheticCapture
+            except:
+                from bench.synthetic import SyntheticCapture
+            self._set_camera(self.known_cameras[0], camera_id)
+            self.cap = SyntheticCapture(fps=self.camera['fps'])
+            return
+        if camera is not None:
+            self._set_camera(camera, camera['DEVNAME'] if camera_id == -1 else camera_id)
+            camera_id = self.camera['DEVNAME']
+        elif camera_id == -1:
             log.info("No camera ID specified, scanning... (This could take a few seconds)")
             camera_id = self.get_camera_cap_id()
             if camera_id == None:
                 raise ConnectionError(f"Could not find camera module")
+        else:
+            # explicit camera id, assume the default camera model
+            self._set_camera(self.known_cameras[0], camera_id)
 
         # check if video capture can be opened
         cap = cv2.VideoCapture(camera_id)
@@ -132,6 +270,103 @@ class Video:
         self.cap = cap
 
 
+class CapturedFrame:
+    def __init__(self, frame, seq: int, timestamp: float):
+        """
+        A raw frame as delivered by the camera.
+
+        Args:
+            frame (np.ndarray): raw YUYV + thermal frame.
+            seq (int): sequence number, counts every frame read from the device.
+            timestamp (float): time.monotonic() when the frame was read.
+        """
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"CapturedFrame(seq={self.seq}, timestamp={self.timestamp:.3f})"
+
+class FrameGrabber:
+    def __init__(self, cap, max_failures=50):
+        """
+        Continuously drains the capture device in a background thread and keeps only the
+        newest frame. Consumers always get the latest frame, so a slow consumer never
+        works on frames that queued up in the V4L2 buffer.
+
+        Args:
+            max_failures (int): consecutive failed reads (about 2 s at 25 fps) before the grabber
+                                gives up; single dropped UVC reads are skipped.
+        """
+        self.cap = cap
+        self.latest = None
+        self.running = False
+        self.frames_read = 0
+        self.read_failures = 0
+        self.max_failures = max_failures
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        # keep the driver queue as short as possible, the grabber does the buffering
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        failures = 0
+        while self.running:
+            if not self.cap.isOpened():
+                log.warning("Capture device closed, stopping the frame grabber")
+                break
+            ret, frame = self.cap.read()
+            timestamp = time.monotonic()
+            if not ret:
+                failures += 1
+                self.read_failures += 1
+                if failures >= self.max_failures:
+                    log.warning(f"{failures} consecutive failed reads from the capture device, stopping the frame grabber")
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            with self._cond:
+                self.frames_read += 1
+                self.latest = CapturedFrame(frame, self.frames_read, timestamp)
+                self._cond.notify_all()
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+    def read(self, last_seq=0, timeout=1.0):
+        """
+        Returns the newest frame with a sequence number above `last_seq`, waiting up to `timeout`
+        seconds for it. Frames between `last_seq` and the returned one were skipped by the consumer.
+
+        Returns:
+            CapturedFrame: the latest frame or None on timeout / when the device stopped.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: not self.running or (self.latest is not None and self.latest.seq > last_seq), timeout=timeout)
+            if self.latest is None or self.latest.seq <= last_seq:
+                return None
+            return self.latest
+
+    def is_alive(self):
+        return self.running
+
+
 if __name__ == "__main__":        
     self = Video()
     #self.list_devs()
\ No newline at end of file